@@ -1,13 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Path
-from sqlalchemy import select
+from sqlalchemy import select, and_, tuple_
 from db import SessionLocal
+from json_response import FastJSONResponse
 from models import Album, Artist, Label, UserAlbumCollection
-from auth_dependencies import get_current_user_contributeur
+from auth_dependencies import get_current_user_contributeur, get_optional_user
+from discogs_utils import get_discogs_client
+from cover_cache import COVER_LIST_SIZE, cover_proxy_url
+from pagination import encode_cursor, decode_cursor
+from catalog_state import catalog_state, album_detail_cache, count_with_mode
+from search_utils import contains_pattern
+from fieldsets import FieldSet
+import os
+import httpx
 import logging
 
 logger = logging.getLogger("disco2000")
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+# Nombre maximal d'albums par appel à GET /api/albums/batch (surchargeable via .env)
+ALBUM_BATCH_MAX_IDS = int(os.getenv("ALBUM_BATCH_MAX_IDS", "100"))
 
 @router.delete("/api/albums/{album_id}", status_code=204)
 async def delete_album(album_id: int = Path(..., description="ID de l'album à supprimer"), user=Depends(get_current_user_contributeur)):
@@ -17,94 +29,146 @@ async def delete_album(album_id: int = Path(..., description="ID de l'album à s
             raise HTTPException(status_code=404, detail="Album non trouvé")
         await session.delete(album)
         await session.commit()
+        catalog_state.album_catalog_changed(delta=-1)
         return None
 
 from fastapi import Request, Query
-from typing import Optional
+from typing import List, Literal, Optional
+
+# Champs de la liste d'albums (paramètre fields=) ; id et year sont toujours lus pour le curseur
+ALBUM_LIST_FIELDS = FieldSet(
+    {
+        "id": ((Album.id,), lambda row: row.id),
+        "artist": ((Artist.name.label("artist_name"),), lambda row: row.artist_name),
+        "title": ((Album.title,), lambda row: row.title),
+        "year": ((Album.year,), lambda row: row.year),
+        "cover_url": ((Album.cover_url,), lambda row: cover_proxy_url(row.id, row.cover_url)),
+        "cover_thumbnail_url": ((Album.cover_url,), lambda row: cover_proxy_url(row.id, row.cover_url, size=COVER_LIST_SIZE)),
+        "collection": (
+            (UserAlbumCollection.id.label("collection_id"), UserAlbumCollection.cd, UserAlbumCollection.vinyl),
+            lambda row: {"cd": row.cd, "vinyl": row.vinyl} if row.collection_id is not None else None,
+        ),
+    },
+    always=(Album.id, Album.year),
+)
+
+def _collection_access(requested: List[str], fields: Optional[str], user: Optional[dict]) -> List[str]:
+    """
+    La collection n'est renvoyée qu'aux utilisateurs authentifiés (rôle 'utilisateur') : omise
+    des champs par défaut, refusée (401/403) quand elle est demandée explicitement via fields=.
+    """
+    if user and "utilisateur" in user.get("roles", []):
+        return requested
+    if fields is not None and "collection" in requested:
+        if not user:
+            raise HTTPException(status_code=401, detail="Token d'authentification manquant ou invalide")
+        raise HTTPException(status_code=403, detail="Droits insuffisants : rôle 'utilisateur' requis")
+    return [name for name in requested if name != "collection"]
 
 @router.get("/api/albums")
 async def get_albums(
-    request: Request,
     page: int = Query(1, ge=1, description="Numéro de page (1-indexed)"),
     page_size: int = Query(20, ge=1, le=100, description="Nombre d'albums par page"),
     artist: Optional[str] = Query(None, description="Filtre par nom d'artiste (recherche partielle)"),
+    title: Optional[str] = Query(None, description="Filtre par titre d'album (recherche partielle)"),
+    genre: Optional[List[str]] = Query(None, description="Filtre par genre (répétable : ?genre=Rock&genre=Jazz, ou séparé par des virgules)"),
+    style: Optional[List[str]] = Query(None, description="Filtre par style (répétable ou séparé par des virgules)"),
+    match: Literal["any", "all"] = Query("any", description="Genres/styles : au moins un (any) ou tous (all)"),
     year_from: Optional[int] = Query(None, description="Année de début (incluse)"),
-    year_to: Optional[int] = Query(None, description="Année de fin (incluse)")
+    year_to: Optional[int] = Query(None, description="Année de fin (incluse)"),
+    cursor: Optional[str] = Query(None, description="Curseur opaque (next_cursor de la page précédente) ; remplace page"),
+    count: Literal["exact", "estimated", "none"] = Query("exact", description="Calcul du total : exact, estimated ou none"),
+    fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules (ex : id,title,cover_url)"),
+    user=Depends(get_optional_user)
 ):
-    user = None
-    roles = []
-    # Tente de décoder le token pour savoir si l'utilisateur est authentifié
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        from jwt_utils import decode_access_token
-        token = auth_header.split(" ", 1)[1]
-        payload = decode_access_token(token)
-        if payload:
-            user = payload
-            roles = payload.get("roles", [])
+    requested = ALBUM_LIST_FIELDS.parse(fields)
+    requested = _collection_access(requested, fields, user)
+    with_collection = "collection" in requested
     async with SessionLocal() as session:
-        # Construction de la requête avec filtres
-        stmt = select(Album).join(Artist, Album.artist_id == Artist.id, isouter=True)
-        
-        # Applique les filtres
+        # Filtres communs au comptage et à la liste
+        filters = []
+        # ILIKE échappé : servi par les index trigrammes (sql/11-migration_trigram_search.sql)
         if artist:
-            stmt = stmt.where(Artist.name.ilike(f"%{artist}%"))
+            filters.append(Artist.name.ilike(contains_pattern(artist), escape="\\"))
+        if title:
+            filters.append(Album.title.ilike(contains_pattern(title), escape="\\"))
+        # Tableaux genre/style : && (any) ou @> (all), servis par les index GIN
+        for column, values in ((Album.genre, _split_values(genre)), (Album.style, _split_values(style))):
+            if values:
+                filters.append(column.contains(values) if match == "all" else column.overlap(values))
         if year_from is not None:
-            stmt = stmt.where(Album.year >= year_from)
+            filters.append(Album.year >= year_from)
         if year_to is not None:
-            stmt = stmt.where(Album.year <= year_to)
-        
-        # Compte total avec filtres
+            filters.append(Album.year <= year_to)
+
+        # Compte total avec filtres (mis en cache, estimé ou omis selon `count`)
         from sqlalchemy import func
-        count_stmt = select(func.count()).select_from(Album).join(Artist, Album.artist_id == Artist.id, isouter=True)
-        if artist:
-            count_stmt = count_stmt.where(Artist.name.ilike(f"%{artist}%"))
-        if year_from is not None:
-            count_stmt = count_stmt.where(Album.year >= year_from)
-        if year_to is not None:
-            count_stmt = count_stmt.where(Album.year <= year_to)
-        
-        total_res = await session.execute(count_stmt)
-        total_count = total_res.scalar()
-        
-        # Pagination SQLAlchemy
-        stmt = stmt.order_by(Album.year.desc()).offset((page - 1) * page_size).limit(page_size)
-        res = await session.execute(stmt)
-        albums = res.scalars().all()
-        result = []
-        for album in albums:
-            artist_name = None
-            if album.artist_id:
-                artist = await session.get(Artist, album.artist_id)
-                if artist:
-                    artist_name = artist.name
-            album_dict = {
-                "id": album.id,
-                "artist": artist_name,
-                "title": album.title,
-                "year": album.year,
-                "cover_url": album.cover_url
-            }
-            # Ajoute les infos de collection si utilisateur authentifié et rôle utilisateur
-            if user and "utilisateur" in roles:
-                res_coll = await session.execute(
-                    select(UserAlbumCollection).where(
-                        UserAlbumCollection.user_id == user["id"],
-                        UserAlbumCollection.album_id == album.id
-                    )
-                )
-                coll = res_coll.scalar_one_or_none()
-                if coll:
-                    album_dict["collection"] = {"cd": coll.cd, "vinyl": coll.vinyl}
-                else:
-                    album_dict["collection"] = None
-            result.append(album_dict)
-        return {
-            "page": page,
+        count_stmt = select(func.count()).select_from(Album).join(Artist, Album.artist_id == Artist.id, isouter=True).where(*filters)
+        rows_stmt = select(Album.id).join(Artist, Album.artist_id == Artist.id, isouter=True).where(*filters)
+        total_count, total_estimated = await count_with_mode(session, count_stmt, rows_stmt, bool(filters), count)
+
+        # Une seule requête pour la page, limitée aux colonnes des champs demandés :
+        # nom de l'artiste et ligne de collection de l'utilisateur en jointure si besoin
+        stmt = select(*ALBUM_LIST_FIELDS.columns(requested)).select_from(Album)
+        if artist or "artist" in requested:
+            stmt = stmt.join(Artist, Album.artist_id == Artist.id, isouter=True)
+        stmt = stmt.where(*filters)
+        if with_collection:
+            stmt = stmt.join(
+                UserAlbumCollection,
+                and_(UserAlbumCollection.album_id == Album.id, UserAlbumCollection.user_id == user["id"]),
+                isouter=True,
+            )
+        # Ordre total (year, id) : stable entre deux pages, servi par l'index ix_albums_year_id
+        order = (Album.year.desc().nulls_last(), Album.id.desc())
+        if cursor:
+            rows = await _albums_after_cursor(session, stmt, order, decode_cursor(cursor), page_size)
+        else:
+            res = await session.execute(stmt.order_by(*order).offset((page - 1) * page_size).limit(page_size))
+            rows = res.all()
+        result = [ALBUM_LIST_FIELDS.serialize(row, requested) for row in rows]
+        next_cursor = None
+        if len(rows) == page_size:
+            next_cursor = encode_cursor({"year": rows[-1].year, "id": rows[-1].id})
+        return FastJSONResponse({
+            "page": None if cursor else page,
             "page_size": page_size,
             "total": total_count,
-            "albums": result
-        }
+            "total_estimated": total_estimated,
+            "albums": result,
+            "next_cursor": next_cursor
+        })
+
+
+def _split_values(values: Optional[List[str]]) -> List[str]:
+    """Valeurs d'un paramètre multiple, qu'il soit répété ou séparé par des virgules."""
+    if not values:
+        return []
+    return list(dict.fromkeys(v.strip() for value in values for v in value.split(",") if v.strip()))
+
+
+async def _albums_after_cursor(session, stmt, order, position, page_size):
+    """
+    Page suivante en pagination par clé (year, id) : le coût ne dépend pas de la profondeur.
+    Les albums sans année viennent en dernier ; on ne les lit qu'une fois les années épuisées.
+    """
+    year, album_id = position.get("year"), position.get("id")
+    if not isinstance(album_id, int) or not (year is None or isinstance(year, int)):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    rows = []
+    if year is not None:
+        res = await session.execute(
+            stmt.where(tuple_(Album.year, Album.id) < tuple_(year, album_id)).order_by(*order).limit(page_size)
+        )
+        rows = list(res.all())
+        album_id = None
+    if len(rows) < page_size:
+        null_stmt = stmt.where(Album.year.is_(None))
+        if album_id is not None:
+            null_stmt = null_stmt.where(Album.id < album_id)
+        res = await session.execute(null_stmt.order_by(*order).limit(page_size - len(rows)))
+        rows.extend(res.all())
+    return rows
 
 
 from fastapi import Query
@@ -112,17 +176,20 @@ from fastapi import Query
 async def add_album_studio(
     discogs_id: int = Query(..., description="ID Discogs master ou release"),
     discogs_type: str = Query("master", enum=["master", "release"], description="Type Discogs : master ou release"),
-    user=Depends(get_current_user_contributeur)
+    user=Depends(get_current_user_contributeur),
+    client: httpx.AsyncClient = Depends(get_discogs_client)
 ):
     logger.info(f"Début ajout album studio pour Discogs {discogs_type} {discogs_id}")
     try:
         if discogs_type == "master":
             from main import fetch_discogs_master
-            discogs_data = await fetch_discogs_master(discogs_id)
+            discogs_data = await fetch_discogs_master(discogs_id, client=client)
         else:
             from main import fetch_discogs_release
-            discogs_data = await fetch_discogs_release(discogs_id)
+            discogs_data = await fetch_discogs_release(discogs_id, client=client)
         logger.info(f"Infos récupérées : titre={discogs_data.titre}, artiste={discogs_data.artiste}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la récupération Discogs {discogs_type} {discogs_id} : {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -180,6 +247,7 @@ async def add_album_studio(
                 raise HTTPException(status_code=409, detail="Une release existe déjà pour ce titre, artiste et année. Impossible d'ajouter le master.")
             discogs_link_type = "master"
             discogs_master_id = discogs_data.identifiants_discogs["master_id"]
+            discogs_release_id = None
         else:
             # Refuse si un master existe déjà pour même titre, artiste, année
             res_master = await session.execute(
@@ -196,9 +264,11 @@ async def add_album_studio(
                 raise HTTPException(status_code=409, detail="Un master existe déjà pour ce titre, artiste et année. Impossible d'ajouter la release.")
             discogs_link_type = "release"
             discogs_master_id = None
+            discogs_release_id = discogs_data.identifiants_discogs.get("release_id")
         album = Album(
             title=discogs_data.titre,
             discogs_master_id=discogs_master_id,
+            discogs_release_id=discogs_release_id,
             year=discogs_data.annee,
             genre=discogs_data.genres if discogs_data.genres else [],
             style=discogs_data.styles if discogs_data.styles else [],
@@ -216,71 +286,170 @@ async def add_album_studio(
             await session.rollback()
             logger.error(f"Erreur d'intégrité lors de l'ajout de l'album : {e}")
             raise HTTPException(status_code=409, detail="L'album existe déjà dans la base de données.")
+        catalog_state.album_catalog_changed(delta=1)
         logger.info(f"Album studio ajouté : {album.title} (id={album.id})")
         return {"message": "Album studio ajouté", "album_id": album.id}
 
 
+from pydantic import BaseModel, Field
+from typing import List, Literal
+
+BATCH_IMPORT_MAX_ITEMS = 500
+
+class BatchImportItem(BaseModel):
+    discogs_id: int
+    discogs_type: Literal["master", "release"] = "master"
+
+class BatchImportRequest(BaseModel):
+    items: List[BatchImportItem] = Field(..., min_length=1, max_length=BATCH_IMPORT_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, le=16, description="Appels Discogs simultanés")
+
+@router.post("/api/albums/studio/batch")
+async def add_albums_studio_batch(
+    req: BatchImportRequest,
+    user=Depends(get_current_user_contributeur),
+    client: httpx.AsyncClient = Depends(get_discogs_client)
+):
+    """Importe plusieurs albums studio Discogs en une requête ; retourne un résultat par élément."""
+    from album_import import import_discogs_albums, BATCH_IMPORT_CONCURRENCY
+    logger.info(f"Début import en lot de {len(req.items)} albums Discogs")
+    results = await import_discogs_albums(
+        [(item.discogs_id, item.discogs_type) for item in req.items],
+        concurrency=req.concurrency or BATCH_IMPORT_CONCURRENCY,
+        client=client,
+    )
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "conflict", "error")}
+    return {"summary": summary, "results": results}
+
+
 # --- Endpoint détaillé après la définition de router ---
 
 from fastapi import Request
 
+
+def _related(prefix: str):
+    """Artiste ou label lu en jointure externe (colonnes préfixées), None s'il est absent."""
+    def value(row):
+        if getattr(row, f"{prefix}__id") is None:
+            return None
+        return {key: getattr(row, f"{prefix}__{key}") for key in ("id", "name", "discogs_id")}
+    return value
+
+
+# Champs de la fiche album (paramètre fields=)
+ALBUM_DETAIL_FIELDS = FieldSet(
+    {
+        "id": ((Album.id,), lambda row: row.id),
+        "title": ((Album.title,), lambda row: row.title),
+        "year": ((Album.year,), lambda row: row.year),
+        "genre": ((Album.genre,), lambda row: row.genre),
+        "style": ((Album.style,), lambda row: row.style),
+        "cover_url": ((Album.cover_url,), lambda row: cover_proxy_url(row.id, row.cover_url)),
+        "catno": ((Album.catno,), lambda row: row.catno),
+        "type": ((Album.type,), lambda row: row.type),
+        "discogs_master_id": ((Album.discogs_master_id,), lambda row: row.discogs_master_id),
+        "artist": (
+            (Artist.id.label("artist__id"), Artist.name.label("artist__name"), Artist.discogs_id.label("artist__discogs_id")),
+            _related("artist"),
+        ),
+        "label": (
+            (Label.id.label("label__id"), Label.name.label("label__name"), Label.discogs_id.label("label__discogs_id")),
+            _related("label"),
+        ),
+        "collection": (
+            (UserAlbumCollection.id.label("collection_id"), UserAlbumCollection.cd, UserAlbumCollection.vinyl),
+            lambda row: {"cd": row.cd, "vinyl": row.vinyl} if row.collection_id is not None else None,
+        ),
+    },
+    always=(Album.id,),
+)
+
+
+def _album_detail_stmt(requested: List[str], user_id: Optional[int]):
+    """SELECT des fiches album réduit aux champs demandés, jointures limitées à ces champs."""
+    stmt = select(*ALBUM_DETAIL_FIELDS.columns(requested)).select_from(Album)
+    if "artist" in requested:
+        stmt = stmt.join(Artist, Album.artist_id == Artist.id, isouter=True)
+    if "label" in requested:
+        stmt = stmt.join(Label, Album.label_id == Label.id, isouter=True)
+    if "collection" in requested:
+        stmt = stmt.join(
+            UserAlbumCollection,
+            and_(UserAlbumCollection.album_id == Album.id, UserAlbumCollection.user_id == user_id),
+            isouter=True,
+        )
+    return stmt
+
+
+async def _album_projection(session, album_id: int, requested: List[str], user_id: Optional[int]):
+    """Fiche album réduite aux champs demandés, en une requête."""
+    res = await session.execute(_album_detail_stmt(requested, user_id).where(Album.id == album_id))
+    row = res.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Album non trouvé")
+    return ALBUM_DETAIL_FIELDS.serialize(row, requested)
+
+
+# Déclaré avant /api/albums/{album_id}, qui capterait sinon le chemin
+@router.get("/api/albums/batch")
+async def get_albums_batch(
+    ids: List[str] = Query(..., description="Identifiants des albums (répétable : ?ids=1&ids=2, ou séparés par des virgules)"),
+    fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules (ex : id,title,cover_url)"),
+    user=Depends(get_optional_user)
+):
+    """
+    Fiches de plusieurs albums en une requête SQL (artiste, label et collection de l'appelant
+    en jointure), dans l'ordre demandé. Les identifiants inconnus sont listés dans `missing`.
+    """
+    try:
+        album_ids = list(dict.fromkeys(int(value) for value in _split_values(ids)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Identifiants d'albums invalides")
+    if not album_ids:
+        raise HTTPException(status_code=400, detail="Identifiants d'albums invalides")
+    if len(album_ids) > ALBUM_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"{ALBUM_BATCH_MAX_IDS} albums au plus par requête")
+    requested = ALBUM_DETAIL_FIELDS.parse(fields)
+    requested = _collection_access(requested, fields, user)
+    async with SessionLocal() as session:
+        res = await session.execute(
+            _album_detail_stmt(requested, user["id"] if user else None).where(Album.id.in_(album_ids))
+        )
+        albums = {row.id: ALBUM_DETAIL_FIELDS.serialize(row, requested) for row in res.all()}
+    return FastJSONResponse({
+        "albums": [albums[album_id] for album_id in album_ids if album_id in albums],
+        "missing": [album_id for album_id in album_ids if album_id not in albums],
+    })
+
+
 @router.get("/api/albums/{album_id}")
-async def get_album_details(album_id: int, request: Request):
-    user = None
-    roles = []
-    # Tente de décoder le token pour savoir si l'utilisateur est authentifié
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        from jwt_utils import decode_access_token
-        token = auth_header.split(" ", 1)[1]
-        payload = decode_access_token(token)
-        if payload:
-            user = payload
-            roles = payload.get("roles", [])
+async def get_album_details(
+    album_id: int,
+    fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules (ex : id,title,cover_url)"),
+    user=Depends(get_optional_user)
+):
+    requested = ALBUM_DETAIL_FIELDS.parse(fields)
+    requested = _collection_access(requested, fields, user)
+    public = [name for name in requested if name != "collection"]
+    version = catalog_state.version
+    cached = album_detail_cache.get(album_id)
+    if cached is not None and "collection" not in requested:
+        return FastJSONResponse({name: cached[name] for name in public})
     async with SessionLocal() as session:
-        album = await session.get(Album, album_id)
-        if not album:
-            raise HTTPException(status_code=404, detail="Album non trouvé")
-        artist = None
-        label = None
-        if album.artist_id:
-            artist = await session.get(Artist, album.artist_id)
-        if album.label_id:
-            label = await session.get(Label, album.label_id)
-        album_dict = {
-            "id": album.id,
-            "title": album.title,
-            "year": album.year,
-            "genre": album.genre,
-            "style": album.style,
-            "cover_url": album.cover_url,
-            "catno": album.catno,
-            "type": album.type,
-            "discogs_master_id": album.discogs_master_id,
-            "artist": {
-                "id": artist.id,
-                "name": artist.name,
-                "discogs_id": artist.discogs_id
-            } if artist else None,
-            "label": {
-                "id": label.id,
-                "name": label.name,
-                "discogs_id": label.discogs_id
-            } if label else None
-        }
-        # Ajoute les infos de collection si utilisateur authentifié et rôle utilisateur
-        if user and "utilisateur" in roles:
-            from models import UserAlbumCollection
-            res_coll = await session.execute(
-                select(UserAlbumCollection).where(
+        if cached is not None:
+            # Fiche en cache : seule la ligne de collection de l'appelant reste à lire
+            res = await session.execute(
+                select(UserAlbumCollection.cd, UserAlbumCollection.vinyl).where(
                     UserAlbumCollection.user_id == user["id"],
-                    UserAlbumCollection.album_id == album.id
+                    UserAlbumCollection.album_id == album_id
                 )
             )
-            coll = res_coll.scalar_one_or_none()
-            if coll:
-                album_dict["collection"] = {"cd": coll.cd, "vinyl": coll.vinyl}
-            else:
-                album_dict["collection"] = None
-        return album_dict
-    
+            coll = res.first()
+            album_dict = {name: cached[name] for name in public}
+            album_dict["collection"] = {"cd": coll.cd, "vinyl": coll.vinyl} if coll else None
+            return FastJSONResponse(album_dict)
+        # Une seule requête : artiste, label et collection de l'appelant en jointure externe
+        album_dict = await _album_projection(session, album_id, requested, user["id"] if user else None)
+    if fields is None:
+        album_detail_cache.set(album_id, {name: album_dict[name] for name in public}, version)
+    return FastJSONResponse(album_dict)
@@ -0,0 +1,273 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db import SessionLocal
+from models import Album, Artist, Label
+from discogs_ratelimit import PRIORITY_BACKGROUND
+from catalog_state import catalog_state
+
+logger = logging.getLogger("disco2000")
+
+# Import en lot : nombre d'appels Discogs simultanés et taille des transactions d'insertion
+BATCH_IMPORT_CONCURRENCY = int(os.getenv("BATCH_IMPORT_CONCURRENCY", "4"))
+BATCH_IMPORT_CHUNK_SIZE = int(os.getenv("BATCH_IMPORT_CHUNK_SIZE", "50"))
+
+CONFLICT_MASTER = "L'album existe déjà dans la base de données."
+CONFLICT_RELEASE_EXISTS = "Une release existe déjà pour ce titre, artiste et année. Impossible d'ajouter le master."
+CONFLICT_MASTER_EXISTS = "Un master existe déjà pour ce titre, artiste et année. Impossible d'ajouter la release."
+CONFLICT_DUPLICATE = "Doublon dans le lot."
+
+
+def _error_detail(error: Exception) -> str:
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error) or type(error).__name__
+
+
+async def fetch_discogs_items(
+    items: List[Tuple[int, str]],
+    concurrency: int = BATCH_IMPORT_CONCURRENCY,
+    client: Optional[httpx.AsyncClient] = None,
+) -> Dict[Tuple[int, str], Any]:
+    """
+    Récupère en parallèle (au plus `concurrency` appels en vol) les masters/releases Discogs.
+    Retourne pour chaque couple (discogs_id, discogs_type) distinct la réponse ou l'exception levée.
+    """
+    from main import fetch_discogs_master, fetch_discogs_release
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch_one(discogs_id: int, discogs_type: str):
+        async with semaphore:
+            try:
+                if discogs_type == "master":
+                    return await fetch_discogs_master(discogs_id, client=client, priority=PRIORITY_BACKGROUND)
+                return await fetch_discogs_release(discogs_id, client=client, priority=PRIORITY_BACKGROUND)
+            except Exception as e:
+                logger.error(f"Erreur lors de la récupération Discogs {discogs_type} {discogs_id} : {e}")
+                return e
+
+    distinct = list(dict.fromkeys(items))
+    fetched = await asyncio.gather(*(fetch_one(discogs_id, discogs_type) for discogs_id, discogs_type in distinct))
+    return dict(zip(distinct, fetched))
+
+
+async def _resolve_artists(session, discogs_items: List[Any]) -> Dict[str, int]:
+    """Retourne {nom: id} pour tous les artistes du lot, en créant les manquants (une fois par nom)."""
+    wanted = {}
+    for data in discogs_items:
+        if data.artiste and data.artiste not in wanted:
+            wanted[data.artiste] = (data.identifiants_discogs or {}).get("artist_id")
+    if not wanted:
+        return {}
+    res = await session.execute(select(Artist.name, Artist.id).where(Artist.name.in_(list(wanted))))
+    artist_ids = dict(res.all())
+    missing = [{"name": name, "discogs_id": discogs_id} for name, discogs_id in wanted.items() if name not in artist_ids]
+    if missing:
+        res = await session.execute(
+            pg_insert(Artist).values(missing)
+            .on_conflict_do_nothing(index_elements=[Artist.name])
+            .returning(Artist.name, Artist.id)
+        )
+        artist_ids.update(dict(res.all()))
+        logger.info(f"{len(missing)} nouveaux artistes insérés")
+        # Insertions concurrentes : relit ceux créés entre-temps par une autre requête
+        still_missing = [a["name"] for a in missing if a["name"] not in artist_ids]
+        if still_missing:
+            res = await session.execute(select(Artist.name, Artist.id).where(Artist.name.in_(still_missing)))
+            artist_ids.update(dict(res.all()))
+    return artist_ids
+
+
+async def _resolve_labels(session, discogs_items: List[Any]) -> Dict[int, int]:
+    """Retourne {discogs_id: id} pour le premier label de chaque album du lot, en créant les manquants."""
+    wanted = {}
+    for data in discogs_items:
+        if data.label and data.label[0].id is not None and data.label[0].id not in wanted:
+            wanted[data.label[0].id] = data.label[0].name
+    if not wanted:
+        return {}
+    res = await session.execute(select(Label.discogs_id, Label.id).where(Label.discogs_id.in_(list(wanted))))
+    label_ids = dict(res.all())
+    missing = [{"name": name, "discogs_id": discogs_id} for discogs_id, name in wanted.items() if discogs_id not in label_ids]
+    if missing:
+        res = await session.execute(
+            pg_insert(Label).values(missing)
+            .on_conflict_do_nothing(index_elements=[Label.discogs_id])
+            .returning(Label.discogs_id, Label.id)
+        )
+        label_ids.update(dict(res.all()))
+        logger.info(f"{len(missing)} nouveaux labels insérés")
+        still_missing = [l["discogs_id"] for l in missing if l["discogs_id"] not in label_ids]
+        if still_missing:
+            res = await session.execute(select(Label.discogs_id, Label.id).where(Label.discogs_id.in_(still_missing)))
+            label_ids.update(dict(res.all()))
+    return label_ids
+
+
+def _album_values(data, discogs_type: str, artist_ids: Dict[str, int], label_ids: Dict[int, int]) -> Dict[str, Any]:
+    label_info = data.label[0] if data.label else None
+    label_id = label_ids.get(label_info.id) if label_info and label_info.id is not None else None
+    return {
+        "title": data.titre,
+        "discogs_master_id": data.identifiants_discogs["master_id"] if discogs_type == "master" else None,
+        "discogs_release_id": data.identifiants_discogs.get("release_id") if discogs_type == "release" else None,
+        "year": data.annee,
+        "genre": data.genres if data.genres else [],
+        "style": data.styles if data.styles else [],
+        "cover_url": data.pochette,
+        "catno": label_info.catno if label_id else None,
+        "type": "Studio",
+        "artist_id": artist_ids.get(data.artiste) if data.artiste else None,
+        "label_id": label_id,
+        "discogs_link_type": discogs_type,
+    }
+
+
+def _album_key(values: Dict[str, Any]) -> Tuple:
+    return (values["discogs_master_id"], values["title"], values["year"], values["artist_id"], values["discogs_link_type"])
+
+
+async def import_discogs_albums(
+    items: List[Tuple[int, str]],
+    concurrency: int = BATCH_IMPORT_CONCURRENCY,
+    chunk_size: int = BATCH_IMPORT_CHUNK_SIZE,
+    client: Optional[httpx.AsyncClient] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Importe une liste de (discogs_id, discogs_type) comme albums studio.
+    Les appels Discogs sont parallélisés, artistes et labels résolus une seule fois par nom/id,
+    les albums insérés par transactions de `chunk_size`. Retourne un résultat par élément
+    (status : created, conflict ou error), dans l'ordre de la demande.
+    """
+    results: List[Dict[str, Any]] = [
+        {"discogs_id": discogs_id, "discogs_type": discogs_type, "status": None}
+        for discogs_id, discogs_type in items
+    ]
+    fetched = await fetch_discogs_items(items, concurrency=concurrency, client=client)
+
+    # Un seul import par couple (id, type) : les répétitions sont des doublons
+    pending: List[Tuple[int, Any]] = []
+    seen = set()
+    for index, (discogs_id, discogs_type) in enumerate(items):
+        data = fetched[(discogs_id, discogs_type)]
+        if isinstance(data, Exception):
+            results[index].update(status="error", detail=_error_detail(data))
+        elif (discogs_id, discogs_type) in seen:
+            results[index].update(status="conflict", detail=CONFLICT_DUPLICATE)
+        else:
+            seen.add((discogs_id, discogs_type))
+            pending.append((index, data))
+    if not pending:
+        return results
+
+    async with SessionLocal() as session:
+        try:
+            artist_ids = await _resolve_artists(session, [data for _, data in pending])
+            label_ids = await _resolve_labels(session, [data for _, data in pending])
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Erreur lors de la résolution des artistes/labels du lot : {e}")
+            for index, _ in pending:
+                results[index].update(status="error", detail=_error_detail(e))
+            return results
+
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            candidates = [
+                (index, _album_values(data, results[index]["discogs_type"], artist_ids, label_ids))
+                for index, data in chunk
+            ]
+            try:
+                to_insert = await _filter_conflicts(session, candidates, results)
+                if to_insert:
+                    res = await session.execute(
+                        pg_insert(Album).values([values for _, values in to_insert])
+                        .on_conflict_do_nothing(index_elements=[Album.discogs_master_id])
+                        .returning(
+                            Album.id, Album.discogs_master_id, Album.title, Album.year,
+                            Album.artist_id, Album.discogs_link_type
+                        )
+                    )
+                    inserted = {tuple(row[1:]): row[0] for row in res.all()}
+                    await session.commit()
+                    if inserted:
+                        catalog_state.album_catalog_changed(delta=len(inserted))
+                    for index, values in to_insert:
+                        album_id = inserted.get(_album_key(values))
+                        if album_id is None:
+                            # Inséré entre-temps par une autre requête (contrainte d'unicité)
+                            results[index].update(status="conflict", detail=CONFLICT_MASTER)
+                        else:
+                            results[index].update(status="created", album_id=album_id)
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Erreur lors de l'insertion d'un lot d'albums : {e}")
+                for index, _ in chunk:
+                    if results[index]["status"] is None:
+                        results[index].update(status="error", detail=_error_detail(e))
+    created = sum(1 for r in results if r["status"] == "created")
+    logger.info(f"Import en lot terminé : {created}/{len(items)} albums créés")
+    return results
+
+
+async def _filter_conflicts(session, candidates, results) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Applique les règles d'unicité de l'import unitaire (master unique, pas de master et de release
+    pour un même titre/artiste/année) en deux requêtes pour tout le lot.
+    """
+    master_ids = [v["discogs_master_id"] for _, v in candidates if v["discogs_master_id"] is not None]
+    existing_masters = set()
+    if master_ids:
+        res = await session.execute(select(Album.discogs_master_id).where(Album.discogs_master_id.in_(master_ids)))
+        existing_masters = set(res.scalars().all())
+    triples = {(v["title"], v["year"], v["artist_id"]) for _, v in candidates}
+    # Un NULL ne vérifie jamais IN : année ou artiste absents comparés avec IS NOT DISTINCT FROM,
+    # comme le `== None` (IS NULL) de l'import unitaire
+    complete = [t for t in triples if None not in t]
+    with_nulls = [t for t in triples if None in t]
+    conditions = [tuple_(Album.title, Album.year, Album.artist_id).in_(complete)] if complete else []
+    conditions += [
+        and_(
+            Album.title.is_not_distinct_from(title),
+            Album.year.is_not_distinct_from(year),
+            Album.artist_id.is_not_distinct_from(artist_id),
+        )
+        for title, year, artist_id in with_nulls
+    ]
+    existing_links = set()
+    if conditions:
+        res = await session.execute(
+            select(Album.title, Album.year, Album.artist_id, Album.discogs_link_type).where(or_(*conditions))
+        )
+        existing_links = {tuple(row) for row in res.all()}
+
+    to_insert = []
+    keys = set()
+    for index, values in candidates:
+        triple = (values["title"], values["year"], values["artist_id"])
+        if values["discogs_link_type"] == "master":
+            if values["discogs_master_id"] in existing_masters:
+                results[index].update(status="conflict", detail=CONFLICT_MASTER)
+                continue
+            if triple + ("release",) in existing_links:
+                results[index].update(status="conflict", detail=CONFLICT_RELEASE_EXISTS)
+                continue
+        elif triple + ("master",) in existing_links:
+            results[index].update(status="conflict", detail=CONFLICT_MASTER_EXISTS)
+            continue
+        if _album_key(values) in keys:
+            results[index].update(status="conflict", detail=CONFLICT_DUPLICATE)
+            continue
+        keys.add(_album_key(values))
+        # Un master et une release du même album dans le même lot s'excluent aussi
+        existing_links.add(triple + (values["discogs_link_type"],))
+        to_insert.append((index, values))
+    return to_insert
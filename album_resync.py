@@ -0,0 +1,279 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db import SessionLocal
+from models import Album, AlbumDiscogsSync, ResyncCursor
+from discogs_cache import discogs_cache
+from catalog_state import catalog_state
+from discogs_ratelimit import discogs_rate_limiter, PRIORITY_BACKGROUND
+import discogs_utils
+
+logger = logging.getLogger("disco2000")
+
+# Resynchronisation des albums avec Discogs (opt-in, surchargeable via .env)
+ALBUM_RESYNC_ENABLED = os.getenv("ALBUM_RESYNC_ENABLED", "0") in ("1", "true", "True")
+# Plafond propre à la resynchronisation (req/min), en plus du quota global partagé avec l'API
+ALBUM_RESYNC_RATE = float(os.getenv("ALBUM_RESYNC_RATE", "20"))
+ALBUM_RESYNC_CHUNK_SIZE = int(os.getenv("ALBUM_RESYNC_CHUNK_SIZE", "100"))
+# Pause entre deux passes complètes sur la table albums (s)
+ALBUM_RESYNC_PASS_INTERVAL = float(os.getenv("ALBUM_RESYNC_PASS_INTERVAL", str(24 * 3600)))
+
+CURSOR_NAME = "albums"
+SYNCED_FIELDS = ("genre", "style", "cover_url", "year")
+
+
+def album_resource(discogs_link_type: Optional[str], discogs_master_id: Optional[int], discogs_release_id: Optional[int]) -> Optional[Tuple[str, int]]:
+    """Ressource Discogs liée à l'album, ou None (release importée avant discogs_release_id)."""
+    if discogs_link_type == "release":
+        return ("releases", discogs_release_id) if discogs_release_id else None
+    return ("masters", discogs_master_id) if discogs_master_id else None
+
+
+def synced_values(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs de l'album dérivés de la réponse Discogs (mêmes règles qu'à l'import)."""
+    return {
+        "genre": data.get("genres") or [],
+        "style": data.get("styles") or [],
+        "cover_url": discogs_utils.extract_pochette(data.get("images", [])),
+        "year": data.get("year"),
+    }
+
+
+def content_hash(values: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def fetch_conditional(
+    kind: str,
+    discogs_id: int,
+    client: httpx.AsyncClient,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+):
+    """
+    GET Discogs soumis au quota (priorité basse), avec If-None-Match / If-Modified-Since
+    quand des validateurs ont été mémorisés. Le cache est contourné : on veut l'état actuel.
+    """
+    headers = discogs_utils.get_discogs_headers()
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    url = f"{discogs_utils.DISCOGS_API_URL}/{kind}/{discogs_id}"
+    return await discogs_rate_limiter.get(client, url, headers, priority=PRIORITY_BACKGROUND)
+
+
+async def claim_chunk(chunk_size: int) -> Tuple[List[Any], int, int]:
+    """
+    Lit le prochain lot d'albums (parcours par id croissant) à partir du curseur, sans
+    l'avancer : le curseur n'est enregistré qu'avec les mises à jour du lot (apply_changes),
+    un lot interrompu est donc repris au prochain démarrage.
+    Retourne (lignes, position du curseur, nombre de passes terminées).
+    """
+    async with SessionLocal() as session:
+        await session.execute(
+            pg_insert(ResyncCursor).values(name=CURSOR_NAME, last_id=0, passes=0)
+            .on_conflict_do_nothing(index_elements=[ResyncCursor.name])
+        )
+        res = await session.execute(select(ResyncCursor.last_id, ResyncCursor.passes).where(ResyncCursor.name == CURSOR_NAME))
+        start_id, passes = res.one()
+        res = await session.execute(
+            select(
+                Album.id, Album.discogs_link_type, Album.discogs_master_id, Album.discogs_release_id,
+                Album.genre, Album.style, Album.cover_url, Album.year,
+                AlbumDiscogsSync.etag, AlbumDiscogsSync.last_modified, AlbumDiscogsSync.content_hash,
+            )
+            .outerjoin(AlbumDiscogsSync, AlbumDiscogsSync.album_id == Album.id)
+            .where(Album.id > start_id)
+            .order_by(Album.id)
+            .limit(chunk_size)
+        )
+        rows = res.all()
+        await session.commit()
+    return rows, start_id, passes
+
+
+async def apply_changes(
+    album_updates: List[Dict[str, Any]],
+    sync_rows: List[Dict[str, Any]],
+    cursor: Optional[Tuple[int, int, int]] = None,
+) -> None:
+    """
+    Écrit en une transaction les albums modifiés, les validateurs mis à jour et, si `cursor`
+    (position lue, nouvelle position, passes) est fourni, l'avancée du curseur.
+    """
+    if not album_updates and not sync_rows and cursor is None:
+        return
+    async with SessionLocal() as session:
+        if album_updates:
+            # UPDATE par clé primaire, groupé (executemany)
+            await session.execute(update(Album), album_updates)
+        if sync_rows:
+            stmt = pg_insert(AlbumDiscogsSync).values(sync_rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AlbumDiscogsSync.album_id],
+                set_={
+                    "etag": stmt.excluded.etag,
+                    "last_modified": stmt.excluded.last_modified,
+                    "content_hash": stmt.excluded.content_hash,
+                    "synced_at": stmt.excluded.synced_at,
+                },
+            )
+            await session.execute(stmt)
+        if cursor is not None:
+            start_id, last_id, passes = cursor
+            # Ne recule pas un curseur déjà avancé par une autre instance sur le même lot
+            # (les écritures d'un lot traité deux fois sont idempotentes)
+            await session.execute(
+                update(ResyncCursor)
+                .where(ResyncCursor.name == CURSOR_NAME, ResyncCursor.last_id == start_id)
+                .values(last_id=last_id, passes=passes)
+            )
+        await session.commit()
+    if album_updates:
+        # L'année fait partie des filtres : les totaux en cache ne sont plus fiables
+        catalog_state.album_catalog_changed(delta=0)
+
+
+class AlbumResyncer:
+    """
+    Rafraîchit en continu genres, styles, pochette et année des albums depuis Discogs.
+    Parcourt la table par lots (keyset sur id), à un débit plafonné, et n'écrit que les
+    albums dont l'empreinte du contenu a changé. Tâche de fond dans le process de l'API.
+    """
+
+    def __init__(
+        self,
+        rate: float = ALBUM_RESYNC_RATE,
+        chunk_size: int = ALBUM_RESYNC_CHUNK_SIZE,
+        pass_interval: float = ALBUM_RESYNC_PASS_INTERVAL,
+    ):
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.pass_interval = pass_interval
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"checked": 0, "updated": 0, "unchanged": 0, "not_modified": 0, "skipped": 0, "errors": 0}
+        self.passes = 0
+
+    async def _pace(self) -> None:
+        if self.rate > 0:
+            await asyncio.sleep(60.0 / self.rate)
+
+    async def sync_chunk(self, client: Optional[httpx.AsyncClient] = None) -> int:
+        """Traite un lot ; retourne le nombre d'albums parcourus (0 en fin de passe)."""
+        client = client or discogs_utils.get_discogs_client()
+        rows, start_id, self.passes = await claim_chunk(self.chunk_size)
+        if not rows:
+            # Fin de table : la prochaine passe repart du début
+            self.passes += 1
+            await apply_changes([], [], cursor=(start_id, 0, self.passes))
+            return 0
+        album_updates: List[Dict[str, Any]] = []
+        sync_rows: List[Dict[str, Any]] = []
+        now = datetime.now(timezone.utc)
+        last_id = start_id
+        try:
+            for row in rows:
+                await self._sync_row(row, client, now, album_updates, sync_rows)
+                last_id = row.id
+        finally:
+            # Même interrompu (arrêt de l'API), le travail déjà fait est enregistré avec le
+            # curseur, qui s'arrête au dernier album entièrement traité
+            await apply_changes(album_updates, sync_rows, cursor=(start_id, last_id, self.passes))
+        if album_updates:
+            logger.info(f"Resynchronisation : {len(album_updates)} albums mis à jour sur {len(rows)}")
+        return len(rows)
+
+    async def _sync_row(
+        self,
+        row: Any,
+        client: httpx.AsyncClient,
+        now: datetime,
+        album_updates: List[Dict[str, Any]],
+        sync_rows: List[Dict[str, Any]],
+    ) -> None:
+        resource = album_resource(row.discogs_link_type, row.discogs_master_id, row.discogs_release_id)
+        if resource is None:
+            self.counters["skipped"] += 1
+            return
+        kind, discogs_id = resource
+        await self._pace()
+        self.counters["checked"] += 1
+        try:
+            response = await fetch_conditional(kind, discogs_id, client, row.etag, row.last_modified)
+        except httpx.HTTPError as e:
+            self.counters["errors"] += 1
+            logger.warning(f"Resynchronisation : {kind}/{discogs_id} injoignable : {e}")
+            return
+        if response.status_code == 304:
+            self.counters["not_modified"] += 1
+            return
+        if response.status_code != 200:
+            self.counters["errors"] += 1
+            logger.warning(f"Resynchronisation : Discogs a répondu {response.status_code} pour {kind}/{discogs_id}")
+            return
+        data = response.json()
+        await discogs_cache.set(kind, discogs_id, data)
+        values = synced_values(data)
+        new_hash = content_hash(values)
+        current_hash = content_hash({field: getattr(row, field) for field in SYNCED_FIELDS})
+        if new_hash != current_hash:
+            album_updates.append({"id": row.id, **values})
+            self.counters["updated"] += 1
+        else:
+            self.counters["unchanged"] += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if (new_hash, etag, last_modified) != (row.content_hash, row.etag, row.last_modified):
+            sync_rows.append({
+                "album_id": row.id, "etag": etag, "last_modified": last_modified,
+                "content_hash": new_hash, "synced_at": now,
+            })
+
+    async def run(self) -> None:
+        while True:
+            try:
+                processed = await self.sync_chunk()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Resynchronisation interrompue : {e}")
+                processed = 0
+                await asyncio.sleep(60)
+            if processed == 0:
+                logger.info(f"Resynchronisation : passe {self.passes} terminée, prochaine dans {self.pass_interval:.0f}s")
+                await asyncio.sleep(self.pass_interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+            logger.info("Resynchronisation des albums démarrée.")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            logger.info("Resynchronisation des albums arrêtée.")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": ALBUM_RESYNC_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "rate_per_minute": self.rate,
+            "chunk_size": self.chunk_size,
+            "passes": self.passes,
+            **self.counters,
+        }
+
+
+album_resyncer = AlbumResyncer()
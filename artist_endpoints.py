@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from pydantic import BaseModel, field_validator
-from sqlalchemy import select
+from sqlalchemy import select, or_, func
 from db import SessionLocal
+from json_response import FastJSONResponse
 from models import Artist
 from auth_dependencies import get_current_user_contributeur
+from search_utils import contains_pattern
+from catalog_state import catalog_state
+from fieldsets import FieldSet
 from country_utils import (
     is_valid_country_code,
     normalize_country_code,
@@ -14,7 +18,20 @@ import logging
 
 logger = logging.getLogger("disco2000")
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+# Champs des artistes (paramètre fields=)
+ARTIST_FIELDS = FieldSet({
+    "id": ((Artist.id,), lambda a: a.id),
+    "name": ((Artist.name,), lambda a: a.name),
+    "discogs_id": ((Artist.discogs_id,), lambda a: a.discogs_id),
+    "country": ((Artist.country,), lambda a: a.country),
+    "country_name": ((Artist.country,), lambda a: get_country_name(a.country) if a.country else None),
+})
+# La fiche artiste ne renvoie pas le nom du pays par défaut
+ARTIST_DETAIL_FIELDS = FieldSet(ARTIST_FIELDS.fields, always=(Artist.id,), default=("id", "name", "discogs_id", "country"))
+
+FIELDS_QUERY_DESCRIPTION = "Champs à renvoyer, séparés par des virgules (ex : id,name)"
 
 
 class ArtistUpdateRequest(BaseModel):
@@ -45,45 +62,42 @@ async def get_countries():
 
 @router.get("/api/artists/search")
 async def search_artists(
-    q: str = Query(..., description="Chaîne de caractères à rechercher dans le nom de l'artiste", min_length=1)
+    q: str = Query(..., description="Chaîne de caractères à rechercher dans le nom de l'artiste", min_length=1),
+    limit: int = Query(20, ge=1, le=100, description="Nombre maximum de résultats"),
+    fields: str | None = Query(None, description=FIELDS_QUERY_DESCRIPTION)
 ):
     """
-    Recherche des artistes par nom (recherche partielle insensible à la casse).
+    Recherche des artistes par nom (recherche partielle insensible à la casse, tolérante aux fautes de frappe).
     
     Args:
         q: Chaîne de caractères à rechercher (minimum 1 caractère)
+        limit: Nombre maximum de résultats (20 par défaut)
+        fields: Champs à renvoyer (tous par défaut), seules leurs colonnes sont lues
         
     Returns:
-        Liste des artistes dont le nom contient la chaîne recherchée
+        Liste des artistes dont le nom contient la chaîne recherchée ou lui ressemble,
+        les plus proches en premier
     """
+    requested = ARTIST_FIELDS.parse(fields)
     async with SessionLocal() as session:
-        # Recherche insensible à la casse avec ILIKE (PostgreSQL)
-        stmt = select(Artist).where(Artist.name.ilike(f"%{q}%")).order_by(Artist.name)
+        # ILIKE et opérateur de similarité % : tous deux servis par l'index trigramme ix_artists_name_trgm
+        stmt = (
+            select(*ARTIST_FIELDS.columns(requested))
+            .where(or_(Artist.name.ilike(contains_pattern(q), escape="\\"), Artist.name.op("%")(q)))
+            .order_by(func.similarity(Artist.name, q).desc(), Artist.name)
+            .limit(limit)
+        )
         res = await session.execute(stmt)
-        artists = res.scalars().all()
-        
-        return [{
-            "id": a.id,
-            "name": a.name,
-            "discogs_id": a.discogs_id,
-            "country": a.country,
-            "country_name": get_country_name(a.country) if a.country else None
-        } for a in artists]
+        return FastJSONResponse([ARTIST_FIELDS.serialize(a, requested) for a in res.all()])
 
 
 @router.get("/api/artists")
-async def get_artists():
-    """Récupère la liste de tous les artistes avec leurs pays."""
+async def get_artists(fields: str | None = Query(None, description=FIELDS_QUERY_DESCRIPTION)):
+    """Récupère la liste de tous les artistes avec leurs pays (colonnes limitées aux champs demandés)."""
+    requested = ARTIST_FIELDS.parse(fields)
     async with SessionLocal() as session:
-        res = await session.execute(select(Artist))
-        artists = res.scalars().all()
-        return [{
-            "id": a.id,
-            "name": a.name,
-            "discogs_id": a.discogs_id,
-            "country": a.country,
-            "country_name": get_country_name(a.country) if a.country else None
-        } for a in artists]
+        res = await session.execute(select(*ARTIST_FIELDS.columns(requested)))
+        return FastJSONResponse([ARTIST_FIELDS.serialize(a, requested) for a in res.all()])
 
 
 @router.patch("/api/artists/{artist_id}")
@@ -105,6 +119,7 @@ async def update_artist(
             logger.info(f"Mise à jour du pays de l'artiste {artist.name} (id={artist.id}) : {update_data.country} ({country_name})")
         
         await session.commit()
+        catalog_state.catalog_changed()
         
         return {
             "id": artist.id,
@@ -116,16 +131,18 @@ async def update_artist(
 
 
 @router.get("/api/artists/{artist_id}")
-async def get_artist(artist_id: int = Path(..., description="ID de l'artiste")):
+async def get_artist(
+    artist_id: int = Path(..., description="ID de l'artiste"),
+    fields: str | None = Query(None, description=FIELDS_QUERY_DESCRIPTION)
+):
     """Récupère les informations détaillées d'un artiste."""
+    requested = ARTIST_DETAIL_FIELDS.parse(fields)
     async with SessionLocal() as session:
-        artist = await session.get(Artist, artist_id)
+        res = await session.execute(
+            select(*ARTIST_DETAIL_FIELDS.columns(requested)).where(Artist.id == artist_id)
+        )
+        artist = res.first()
         if not artist:
             raise HTTPException(status_code=404, detail="Artiste non trouvé")
         
-        return {
-            "id": artist.id,
-            "name": artist.name,
-            "discogs_id": artist.discogs_id,
-            "country": artist.country
-        }
+        return FastJSONResponse(ARTIST_DETAIL_FIELDS.serialize(artist, requested))
@@ -1,6 +1,15 @@
 from fastapi import Header, HTTPException, Depends, Request
 from jwt_utils import decode_access_token
 
+def get_optional_user(request: Request):
+    # Endpoints publics enrichis pour les utilisateurs connectés : token absent ou invalide -> None
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    token = auth_header.split(" ", 1)[1]
+    return decode_access_token(token) or None
+
+
 def get_current_user_utilisateur(request: Request):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
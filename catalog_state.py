@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import literal_column, select, table, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from models import CacheVersion
+
+logger = logging.getLogger("disco2000")
+
+# Cache des totaux de GET /api/albums (surchargeable via .env)
+ALBUM_COUNT_CACHE_TTL = float(os.getenv("ALBUM_COUNT_CACHE_TTL", "300"))
+ALBUM_COUNT_CACHE_MAX_ENTRIES = int(os.getenv("ALBUM_COUNT_CACHE_MAX_ENTRIES", "256"))
+# Cache des fiches album (partie commune à tous les utilisateurs)
+ALBUM_DETAIL_CACHE_TTL = float(os.getenv("ALBUM_DETAIL_CACHE_TTL", "30"))
+ALBUM_DETAIL_CACHE_MAX_ENTRIES = int(os.getenv("ALBUM_DETAIL_CACHE_MAX_ENTRIES", "2048"))
+
+
+def statement_key(stmt) -> Tuple:
+    """Signature d'une requête (SQL + paramètres) : deux jeux de filtres identiques donnent la même clé."""
+    compiled = stmt.compile()
+    return str(compiled), tuple((name, repr(value)) for name, value in sorted(compiled.params.items()))
+
+
+class CatalogState:
+    """
+    État partagé du catalogue d'albums dans le process : numéro de version (incrémenté à
+    chaque modification d'album, d'artiste ou de label), totaux exacts mis en cache par
+    signature de filtres et compteur global d'albums entretenu au fil des insertions/suppressions.
+    Les autres instances de l'API ne voient pas ces invalidations : le TTL borne l'écart.
+    Les versions visibles de toutes les instances sont lues par read_versions.
+    """
+
+    def __init__(self, ttl: float = ALBUM_COUNT_CACHE_TTL, max_entries: int = ALBUM_COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = 0
+        self._counts: "OrderedDict[Hashable, Tuple[float, int]]" = OrderedDict()
+        self._album_total: Optional[Tuple[float, int]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def album_catalog_changed(self, delta: Optional[int] = None) -> None:
+        """
+        À appeler après tout commit qui ajoute, supprime ou modifie des albums.
+        `delta` : variation du nombre d'albums si connue (0 pour une simple mise à jour).
+        """
+        self.catalog_changed()
+        self._counts.clear()
+        if delta is None:
+            self._album_total = None
+        elif delta and self._album_total is not None:
+            fetched_at, total = self._album_total
+            self._album_total = (fetched_at, max(0, total + delta))
+
+    def catalog_changed(self) -> None:
+        """Modification qui ne touche pas aux totaux d'albums (ex. pays d'un artiste)."""
+        self.version += 1
+
+    def get_count(self, key: Hashable) -> Optional[int]:
+        entry = self._counts.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            return None
+        self._counts.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set_count(self, key: Hashable, value: int) -> None:
+        self._counts[key] = (time.monotonic(), value)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+
+    @property
+    def album_total(self) -> Optional[int]:
+        """Nombre total d'albums entretenu (None s'il n'a jamais été compté ou s'il est trop ancien)."""
+        if self._album_total is None or time.monotonic() - self._album_total[0] > self.ttl:
+            return None
+        return self._album_total[1]
+
+    def set_album_total(self, value: int) -> None:
+        self._album_total = (time.monotonic(), value)
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._album_total = None
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "cached_counts": len(self._counts),
+            "album_total": self.album_total,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+catalog_state = CatalogState()
+
+# Séquence incrémentée par les triggers à chaque écriture du catalogue (sql/15)
+CATALOG_VERSION_SEQUENCE = "catalog_version_seq"
+
+
+def collection_scope(user_id: int) -> str:
+    return f"collection:{user_id}"
+
+
+async def read_versions(session, user_id: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """
+    Versions partagées entre instances, en une seule requête : catalogue lu dans la séquence
+    catalog_version_seq (les écrivains n'y prennent aucun verrou de ligne), collection de
+    `user_id` dans cache_versions.
+    """
+    stmt = select(literal_column("last_value")).select_from(table(CATALOG_VERSION_SEQUENCE))
+    if user_id is not None:
+        stmt = stmt.add_columns(
+            select(CacheVersion.version).where(CacheVersion.scope == collection_scope(user_id)).scalar_subquery()
+        )
+    row = (await session.execute(stmt)).one()
+    collection_version = (row[1] or 0) if user_id is not None else None
+    return int(row[0]), collection_version
+
+
+class AlbumDetailCache:
+    """
+    Fiches album sans la collection de l'appelant, par id, avec un TTL court. Chaque entrée
+    porte la version du catalogue : toute écriture d'album, d'artiste ou de label la périme.
+    """
+
+    def __init__(self, ttl: float = ALBUM_DETAIL_CACHE_TTL, max_entries: int = ALBUM_DETAIL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, album_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(album_id)
+        if entry is None or entry[1] != catalog_state.version or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(album_id)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, album_id: int, value: Dict[str, Any], version: int) -> None:
+        """`version` : version du catalogue relevée avant la lecture (une écriture concurrente périme l'entrée)."""
+        if self.ttl <= 0:
+            return
+        self._entries[album_id] = (time.monotonic(), version, value)
+        self._entries.move_to_end(album_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+album_detail_cache = AlbumDetailCache()
+
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN (FORMAT JSON) d'une requête, compilé avec ses paramètres liés : mêmes types
+    (varchar[] des filtres genre/style) et aucune saisie utilisateur recopiée dans le SQL.
+    """
+    inherit_cache = False
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.stmt, **kw)
+
+
+async def estimate_rows(session, stmt) -> Optional[int]:
+    """Nombre de lignes estimé par le planificateur PostgreSQL (EXPLAIN, sans exécuter la requête)."""
+    res = await session.execute(Explain(stmt))
+    plan = res.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+async def estimate_table_rows(session, table_name: str) -> Optional[int]:
+    """Estimation pg_class.reltuples (mise à jour par VACUUM/ANALYZE) ; None si la table n'a jamais été analysée."""
+    res = await session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"), {"name": table_name}
+    )
+    value = res.scalar()
+    return int(value) if value is not None and value >= 0 else None
+
+
+async def count_with_mode(session, count_stmt, rows_stmt, has_filters: bool, mode: str) -> Tuple[Optional[int], bool]:
+    """
+    Total d'une liste d'albums selon le mode demandé ; retourne (total, estimé ?).
+    - exact : COUNT(*) mis en cache par signature de filtres jusqu'à la prochaine modification du catalogue
+    - estimated : total exact déjà en cache, sinon compteur entretenu (sans filtre) ou estimation du planificateur
+    - none : pas de total
+    """
+    if mode == "none":
+        return None, False
+    key = statement_key(count_stmt)
+    cached = catalog_state.get_count(key)
+    if cached is not None:
+        return cached, False
+    if mode == "estimated":
+        estimate = catalog_state.album_total if not has_filters else None
+        if estimate is not None:
+            return estimate, False
+        try:
+            # SAVEPOINT : une erreur de l'EXPLAIN annule la transaction PostgreSQL, le COUNT de repli
+            # doit repartir d'un état valide
+            async with session.begin_nested():
+                if has_filters:
+                    estimate = await estimate_rows(session, rows_stmt)
+                else:
+                    estimate = await estimate_table_rows(session, "albums")
+        except Exception as e:
+            logger.warning(f"Estimation du nombre d'albums impossible : {e}")
+            estimate = None
+        if estimate is not None:
+            return estimate, True
+    res = await session.execute(count_stmt)
+    total = res.scalar()
+    catalog_state.set_count(key, total)
+    if not has_filters:
+        catalog_state.set_album_total(total)
+    return total, False
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from db import SessionLocal
+from json_response import FastJSONResponse
 from models import UserAlbumCollection, Album
 from auth_dependencies import get_current_user_utilisateur
 from pydantic import BaseModel
 from typing import Optional
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 class CollectionUpdateRequest(BaseModel):
     album_id: int
@@ -47,7 +48,7 @@ async def get_user_collection(user=Depends(get_current_user_utilisateur)):
             select(UserAlbumCollection).where(UserAlbumCollection.user_id == user["id"])
         )
         collection = res.scalars().all()
-        return [
+        return FastJSONResponse([
             {"album_id": c.album_id, "cd": c.cd, "vinyl": c.vinyl}
             for c in collection
-        ]
+        ])
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy import select, func
 from db import SessionLocal
+from json_response import FastJSONResponse
 from models import UserAlbumCollection, Album, Artist
 from auth_dependencies import get_current_user_utilisateur
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 @router.get("/api/collection/stats")
 async def get_collection_stats(user=Depends(get_current_user_utilisateur)):
@@ -34,7 +35,7 @@ async def get_collection_stats(user=Depends(get_current_user_utilisateur)):
             if year:
                 year_count[year] = year_count.get(year, 0) + 1
         top_year = max(year_count.items(), key=lambda x: x[1]) if year_count else (None, 0)
-        return {
+        return FastJSONResponse({
             "total_discs": total_discs,
             "total_cd": total_cd,
             "total_vinyl": total_vinyl,
@@ -42,4 +43,4 @@ async def get_collection_stats(user=Depends(get_current_user_utilisateur)):
             "top_artist_count": top_artist[1],
             "top_year": top_year[0],
             "top_year_count": top_year[1]
-        }
+        })
@@ -0,0 +1,136 @@
+import os
+import re
+import time
+import hashlib
+import logging
+from typing import Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from db import SessionLocal
+from catalog_state import read_versions
+from jwt_utils import decode_access_token
+
+logger = logging.getLogger("disco2000")
+
+# Requêtes conditionnelles sur les GET du catalogue (surchargeable via .env)
+CONDITIONAL_GET_ENABLED = os.getenv("CONDITIONAL_GET_ENABLED", "1") in ("1", "true", "True")
+# Filet de sécurité si une écriture échappe aux triggers de version (migration non appliquée,
+# lecture entre une écriture et son commit) : un ETag n'est plus reconnu au-delà de cette durée (s)
+CONDITIONAL_GET_TTL = float(os.getenv("CONDITIONAL_GET_TTL", "300"))
+
+# Routes dont la réponse ne dépend que du catalogue et de la collection de l'appelant
+CONDITIONAL_GET_PATHS = (
+    r"/api/albums",
+    r"/api/albums/stats",
+    r"/api/albums/batch",
+    r"/api/albums/\d+",
+    r"/api/artists",
+    r"/api/artists/search",
+    r"/api/artists/\d+",
+    r"/api/countries",
+    r"/api/statistics/[\w-]+",
+    r"/api/search",
+    r"/api/collection",
+    r"/api/collection/stats",
+)
+
+
+
+def _user_id(headers: Headers) -> Optional[int]:
+    auth_header = headers.get("authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    payload = decode_access_token(auth_header.split(" ", 1)[1])
+    return payload.get("id") if payload else None
+
+
+async def request_versions(scope: Scope, user_id: Optional[int]) -> Tuple[int, Optional[int]]:
+    """
+    Versions partagées (catalogue, collection de l'appelant) lues une seule fois par requête,
+    puis conservées dans le scope ASGI pour les autres middlewares.
+    """
+    cached = scope.setdefault("disco2000.cache_versions", {})
+    if user_id not in cached:
+        async with SessionLocal() as session:
+            cached[user_id] = await read_versions(session, user_id)
+    return cached[user_id]
+
+
+def compute_etag(
+    path: str,
+    query_string: str,
+    user_id: Optional[int],
+    catalog_version: int,
+    collection_version: Optional[int] = None,
+    ttl: float = CONDITIONAL_GET_TTL,
+) -> str:
+    """
+    ETag fort d'une représentation : version du catalogue, version de la collection de
+    l'appelant (toutes deux partagées entre instances) et URL complète.
+    """
+    window = int(time.time() // ttl) if ttl > 0 else 0
+    key = f"{window}|{catalog_version}|{user_id}|{collection_version}|{path}?{query_string}"
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible de If-None-Match (RFC 9110) : liste d'ETags, préfixe W/ ou *."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ConditionalGetMiddleware:
+    """
+    Ajoute un ETag aux réponses 200 des GET du catalogue et répond 304 Not Modified, sans
+    appeler l'endpoint (une seule lecture de cache_versions au lieu de ses requêtes), quand
+    If-None-Match désigne la version courante.
+    La clé API est vérifiée avant de répondre 304 ; sinon la requête suit son cours normal.
+    """
+
+    def __init__(self, app: ASGIApp, api_key: Optional[str] = None, paths: Sequence[str] = CONDITIONAL_GET_PATHS):
+        self.app = app
+        self.api_key = api_key
+        self.pattern = re.compile("|".join(f"(?:{p})" for p in paths))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            not CONDITIONAL_GET_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not self.pattern.fullmatch(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        user_id = _user_id(headers)
+        try:
+            catalog_version, collection_version = await request_versions(scope, user_id)
+        except Exception as e:
+            # Versions illisibles : pas d'ETag plutôt qu'un ETag qui ne suivrait pas les écritures
+            logger.warning(f"Versions du catalogue illisibles, requête servie sans ETag : {e}")
+            await self.app(scope, receive, send)
+            return
+        etag = compute_etag(
+            scope["path"], scope.get("query_string", b"").decode("latin-1"), user_id, catalog_version, collection_version
+        )
+        response_headers = [(b"etag", etag.encode("latin-1"))]
+        if user_id is not None:
+            response_headers.append((b"vary", b"Authorization"))
+        api_key_ok = self.api_key is not None and headers.get("x-api-key") == self.api_key
+        if api_key_ok and etag_matches(headers.get("if-none-match"), etag):
+            await send({"type": "http.response.start", "status": 304, "headers": response_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                mutable = MutableHeaders(scope=message)
+                for name, value in response_headers:
+                    mutable.append(name.decode("latin-1"), value.decode("latin-1"))
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
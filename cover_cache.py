@@ -0,0 +1,225 @@
+import os
+import io
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from discogs_utils import DiscogsHTTPError, SingleFlight
+
+logger = logging.getLogger("disco2000")
+
+# Proxy des pochettes (surchargeable via .env)
+COVER_CACHE_DIR = os.getenv("COVER_CACHE_DIR", ".cache/covers")
+COVER_CACHE_MAX_BYTES = int(os.getenv("COVER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+COVER_THUMBNAIL_SIZES = [int(s) for s in os.getenv("COVER_THUMBNAIL_SIZES", "150,300,600").split(",") if s.strip()]
+COVER_THUMBNAIL_QUALITY = int(os.getenv("COVER_THUMBNAIL_QUALITY", "85"))
+# Miniature proposée dans les listes d'albums (cover_thumbnail_url)
+COVER_LIST_SIZE = int(os.getenv("COVER_LIST_SIZE", "300"))
+if COVER_LIST_SIZE not in COVER_THUMBNAIL_SIZES:
+    COVER_THUMBNAIL_SIZES.append(COVER_LIST_SIZE)
+# URL publique de l'API (ex. https://api.example.com) : le front étant servi depuis une autre origine,
+# cover_url ne pointe vers le proxy que si ce préfixe est défini (sinon URL Discogs d'origine)
+COVER_PROXY_BASE_URL = os.getenv("COVER_PROXY_BASE_URL", "").rstrip("/")
+
+_IMAGE_TYPES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+]
+
+
+def cover_version(source_url: str) -> str:
+    """Empreinte courte de l'URL d'origine : change quand la pochette de l'album change."""
+    return hashlib.sha256(source_url.encode("utf-8")).hexdigest()[:12]
+
+
+def cover_proxy_path(album_id: int, source_url: str, size: Optional[int] = None) -> str:
+    """Chemin de la pochette sur le proxy (versionné, donc cacheable indéfiniment)."""
+    path = f"/api/covers/{album_id}?v={cover_version(source_url)}"
+    if size:
+        path += f"&size={size}"
+    return path
+
+
+def cover_proxy_url(album_id: int, source_url: Optional[str], size: Optional[int] = None) -> Optional[str]:
+    """URL absolue de la pochette servie par le proxy, ou URL d'origine si COVER_PROXY_BASE_URL n'est pas défini."""
+    if not source_url:
+        return None
+    if not COVER_PROXY_BASE_URL:
+        return source_url
+    return COVER_PROXY_BASE_URL + cover_proxy_path(album_id, source_url, size)
+
+
+def image_media_type(content: bytes) -> str:
+    for magic, media_type in _IMAGE_TYPES:
+        if content.startswith(magic):
+            return media_type
+    return "application/octet-stream"
+
+
+def make_thumbnail(content: bytes, size: int) -> Optional[bytes]:
+    """Redimensionne (carré de `size` px max) en JPEG ; None si Pillow n'est pas installé."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(io.BytesIO(content)) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=COVER_THUMBNAIL_QUALITY, optimize=True)
+        return out.getvalue()
+
+
+class CoverCache:
+    """
+    Cache disque des pochettes (originale + miniatures), borné en octets.
+    Éviction LRU : l'index en mémoire est reconstruit au démarrage d'après la date
+    de dernier accès (mtime, mise à jour à chaque lecture).
+    """
+
+    def __init__(self, directory: str = COVER_CACHE_DIR, max_bytes: int = COVER_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None  # nom de fichier -> taille
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()  # lectures/écritures faites dans des threads (asyncio.to_thread)
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            entries: List[Tuple[float, str, int]] = []
+            if self.directory.is_dir():
+                for path in self.directory.iterdir():
+                    if path.is_file() and path.suffix == ".img":
+                        stat = path.stat()
+                        entries.append((stat.st_mtime, path.name, stat.st_size))
+            entries.sort()
+            self._index = OrderedDict((name, size) for _, name, size in entries)
+            self._size = sum(self._index.values())
+        return self._index
+
+    @staticmethod
+    def _name(album_id: int, version: str, size: Optional[int]) -> str:
+        return f"{album_id}-{version}-{size or 'orig'}.img"
+
+    def _read(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            if name not in self._load_index():
+                return None
+        # Lecture disque hors du verrou : seul l'index est partagé entre les threads
+        path = self.directory / name
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # Fichier évincé entre-temps (ou supprimé à la main)
+            with self._lock:
+                self._size -= self._index.pop(name, 0)
+            return None
+        with self._lock:
+            if name in self._index:
+                self._index.move_to_end(name)
+        return content
+
+    def _write(self, name: str, content: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / name
+        tmp = path.with_name(name + f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(content)
+        with self._lock:
+            index = self._load_index()
+            os.replace(tmp, path)
+            self._size += len(content) - index.pop(name, 0)
+            index[name] = len(content)
+            while self._size > self.max_bytes and len(index) > 1:
+                oldest, size = index.popitem(last=False)
+                self._size -= size
+                self.evictions += 1
+                try:
+                    (self.directory / oldest).unlink()
+                except FileNotFoundError:
+                    pass
+
+    async def get(self, album_id: int, version: str, size: Optional[int] = None) -> Optional[bytes]:
+        content = await asyncio.to_thread(self._read, self._name(album_id, version, size))
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    async def set(self, album_id: int, version: str, size: Optional[int], content: bytes) -> None:
+        await asyncio.to_thread(self._write, self._name(album_id, version, size), content)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            index = self._load_index()
+        return {
+            "entries": len(index),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+cover_cache = CoverCache()
+cover_single_flight = SingleFlight()
+
+
+async def fetch_cover(source_url: str, client: httpx.AsyncClient) -> bytes:
+    """Télécharge l'image d'origine (hébergeur d'images Discogs, hors quota de l'API)."""
+    headers = {"User-Agent": "disco2000-api/1.0 (https://github.com/cayel/disco2000-api)"}
+    response = await client.get(source_url, headers=headers)
+    if response.status_code != 200:
+        raise DiscogsHTTPError(response.status_code, source_url)
+    return response.content
+
+
+async def get_cover(album_id: int, source_url: str, size: Optional[int], client: httpx.AsyncClient) -> bytes:
+    """
+    Retourne la pochette (ou sa miniature) depuis le cache disque, en la téléchargeant
+    une seule fois : l'originale est conservée et sert à produire toutes les miniatures.
+    """
+    version = cover_version(source_url)
+    content = await cover_cache.get(album_id, version, size)
+    if content is not None:
+        return content
+    # Plusieurs clients qui demandent la même pochette froide partagent le téléchargement
+    if not size:
+        return await cover_single_flight.do(
+            (album_id, version, None),
+            lambda: _download_original(album_id, version, source_url, client),
+        )
+    return await cover_single_flight.do(
+        (album_id, version, size),
+        lambda: _build_thumbnail(album_id, version, source_url, size, client),
+    )
+
+
+async def _download_original(album_id: int, version: str, source_url: str, client: httpx.AsyncClient) -> bytes:
+    original = await fetch_cover(source_url, client)
+    await cover_cache.set(album_id, version, None, original)
+    return original
+
+
+async def _build_thumbnail(album_id: int, version: str, source_url: str, size: int, client: httpx.AsyncClient) -> bytes:
+    original = await get_cover(album_id, source_url, None, client)
+    thumbnail = await asyncio.to_thread(make_thumbnail, original, size)
+    if thumbnail is None:
+        logger.warning("Pillow absent : miniature de pochette remplacée par l'originale")
+        return original
+    await cover_cache.set(album_id, version, size, thumbnail)
+    return thumbnail
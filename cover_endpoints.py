@@ -0,0 +1,73 @@
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Path, Query, Request, Response
+from db import SessionLocal
+from models import Album
+from discogs_utils import DiscogsHTTPError, get_discogs_client
+from cover_cache import COVER_THUMBNAIL_SIZES, cover_version, get_cover, image_media_type
+import logging
+
+logger = logging.getLogger("disco2000")
+
+# Pochette non versionnée (ou version périmée) : courte durée de cache côté client
+COVER_MUTABLE_MAX_AGE = 300
+COVER_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+router = APIRouter()
+
+
+def _etag(version: str, size: Optional[int]) -> str:
+    return f'"{version}-{size or "orig"}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+
+@router.get("/{album_id}")
+async def get_album_cover(
+    request: Request,
+    album_id: int = Path(..., description="ID de l'album"),
+    size: Optional[int] = Query(None, description="Largeur max de la miniature (px) ; originale si absent"),
+    v: Optional[str] = Query(None, description="Version de la pochette (fournie dans cover_url)"),
+    client: httpx.AsyncClient = Depends(get_discogs_client)
+):
+    """Sert la pochette d'un album depuis le cache disque du proxy (téléchargée une seule fois)."""
+    if size is not None and size not in COVER_THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"Taille de miniature non disponible (tailles : {COVER_THUMBNAIL_SIZES})")
+    # URL versionnée déjà en cache chez le client : inutile d'interroger la base
+    if v and _etag_matches(request, _etag(v, size)):
+        return Response(status_code=304, headers={"ETag": _etag(v, size), "Cache-Control": COVER_IMMUTABLE_CACHE_CONTROL})
+    async with SessionLocal() as session:
+        album = await session.get(Album, album_id)
+        source_url = album.cover_url if album else None
+    if not source_url:
+        raise HTTPException(status_code=404, detail="Pochette non trouvée")
+    version = cover_version(source_url)
+    etag = _etag(version, size)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": COVER_IMMUTABLE_CACHE_CONTROL if v == version else f"public, max-age={COVER_MUTABLE_MAX_AGE}",
+    }
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        content = await get_cover(album_id, source_url, size, client)
+    except DiscogsHTTPError as e:
+        logger.error(f"Pochette de l'album {album_id} indisponible : {e}")
+        if e.status_code == 404:
+            raise HTTPException(status_code=404, detail="Pochette introuvable chez Discogs")
+        raise HTTPException(status_code=502, detail=f"Erreur de l'hébergeur d'images (statut {e.status_code})")
+    except httpx.HTTPError as e:
+        logger.error(f"Pochette de l'album {album_id} indisponible : {e}")
+        raise HTTPException(status_code=502, detail="Hébergeur d'images injoignable")
+    return Response(content=content, media_type=image_media_type(content), headers=headers)
+
+
+# Sous-application sans clé API, montée sur /api/covers : une balise <img> n'envoie pas de header X-API-KEY
+covers_app = FastAPI(title="Pochettes disco2000", docs_url=None, redoc_url=None, openapi_url=None)
+covers_app.include_router(router)
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("disco2000")
+
+# Configuration du cache des réponses Discogs (surchargeable via .env)
+DISCOGS_CACHE_BACKEND = os.getenv("DISCOGS_CACHE_BACKEND", "memory")  # memory, file ou postgres
+DISCOGS_CACHE_TTL = float(os.getenv("DISCOGS_CACHE_TTL", "3600"))
+DISCOGS_CACHE_MAX_ENTRIES = int(os.getenv("DISCOGS_CACHE_MAX_ENTRIES", "1024"))
+DISCOGS_CACHE_DURABLE_TTL = float(os.getenv("DISCOGS_CACHE_DURABLE_TTL", str(7 * 24 * 3600)))
+DISCOGS_CACHE_DIR = os.getenv("DISCOGS_CACHE_DIR", ".cache/discogs")
+
+
+class FileCacheBackend:
+    """Stockage durable sur disque local (un fichier JSON par réponse), pour le dev et la CI."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key.replace("/", "_") + ".json")
+
+    def _read(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry["payload"], entry["fetched_at"]
+
+    def _write(self, key: str, payload: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "payload": payload}, f)
+        # Remplacement atomique : un lecteur concurrent ne voit jamais de fichier partiel
+        os.replace(tmp, path)
+
+    async def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, payload: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._write, key, payload)
+
+
+class PostgresCacheBackend:
+    """Stockage durable dans la table discogs_cache (à côté de albums)."""
+
+    async def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        from db import SessionLocal
+        from models import DiscogsCacheEntry
+        async with SessionLocal() as session:
+            entry = await session.get(DiscogsCacheEntry, key)
+            if not entry:
+                return None
+            return entry.payload, entry.fetched_at.timestamp()
+
+    async def set(self, key: str, payload: Dict[str, Any]) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from db import SessionLocal
+        from models import DiscogsCacheEntry
+        now = datetime.now(timezone.utc)
+        stmt = insert(DiscogsCacheEntry).values(key=key, payload=payload, fetched_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DiscogsCacheEntry.key],
+            set_={"payload": payload, "fetched_at": now},
+        )
+        async with SessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+
+class DiscogsCache:
+    """
+    Cache à deux niveaux des réponses JSON Discogs :
+    - un LRU en mémoire avec TTL (process courant) ;
+    - un niveau durable optionnel (fichier local ou PostgreSQL) partagé entre redémarrages.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DISCOGS_CACHE_TTL,
+        max_entries: int = DISCOGS_CACHE_MAX_ENTRIES,
+        backend=None,
+        durable_ttl: float = DISCOGS_CACHE_DURABLE_TTL,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self.durable_ttl = durable_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.memory_hits = 0
+        self.durable_hits = 0
+        self.misses = 0
+        self.backend_errors = 0
+
+    @staticmethod
+    def make_key(kind: str, discogs_id: int) -> str:
+        return f"{kind}/{discogs_id}"
+
+    def _remember(self, key: str, payload: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, kind: str, discogs_id: int) -> Optional[Dict[str, Any]]:
+        key = self.make_key(kind, discogs_id)
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, payload = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return payload
+            del self._entries[key]
+        if self.backend is not None:
+            try:
+                stored = await self.backend.get(key)
+            except Exception as e:
+                # Le cache ne doit jamais bloquer un import : on retombe sur l'API Discogs
+                self.backend_errors += 1
+                logger.warning(f"Lecture du cache Discogs impossible ({key}) : {e}")
+                stored = None
+            if stored:
+                payload, fetched_at = stored
+                if time.time() - fetched_at < self.durable_ttl:
+                    self._remember(key, payload)
+                    self.durable_hits += 1
+                    return payload
+        self.misses += 1
+        return None
+
+    async def set(self, kind: str, discogs_id: int, payload: Dict[str, Any]) -> None:
+        key = self.make_key(kind, discogs_id)
+        self._remember(key, payload)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, payload)
+            except Exception as e:
+                self.backend_errors += 1
+                logger.warning(f"Écriture du cache Discogs impossible ({key}) : {e}")
+
+    def clear(self) -> None:
+        """Vide le niveau mémoire (le niveau durable expire via son TTL)."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.durable_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "durable_hits": self.durable_hits,
+            "misses": self.misses,
+            "backend_errors": self.backend_errors,
+            "hit_ratio": round((self.memory_hits + self.durable_hits) / lookups, 3) if lookups else None,
+        }
+
+
+def build_discogs_cache() -> DiscogsCache:
+    """Construit le cache selon DISCOGS_CACHE_BACKEND (memory, file ou postgres)."""
+    backend = None
+    if DISCOGS_CACHE_BACKEND == "file":
+        backend = FileCacheBackend(DISCOGS_CACHE_DIR)
+    elif DISCOGS_CACHE_BACKEND == "postgres":
+        backend = PostgresCacheBackend()
+    elif DISCOGS_CACHE_BACKEND != "memory":
+        logger.warning(f"DISCOGS_CACHE_BACKEND inconnu : '{DISCOGS_CACHE_BACKEND}', cache en mémoire uniquement")
+    return DiscogsCache(backend=backend)
+
+
+discogs_cache = build_discogs_cache()
@@ -0,0 +1,167 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import logging
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger("disco2000")
+
+# Priorités des requêtes Discogs : plus la valeur est basse, plus la requête passe tôt
+PRIORITY_INTERACTIVE = 0   # aperçu / import déclenché par un utilisateur
+PRIORITY_BACKGROUND = 10   # imports en lot, jobs, resynchronisation
+
+# Quota Discogs : 60 requêtes/minute authentifié, 25 sans token (surchargeable via .env)
+DISCOGS_RATE_LIMIT = int(os.getenv("DISCOGS_RATE_LIMIT", "60" if os.getenv("DISCOGS_TOKEN") else "25"))
+DISCOGS_MAX_RETRIES = int(os.getenv("DISCOGS_MAX_RETRIES", "3"))
+DISCOGS_BACKOFF_BASE = float(os.getenv("DISCOGS_BACKOFF_BASE", "1.0"))
+DISCOGS_BACKOFF_MAX = float(os.getenv("DISCOGS_BACKOFF_MAX", "60"))
+
+
+class DiscogsRateLimiter:
+    """
+    Ordonnanceur central des requêtes sortantes vers Discogs.
+
+    Seau à jetons calé sur le quota par minute, recalibré à chaque réponse grâce aux
+    headers X-Discogs-Ratelimit-*. Les requêtes en attente sont servies par priorité
+    (puis dans l'ordre d'arrivée). Un 429 vide le seau et suspend les envois
+    (Retry-After ou backoff exponentiel) avant de retenter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = DISCOGS_RATE_LIMIT,
+        max_retries: int = DISCOGS_MAX_RETRIES,
+        backoff_base: float = DISCOGS_BACKOFF_BASE,
+        backoff_max: float = DISCOGS_BACKOFF_MAX,
+    ):
+        self.capacity = float(requests_per_minute)
+        self.tokens = float(requests_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []  # tas de (priorité, séquence, future)
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.granted = 0
+        self.throttled = 0
+
+    @property
+    def refill_rate(self) -> float:
+        """Jetons regagnés par seconde."""
+        return self.capacity / 60.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.refill_rate)
+        self._last_refill = now
+
+    def _delay(self) -> float:
+        """Temps d'attente (s) avant qu'un jeton soit disponible."""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+
+    def _take(self) -> None:
+        self.tokens -= 1
+        self.granted += 1
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Attend un jeton ; les requêtes de priorité plus haute passent devant."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Nouvelle boucle d'événements (tests, rechargement) : les attentes précédentes sont caduques
+            self._loop = loop
+            self._waiters = []
+            self._dispatcher = None
+        if not self._waiters and self._delay() == 0:
+            self._take()
+            return
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].done():
+                # Appelant annulé : on libère sa place sans consommer de jeton
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            self._take()
+            future.set_result(None)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Recalibre le seau à partir des headers X-Discogs-Ratelimit-* d'une réponse."""
+        limit = headers.get("X-Discogs-Ratelimit")
+        remaining = headers.get("X-Discogs-Ratelimit-Remaining")
+        try:
+            if limit is not None and int(limit) > 0:
+                self.capacity = float(limit)
+            if remaining is not None:
+                self._refill()
+                self.tokens = min(self.tokens, float(remaining))
+        except ValueError:
+            logger.warning(f"Headers de quota Discogs illisibles : limit={limit}, remaining={remaining}")
+
+    def _retry_delay(self, headers: Mapping[str, str], attempt: int) -> float:
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Backoff exponentiel avec gigue pour éviter que les appelants ne repartent ensemble
+        delay = self.backoff_base * (2 ** attempt)
+        return min(delay + random.uniform(0, self.backoff_base), self.backoff_max)
+
+    def block_for(self, seconds: float) -> None:
+        """Suspend tous les envois pendant `seconds` et vide le seau."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self._last_refill = time.monotonic()
+
+    async def get(self, client, url: str, headers: Dict[str, str], priority: int = PRIORITY_INTERACTIVE):
+        """GET soumis au quota ; retente les 429 après backoff. Retourne la dernière réponse."""
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            response = await client.get(url, headers=headers)
+            response_headers = getattr(response, "headers", None) or {}
+            self.update_from_headers(response_headers)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            delay = self._retry_delay(response_headers, attempt)
+            self.throttled += 1
+            logger.warning(f"Discogs 429 sur {url} : nouvel essai dans {delay:.1f}s (tentative {attempt + 1}/{self.max_retries})")
+            self.block_for(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "capacity_per_minute": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "waiting": len(self._waiters),
+            "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+            "granted": self.granted,
+            "throttled": self.throttled,
+        }
+
+
+discogs_rate_limiter = DiscogsRateLimiter()
@@ -0,0 +1,231 @@
+import os
+import math
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import httpx
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from discogs_cache import discogs_cache
+from discogs_ratelimit import discogs_rate_limiter, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger("disco2000")
+
+# URL de l'API Discogs (à remplacer par le serveur de substitution tools/discogs_standin.py pour les benchmarks)
+DISCOGS_API_URL = os.getenv("DISCOGS_API_URL", "https://api.discogs.com").rstrip("/")
+# Paramètres du client HTTP partagé vers l'API Discogs (surchargeables via .env)
+DISCOGS_MAX_CONNECTIONS = int(os.getenv("DISCOGS_MAX_CONNECTIONS", "10"))
+DISCOGS_MAX_KEEPALIVE = int(os.getenv("DISCOGS_MAX_KEEPALIVE", "5"))
+DISCOGS_KEEPALIVE_EXPIRY = float(os.getenv("DISCOGS_KEEPALIVE_EXPIRY", "30"))
+DISCOGS_TIMEOUT = float(os.getenv("DISCOGS_TIMEOUT", "10"))
+DISCOGS_CONNECT_TIMEOUT = float(os.getenv("DISCOGS_CONNECT_TIMEOUT", "5"))
+DISCOGS_HTTP2 = os.getenv("DISCOGS_HTTP2", "1") not in ("0", "false", "False")
+# Requête spéculative de la main_release d'un master sans label (opt-in)
+DISCOGS_SPECULATIVE_MAIN_RELEASE = os.getenv("DISCOGS_SPECULATIVE_MAIN_RELEASE", "0") in ("1", "true", "True")
+DISCOGS_MAIN_RELEASE_HINTS = int(os.getenv("DISCOGS_MAIN_RELEASE_HINTS", "4096"))
+
+_client: Optional[httpx.AsyncClient] = None
+# master_id -> main_release, pour les masters dont le label vient de la main_release
+_main_release_hints: "OrderedDict[int, int]" = OrderedDict()
+
+
+class LabelInfo(BaseModel):
+    name: str
+    id: Optional[int] = None
+    catno: Optional[str] = None
+
+
+def extract_label_info(label_list: List[dict]) -> List[LabelInfo]:
+    """Extrait les infos utiles des labels (name, id, catno), sans doublons."""
+    seen = set()
+    result = []
+    for l in label_list:
+        name = l.get("name")
+        if name and name not in seen:
+            seen.add(name)
+            result.append(LabelInfo(name=name, id=l.get("id"), catno=l.get("catno")))
+    return result
+
+
+def extract_pochette(images: List[dict]) -> Optional[str]:
+    """Retourne l'URL de la pochette principale ou la première image."""
+    if not images:
+        return None
+    primary = next((img for img in images if img.get("type") == "primary" and img.get("uri")), None)
+    return primary["uri"] if primary else images[0].get("uri")
+
+
+def get_discogs_headers() -> Dict[str, str]:
+    """Construit les headers pour l'API Discogs."""
+    headers = {"User-Agent": "disco2000-api/1.0 (https://github.com/cayel/disco2000-api)"}
+    token = os.getenv("DISCOGS_TOKEN")
+    if token:
+        headers["Authorization"] = f"Discogs token={token}"
+    return headers
+
+
+def create_discogs_client() -> httpx.AsyncClient:
+    """Crée un client HTTP avec keep-alive (et HTTP/2 si disponible) pour l'API Discogs."""
+    http2 = DISCOGS_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("Paquet 'h2' absent : client Discogs en HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=DISCOGS_MAX_CONNECTIONS,
+            max_keepalive_connections=DISCOGS_MAX_KEEPALIVE,
+            keepalive_expiry=DISCOGS_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(DISCOGS_TIMEOUT, connect=DISCOGS_CONNECT_TIMEOUT),
+    )
+
+
+async def open_discogs_client() -> httpx.AsyncClient:
+    """Ouvre le client partagé (appelé au démarrage dans le lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_discogs_client()
+        logger.info("Client HTTP Discogs partagé ouvert.")
+    return _client
+
+
+async def close_discogs_client() -> None:
+    """Ferme le client partagé (appelé à l'arrêt dans le lifespan)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Client HTTP Discogs partagé fermé.")
+
+
+def get_discogs_client() -> httpx.AsyncClient:
+    """
+    Dépendance FastAPI : retourne le client Discogs partagé.
+    Le crée à la volée si le lifespan n'a pas été exécuté (tests, fonctions serverless).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_discogs_client()
+    return _client
+
+
+class DiscogsHTTPError(Exception):
+    """Réponse non exploitable (statut différent de 200) renvoyée par l'API Discogs."""
+
+    def __init__(self, status_code: int, url: str):
+        super().__init__(f"Discogs a répondu {status_code} pour {url}")
+        self.status_code = status_code
+        self.url = url
+
+
+class SingleFlight:
+    """
+    Regroupe les appels concurrents identiques : le premier appelant lance la requête,
+    les suivants attendent le même résultat (ou la même erreur) au lieu de la dupliquer.
+    La requête n'est annulée que lorsque tous les appelants ont abandonné.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, list] = {}  # clé -> [tâche, nombre d'appelants]
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None or call[0].get_loop() is not asyncio.get_running_loop():
+            # Tâche indépendante : l'annulation d'un appelant n'annule pas les autres
+            task = asyncio.ensure_future(fn())
+            call = [task, 0]
+            self._calls[key] = call
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.shared += 1
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if call[1] == 1 and not task.done():
+                # Dernier appelant annulé : inutile de consommer du quota pour personne
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+discogs_single_flight = SingleFlight()
+
+
+async def discogs_get_json(
+    kind: str,
+    discogs_id: int,
+    client: Optional[httpx.AsyncClient] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> Dict:
+    """
+    Récupère le JSON d'une ressource Discogs ("masters" ou "releases") en passant par le cache,
+    puis par l'ordonnanceur de quota. Lève DiscogsHTTPError si Discogs ne répond pas 200.
+    Les appels concurrents pour une même ressource partagent une seule requête.
+    """
+    return await discogs_single_flight.do(
+        (kind, discogs_id),
+        lambda: _discogs_get_json(kind, discogs_id, client, priority),
+    )
+
+
+async def _discogs_get_json(kind: str, discogs_id: int, client: Optional[httpx.AsyncClient], priority: int) -> Dict:
+    cached = await discogs_cache.get(kind, discogs_id)
+    if cached is not None:
+        return cached
+    url = f"{DISCOGS_API_URL}/{kind}/{discogs_id}"
+    client = client or get_discogs_client()
+    response = await discogs_rate_limiter.get(client, url, get_discogs_headers(), priority=priority)
+    if response.status_code != 200:
+        raise DiscogsHTTPError(response.status_code, url)
+    data = response.json()
+    await discogs_cache.set(kind, discogs_id, data)
+    return data
+
+
+def get_main_release_hint(master_id: int) -> Optional[int]:
+    """main_release connue d'un master sans label (il faudra la récupérer pour le label)."""
+    return _main_release_hints.get(master_id)
+
+
+def remember_main_release(master_id: int, main_release: Optional[int]) -> None:
+    """Mémorise (ou oublie si None) la main_release à récupérer pour un master sans label."""
+    if main_release is None:
+        _main_release_hints.pop(master_id, None)
+        return
+    _main_release_hints[master_id] = main_release
+    _main_release_hints.move_to_end(master_id)
+    while len(_main_release_hints) > DISCOGS_MAIN_RELEASE_HINTS:
+        _main_release_hints.popitem(last=False)
+
+
+def discogs_http_exception(error: DiscogsHTTPError, not_found_detail: str) -> HTTPException:
+    """Traduit une erreur Discogs en réponse HTTP (le quota dépassé n'est pas un 404)."""
+    if error.status_code == 429:
+        retry_after = max(1, math.ceil(discogs_rate_limiter.stats()["blocked_for"]))
+        return HTTPException(
+            status_code=429,
+            detail="Quota de requêtes Discogs atteint, réessayez plus tard",
+            headers={"Retry-After": str(retry_after)},
+        )
+    if error.status_code >= 500:
+        return HTTPException(status_code=502, detail=f"Erreur de l'API Discogs (statut {error.status_code})")
+    return HTTPException(status_code=404, detail=not_found_detail)
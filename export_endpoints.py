@@ -0,0 +1,180 @@
+import io
+import os
+import csv
+import logging
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from db import SessionLocal
+from models import Album, Artist, Label, UserAlbumCollection
+from auth_dependencies import get_current_user_utilisateur
+from cover_cache import cover_proxy_url
+from fieldsets import FieldSet
+from json_response import dumps
+
+logger = logging.getLogger("disco2000")
+
+router = APIRouter()
+
+# Lignes lues par aller-retour du curseur serveur (surchargeable via .env)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Champs à plat (une colonne CSV chacun), artiste et label en jointure
+ALBUM_EXPORT_FIELDS = FieldSet(
+    {
+        "id": ((Album.id,), lambda row: row.id),
+        "title": ((Album.title,), lambda row: row.title),
+        "year": ((Album.year,), lambda row: row.year),
+        "genre": ((Album.genre,), lambda row: row.genre),
+        "style": ((Album.style,), lambda row: row.style),
+        "catno": ((Album.catno,), lambda row: row.catno),
+        "type": ((Album.type,), lambda row: row.type),
+        "discogs_master_id": ((Album.discogs_master_id,), lambda row: row.discogs_master_id),
+        "discogs_release_id": ((Album.discogs_release_id,), lambda row: row.discogs_release_id),
+        "cover_url": ((Album.cover_url,), lambda row: cover_proxy_url(row.id, row.cover_url)),
+        "artist_id": ((Artist.id.label("artist_id"),), lambda row: row.artist_id),
+        "artist": ((Artist.name.label("artist_name"),), lambda row: row.artist_name),
+        "artist_discogs_id": ((Artist.discogs_id.label("artist_discogs_id"),), lambda row: row.artist_discogs_id),
+        "label_id": ((Label.id.label("label_id"),), lambda row: row.label_id),
+        "label": ((Label.name.label("label_name"),), lambda row: row.label_name),
+        "label_discogs_id": ((Label.discogs_id.label("label_discogs_id"),), lambda row: row.label_discogs_id),
+    },
+    always=(Album.id,),
+)
+
+# Collection : supports possédés puis fiche de l'album (mêmes colonnes que l'export du catalogue)
+COLLECTION_EXPORT_FIELDS = FieldSet(
+    {
+        "album_id": ((Album.id,), lambda row: row.id),
+        "cd": ((UserAlbumCollection.cd,), lambda row: row.cd),
+        "vinyl": ((UserAlbumCollection.vinyl,), lambda row: row.vinyl),
+        **{name: field for name, field in ALBUM_EXPORT_FIELDS.fields.items() if name != "id"},
+    },
+    always=(Album.id,),
+)
+
+
+def _csv_value(value: Any) -> Any:
+    """Tableaux (genres, styles) aplatis dans une seule cellule."""
+    if isinstance(value, (list, tuple)):
+        return "|".join(str(v) for v in value)
+    return value
+
+
+def _encode(records: List[dict], export_format: str, header: Optional[List[str]] = None) -> bytes:
+    if export_format == "ndjson":
+        return b"".join(dumps(record) + b"\n" for record in records)
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows([_csv_value(value) for value in record.values()] for record in records)
+    return out.getvalue().encode("utf-8")
+
+
+def _error_marker(export_format: str, exported: int) -> bytes:
+    """Dernière ligne d'un export interrompu : le fichier ne peut pas passer pour complet."""
+    message = f"Export interrompu après {exported} lignes"
+    if export_format == "ndjson":
+        return dumps({"error": message}) + b"\n"
+    return _encode([{"error": "#ERREUR", "detail": message}], export_format)
+
+
+async def stream_export(
+    stack: AsyncExitStack, partitions, rows, fieldset: FieldSet, requested: List[str], export_format: str
+) -> AsyncIterator[bytes]:
+    """
+    Produit l'export lot par lot à partir du premier lot déjà lu : la mémoire reste bornée par
+    EXPORT_BATCH_SIZE quelle que soit la table. Une erreur en cours de flux (le statut 200 est
+    déjà parti) est signalée par une dernière ligne d'erreur. Ferme la session à la fin.
+    """
+    exported = 0
+    try:
+        if export_format == "csv":
+            yield _encode([], export_format, header=requested)
+        while rows is not None:
+            exported += len(rows)
+            yield _encode([fieldset.serialize(row, requested) for row in rows], export_format)
+            rows = await anext(partitions, None)
+    except Exception as e:
+        logger.error(f"Export interrompu après {exported} lignes ({export_format}) : {e}")
+        yield _error_marker(export_format, exported)
+        return
+    finally:
+        await stack.aclose()
+    logger.info(f"Export terminé : {exported} lignes ({export_format})")
+
+
+async def export_response(stmt, fieldset: FieldSet, requested: List[str], export_format: str, filename: str) -> StreamingResponse:
+    """
+    Ouvre le curseur côté serveur (stream_results / yield_per) et lit le premier lot avant
+    d'envoyer les en-têtes : une erreur à ce stade donne un vrai statut d'erreur, pas un
+    fichier vide servi en 200.
+    """
+    stack = AsyncExitStack()
+    try:
+        session = await stack.enter_async_context(SessionLocal())
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        partitions = result.partitions()
+        rows = await anext(partitions, None)
+    except Exception as e:
+        await stack.aclose()
+        logger.error(f"Export impossible ({export_format}) : {e}")
+        raise HTTPException(status_code=500, detail="Export impossible")
+    return StreamingResponse(
+        stream_export(stack, partitions, rows, fieldset, requested, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
+
+
+@router.get("/api/export/albums")
+async def export_albums(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Format de l'export : ndjson (une ligne JSON par album) ou csv"),
+    fields: Optional[str] = Query(None, description="Champs exportés, séparés par des virgules (tous par défaut)")
+):
+    """
+    Export complet du catalogue, artiste et label joints, en flux : les premiers octets
+    partent aussitôt, sans pagination ni comptage.
+    """
+    requested = ALBUM_EXPORT_FIELDS.parse(fields)
+    stmt = (
+        select(*ALBUM_EXPORT_FIELDS.columns(requested))
+        .select_from(Album)
+        .join(Artist, Album.artist_id == Artist.id, isouter=True)
+        .join(Label, Album.label_id == Label.id, isouter=True)
+        .order_by(Album.id)
+    )
+    return await export_response(stmt, ALBUM_EXPORT_FIELDS, requested, format, "albums")
+
+
+@router.get("/api/export/collection")
+async def export_collection(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Format de l'export : ndjson (une ligne JSON par album) ou csv"),
+    fields: Optional[str] = Query(None, description="Champs exportés, séparés par des virgules (tous par défaut)"),
+    user=Depends(get_current_user_utilisateur)
+):
+    """
+    Export de la collection de l'utilisateur connecté en flux, en une seule requête :
+    supports possédés (cd, vinyl) avec album, artiste et label joints.
+    """
+    requested = COLLECTION_EXPORT_FIELDS.parse(fields)
+    stmt = (
+        select(*COLLECTION_EXPORT_FIELDS.columns(requested))
+        .select_from(UserAlbumCollection)
+        .join(Album, UserAlbumCollection.album_id == Album.id)
+        .join(Artist, Album.artist_id == Artist.id, isouter=True)
+        .join(Label, Album.label_id == Label.id, isouter=True)
+        .where(UserAlbumCollection.user_id == user["id"])
+        # Ordre servi par la contrainte unique (user_id, album_id)
+        .order_by(UserAlbumCollection.album_id)
+    )
+    return await export_response(stmt, COLLECTION_EXPORT_FIELDS, requested, format, "collection")
@@ -0,0 +1,44 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+
+class FieldSet:
+    """
+    Champs exposables d'une ressource (paramètre `fields=`) : pour chacun, les colonnes SQL
+    à lire et le calcul de la valeur à partir de la ligne. Seules les colonnes des champs
+    demandés entrent dans le SELECT.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, Tuple[Sequence[Any], Callable[[Any], Any]]],
+        always: Sequence[Any] = (),
+        default: Optional[Sequence[str]] = None,
+    ):
+        self.fields = fields
+        self.always = always  # colonnes toujours lues (clé primaire, clés de tri du curseur)
+        self.default = list(default) if default is not None else list(fields)
+
+    def parse(self, fields: Optional[str]) -> List[str]:
+        """Champs demandés (liste séparée par des virgules), dans l'ordre de la ressource ; 400 si inconnus."""
+        if fields is None:
+            return list(self.default)
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = sorted(requested - set(self.fields))
+        if unknown or not requested:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Champs inconnus : {', '.join(unknown) or '(aucun)'} ; champs disponibles : {', '.join(self.fields)}",
+            )
+        return [name for name in self.fields if name in requested]
+
+    def columns(self, requested: Sequence[str]) -> List[Any]:
+        """Colonnes du SELECT pour ces champs, sans doublon."""
+        columns: Dict[str, Any] = {}
+        for column in [*self.always, *(c for name in requested for c in self.fields[name][0])]:
+            columns.setdefault(column.key, column)
+        return list(columns.values())
+
+    def serialize(self, row: Any, requested: Sequence[str]) -> Dict[str, Any]:
+        return {name: self.fields[name][1](row) for name in requested}
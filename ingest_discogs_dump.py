@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Ingestion des dumps XML mensuels de Discogs (https://data.discogs.com/) dans les tables
+artists, labels et albums, sans passer par l'API (et son quota).
+
+Usage:
+    python ingest_discogs_dump.py artists  discogs_20251101_artists.xml.gz
+    python ingest_discogs_dump.py labels   discogs_20251101_labels.xml.gz
+    python ingest_discogs_dump.py masters  discogs_20251101_masters.xml.gz
+    python ingest_discogs_dump.py releases discogs_20251101_releases.xml.gz
+
+Ordre conseillé : artists, labels, masters puis releases (les releases principales
+complètent le label et le catno des albums issus des masters, comme le fait l'API).
+
+Le fichier est lu en flux (mémoire constante), chargé par lots via COPY dans une table
+temporaire puis fusionné dans la table cible. Un point de reprise est enregistré après
+chaque lot : relancer la même commande reprend là où l'import s'était arrêté.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from discogs_utils import extract_label_info, extract_pochette
+
+load_dotenv()
+
+logger = logging.getLogger("disco2000")
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_BATCH_SIZE = int(os.getenv("DISCOGS_DUMP_BATCH_SIZE", "5000"))
+DEFAULT_CHECKPOINT_FILE = os.getenv("DISCOGS_DUMP_CHECKPOINT", ".cache/discogs_dump_checkpoints.json")
+
+
+def iter_records(source, tag: str) -> Iterator[ET.Element]:
+    """
+    Parcourt en flux les enregistrements de premier niveau `tag` d'un dump (gzippé ou non).
+    Chaque élément est vidé après usage : la mémoire reste constante quelle que soit la taille du fichier.
+    """
+    opener = gzip.open if str(source).endswith(".gz") else open
+    with opener(source, "rb") as f:
+        depth = 0
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = elem
+                continue
+            depth -= 1
+            # Seuls les enregistrements directement sous la racine (un <label> contient des <label> de sous-labels)
+            if depth == 1 and elem.tag == tag:
+                yield elem
+                elem.clear()
+                root.clear()
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _texts(elem: ET.Element, path: str) -> List[str]:
+    return [e.text for e in elem.findall(path) if e.text]
+
+
+def _images(elem: ET.Element) -> List[dict]:
+    return [dict(img.attrib) for img in elem.findall("images/image")]
+
+
+def map_artist(elem: ET.Element) -> Optional[Tuple]:
+    """<artist> -> (discogs_id, name)"""
+    name = elem.findtext("name")
+    if not name:
+        return None
+    return (_int(elem.findtext("id")), name)
+
+
+def map_label(elem: ET.Element) -> Optional[Tuple]:
+    """<label> -> (discogs_id, name)"""
+    discogs_id = _int(elem.findtext("id"))
+    name = elem.findtext("name")
+    if discogs_id is None or not name:
+        return None
+    return (discogs_id, name)
+
+
+def map_master(elem: ET.Element) -> Optional[Tuple]:
+    """
+    <master> -> (master_id, title, year, genre, style, cover_url, artist_discogs_id, artist_name)
+    Mêmes règles que fetch_discogs_master : premier artiste, pochette principale sinon première image.
+    """
+    master_id = _int(elem.get("id"))
+    if master_id is None:
+        return None
+    artist = elem.find("artists/artist")
+    artist_name = artist.findtext("name") if artist is not None else None
+    artist_discogs_id = _int(artist.findtext("id")) if artist is not None else None
+    year = _int(elem.findtext("year"))
+    return (
+        master_id,
+        elem.findtext("title"),
+        year or None,  # les dumps utilisent 0 pour une année inconnue
+        _texts(elem, "genres/genre"),
+        _texts(elem, "styles/style"),
+        extract_pochette(_images(elem)) or None,
+        artist_discogs_id,
+        artist_name,
+    )
+
+
+def map_release(elem: ET.Element) -> Optional[Tuple]:
+    """
+    <release> principale d'un master -> (master_id, label_discogs_id, label_name, catno)
+    Seules les releases principales servent : elles complètent le label des albums issus des masters.
+    """
+    master = elem.find("master_id")
+    if master is None or master.get("is_main_release") != "true":
+        return None
+    master_id = _int(master.text)
+    labels = extract_label_info([
+        {"name": l.get("name"), "id": _int(l.get("id")), "catno": l.get("catno")}
+        for l in elem.findall("labels/label")
+    ])
+    if master_id is None or not labels or labels[0].id is None:
+        return None
+    label = labels[0]
+    return (master_id, label.id, label.name, label.catno)
+
+
+# Pour chaque type de dump : balise des enregistrements, fonction de mapping,
+# table temporaire (colonnes COPY) et requêtes de fusion dans les tables cibles.
+DUMPS: Dict[str, dict] = {
+    "artists": {
+        "tag": "artist",
+        "mapper": map_artist,
+        "staging": "staging_artists",
+        "columns": ["discogs_id", "name"],
+        "ddl": "CREATE TEMP TABLE IF NOT EXISTS staging_artists (discogs_id INTEGER, name VARCHAR)",
+        "merge": [
+            """
+            INSERT INTO artists (name, discogs_id)
+            SELECT DISTINCT ON (name) name, discogs_id FROM staging_artists
+            ON CONFLICT (name) DO UPDATE SET discogs_id = COALESCE(artists.discogs_id, EXCLUDED.discogs_id)
+            """,
+        ],
+    },
+    "labels": {
+        "tag": "label",
+        "mapper": map_label,
+        "staging": "staging_labels",
+        "columns": ["discogs_id", "name"],
+        "ddl": "CREATE TEMP TABLE IF NOT EXISTS staging_labels (discogs_id INTEGER, name VARCHAR)",
+        "merge": [
+            """
+            INSERT INTO labels (name, discogs_id)
+            SELECT DISTINCT ON (discogs_id) name, discogs_id FROM staging_labels
+            ON CONFLICT (discogs_id) DO UPDATE SET name = EXCLUDED.name
+            """,
+        ],
+    },
+    "masters": {
+        "tag": "master",
+        "mapper": map_master,
+        "staging": "staging_masters",
+        "columns": ["master_id", "title", "year", "genre", "style", "cover_url", "artist_discogs_id", "artist_name"],
+        "ddl": """
+            CREATE TEMP TABLE IF NOT EXISTS staging_masters (
+                master_id INTEGER, title VARCHAR, year INTEGER, genre VARCHAR[], style VARCHAR[],
+                cover_url VARCHAR, artist_discogs_id INTEGER, artist_name VARCHAR
+            )
+        """,
+        "merge": [
+            """
+            INSERT INTO artists (name, discogs_id)
+            SELECT DISTINCT ON (artist_name) artist_name, artist_discogs_id FROM staging_masters
+            WHERE artist_name IS NOT NULL
+            ON CONFLICT (name) DO NOTHING
+            """,
+            """
+            INSERT INTO albums (title, discogs_master_id, discogs_link_type, year, genre, style, cover_url, type, artist_id)
+            SELECT DISTINCT ON (s.master_id) s.title, s.master_id, 'master', s.year, s.genre, s.style, s.cover_url, 'Studio', a.id
+            FROM staging_masters s
+            LEFT JOIN artists a ON a.name = s.artist_name
+            ON CONFLICT (discogs_master_id) DO UPDATE SET
+                -- Album existant : on ne complète que les champs vides, sans écraser les corrections faites via l'API
+                title = COALESCE(albums.title, EXCLUDED.title),
+                year = COALESCE(albums.year, EXCLUDED.year),
+                genre = COALESCE(NULLIF(albums.genre, '{}'), EXCLUDED.genre),
+                style = COALESCE(NULLIF(albums.style, '{}'), EXCLUDED.style),
+                cover_url = COALESCE(albums.cover_url, EXCLUDED.cover_url),
+                artist_id = COALESCE(albums.artist_id, EXCLUDED.artist_id)
+            """,
+        ],
+    },
+    "releases": {
+        "tag": "release",
+        "mapper": map_release,
+        "staging": "staging_releases",
+        "columns": ["master_id", "label_discogs_id", "label_name", "catno"],
+        "ddl": """
+            CREATE TEMP TABLE IF NOT EXISTS staging_releases (
+                master_id INTEGER, label_discogs_id INTEGER, label_name VARCHAR, catno VARCHAR
+            )
+        """,
+        "merge": [
+            """
+            INSERT INTO labels (name, discogs_id)
+            SELECT DISTINCT ON (label_discogs_id) label_name, label_discogs_id FROM staging_releases
+            ON CONFLICT (discogs_id) DO NOTHING
+            """,
+            """
+            UPDATE albums SET label_id = l.id, catno = s.catno
+            FROM staging_releases s
+            JOIN labels l ON l.discogs_id = s.label_discogs_id
+            WHERE albums.discogs_master_id = s.master_id AND albums.label_id IS NULL
+            """,
+        ],
+    },
+}
+
+
+def load_checkpoints(path: str) -> Dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: str, key: str, records: int) -> None:
+    checkpoints = load_checkpoints(path)
+    checkpoints[key] = {"records": records, "updated_at": datetime.now(timezone.utc).isoformat()}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoints, f, indent=2)
+    os.replace(tmp, path)
+
+
+def iter_batches(source, kind: str, batch_size: int, skip: int = 0) -> Iterator[Tuple[int, List[Tuple]]]:
+    """Produit (nombre d'enregistrements lus, lignes mappées) par lot, en sautant les `skip` premiers."""
+    spec = DUMPS[kind]
+    mapper = spec["mapper"]
+    batch: List[Tuple] = []
+    read = 0
+    for elem in iter_records(source, spec["tag"]):
+        read += 1
+        if read <= skip:
+            continue
+        row = mapper(elem)
+        if row is not None:
+            batch.append(row)
+        if read % batch_size == 0:
+            yield read, batch
+            batch = []
+    if read > skip and read % batch_size:
+        yield read, batch
+
+
+async def ingest(source: str, kind: str, batch_size: int, checkpoint_file: str, reset: bool = False, dry_run: bool = False):
+    spec = DUMPS[kind]
+    checkpoint_key = f"{kind}:{Path(source).name}"
+    skip = 0 if reset else load_checkpoints(checkpoint_file).get(checkpoint_key, {}).get("records", 0)
+    if skip:
+        logger.info(f"Reprise de {checkpoint_key} après {skip} enregistrements")
+
+    conn = None
+    pg = None
+    if not dry_run:
+        from db import engine
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        pg = raw.driver_connection  # connexion asyncpg (COPY natif)
+        await pg.execute(spec["ddl"])
+
+    started = time.monotonic()
+    rows_total = 0
+    read = skip
+    try:
+        for read, rows in iter_batches(source, kind, batch_size, skip=skip):
+            if pg is not None and rows:
+                async with pg.transaction():
+                    await pg.execute(f"TRUNCATE {spec['staging']}")
+                    await pg.copy_records_to_table(spec["staging"], records=rows, columns=spec["columns"])
+                    for sql in spec["merge"]:
+                        await pg.execute(sql)
+            if not dry_run:
+                save_checkpoint(checkpoint_file, checkpoint_key, read)
+            rows_total += len(rows)
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"{kind} : {read} enregistrements lus, {rows_total} lignes chargées "
+                f"({rows_total / elapsed if elapsed else 0:.0f} lignes/s)"
+            )
+    finally:
+        if conn is not None:
+            await conn.close()
+    elapsed = time.monotonic() - started
+    logger.info(f"Import {kind} terminé : {rows_total} lignes en {elapsed:.1f}s ({rows_total / elapsed if elapsed else 0:.0f} lignes/s)")
+    return rows_total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion d'un dump XML mensuel Discogs.")
+    parser.add_argument("kind", choices=sorted(DUMPS), help="Type de dump")
+    parser.add_argument("source", help="Chemin du fichier .xml ou .xml.gz")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Enregistrements par lot COPY")
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE, help="Fichier des points de reprise")
+    parser.add_argument("--reset", action="store_true", help="Ignore le point de reprise et recommence au début")
+    parser.add_argument("--dry-run", action="store_true", help="Analyse le dump sans écrire en base")
+    args = parser.parse_args(argv)
+    if not Path(args.source).exists():
+        print(f"❌ Fichier introuvable : {args.source}")
+        sys.exit(1)
+    asyncio.run(ingest(args.source, args.kind, args.batch_size, args.checkpoint_file, reset=args.reset, dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
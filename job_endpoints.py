@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from db import SessionLocal
+from models import ImportJob
+from auth_dependencies import get_current_user_contributeur
+from job_queue import enqueue_import_job, job_to_dict
+
+router = APIRouter()
+
+
+@router.post("/api/albums/studio/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def add_album_studio_job(
+    discogs_id: int = Query(..., description="ID Discogs master ou release"),
+    discogs_type: str = Query("master", enum=["master", "release"], description="Type Discogs : master ou release"),
+    user=Depends(get_current_user_contributeur)
+):
+    """Accepte l'import d'un album studio en arrière-plan ; suivre l'avancement via /api/jobs/{job_id}."""
+    job = await enqueue_import_job(discogs_id, discogs_type, user_id=user.get("id"))
+    return {"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"}
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: int = Path(..., description="ID du job d'import"), user=Depends(get_current_user_contributeur)):
+    """Récupère l'état d'un job d'import (pending, running, done, failed), réservé à son auteur et aux administrateurs."""
+    async with SessionLocal() as session:
+        job = await session.get(ImportJob, job_id)
+        is_owner = job is not None and job.user_id is not None and job.user_id == user.get("id")
+        # 404 plutôt que 403 : on ne révèle pas l'existence des jobs des autres utilisateurs
+        if not job or not (is_owner or "administrateur" in user.get("roles", [])):
+            raise HTTPException(status_code=404, detail="Job non trouvé")
+        return job_to_dict(job)
@@ -0,0 +1,227 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, select, update
+
+from db import SessionLocal
+from models import ImportJob
+
+logger = logging.getLogger("disco2000")
+
+# Pool de workers d'import (0 pour désactiver, par ex. sur un déploiement serverless sans process long)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_JOB_POLL_INTERVAL = float(os.getenv("IMPORT_JOB_POLL_INTERVAL", "5"))
+IMPORT_JOB_MAX_ATTEMPTS = int(os.getenv("IMPORT_JOB_MAX_ATTEMPTS", "3"))
+# Délai avant une nouvelle tentative (s), doublé à chaque échec : un 429 ou une panne Discogs n'épuise pas les tentatives
+IMPORT_JOB_RETRY_DELAY = float(os.getenv("IMPORT_JOB_RETRY_DELAY", "30"))
+# Le worker signale qu'il traite toujours le job ; sans signal depuis IMPORT_JOB_STALE_AFTER (s), le job est repris
+IMPORT_JOB_HEARTBEAT_INTERVAL = float(os.getenv("IMPORT_JOB_HEARTBEAT_INTERVAL", "30"))
+IMPORT_JOB_STALE_AFTER = float(os.getenv("IMPORT_JOB_STALE_AFTER", "120"))
+
+
+def job_to_dict(job: ImportJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "discogs_id": job.discogs_id,
+        "discogs_type": job.discogs_type,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+async def enqueue_import_job(discogs_id: int, discogs_type: str, user_id: Optional[int] = None) -> ImportJob:
+    """Enregistre un job d'import en attente et réveille un worker local."""
+    async with SessionLocal() as session:
+        job = ImportJob(discogs_id=discogs_id, discogs_type=discogs_type, user_id=user_id, status="pending", attempts=0)
+        session.add(job)
+        await session.commit()
+        await session.refresh(job)
+    import_worker_pool.notify()
+    logger.info(f"Job d'import {job.id} en attente (Discogs {discogs_type} {discogs_id})")
+    return job
+
+
+async def claim_next_job() -> Optional[ImportJob]:
+    """
+    Réserve le plus ancien job en attente dont le délai de nouvelle tentative est écoulé.
+    FOR UPDATE SKIP LOCKED : plusieurs workers (ou plusieurs instances de l'API) ne prennent
+    jamais le même job.
+    """
+    async with SessionLocal() as session:
+        res = await session.execute(
+            select(ImportJob)
+            .where(
+                ImportJob.status == "pending",
+                or_(ImportJob.run_after.is_(None), ImportJob.run_after <= func.now()),
+            )
+            .order_by(ImportJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = res.scalar_one_or_none()
+        if job is None:
+            await session.rollback()
+            return None
+        job.status = "running"
+        job.attempts += 1
+        job.heartbeat_at = func.now()
+        await session.commit()
+        return job
+
+
+async def finish_job(
+    job_id: int,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+    run_after: Optional[datetime] = None,
+) -> None:
+    async with SessionLocal() as session:
+        await session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job_id)
+            .values(status=status, result=result, error=error, run_after=run_after)
+        )
+        await session.commit()
+
+
+def retry_delay(attempts: int, base: float = IMPORT_JOB_RETRY_DELAY) -> float:
+    """Backoff exponentiel : base, 2 x base, 4 x base... après la 1re, 2e, 3e tentative."""
+    return base * 2 ** max(attempts - 1, 0)
+
+
+async def heartbeat_job(job_id: int) -> None:
+    async with SessionLocal() as session:
+        await session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job_id, ImportJob.status == "running")
+            .values(heartbeat_at=func.now())
+        )
+        await session.commit()
+
+
+async def _keep_alive(job_id: int, interval: float = IMPORT_JOB_HEARTBEAT_INTERVAL) -> None:
+    """Tâche de fond du worker : rafraîchit heartbeat_at tant que l'import tourne (même ralenti par le rate limiter)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await heartbeat_job(job_id)
+        except Exception as e:
+            logger.warning(f"Job d'import {job_id} : heartbeat non enregistré : {e}")
+
+
+async def requeue_stale_jobs(stale_after: float = IMPORT_JOB_STALE_AFTER) -> int:
+    """Remet en attente les jobs 'running' dont le worker ne donne plus signe de vie (arrêté en cours de traitement)."""
+    limit = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    async with SessionLocal() as session:
+        res = await session.execute(
+            update(ImportJob)
+            .where(
+                ImportJob.status == "running",
+                func.coalesce(ImportJob.heartbeat_at, ImportJob.updated_at) < limit,
+            )
+            .values(status="pending")
+        )
+        await session.commit()
+        if res.rowcount:
+            logger.warning(f"{res.rowcount} jobs d'import bloqués remis en attente")
+        return res.rowcount
+
+
+async def process_job(job: ImportJob) -> None:
+    """Exécute un import (mêmes règles que l'import unitaire) et enregistre son issue."""
+    from album_import import import_discogs_albums
+    keep_alive = asyncio.create_task(_keep_alive(job.id))
+    try:
+        [result] = await import_discogs_albums([(job.discogs_id, job.discogs_type)], concurrency=1)
+    except Exception as e:
+        result = {"discogs_id": job.discogs_id, "discogs_type": job.discogs_type, "status": "error", "detail": str(e)}
+    finally:
+        keep_alive.cancel()
+    if result["status"] != "error":
+        await finish_job(job.id, "done", result=result)
+        logger.info(f"Job d'import {job.id} terminé : {result['status']}")
+    elif job.attempts < IMPORT_JOB_MAX_ATTEMPTS:
+        delay = retry_delay(job.attempts)
+        run_after = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        await finish_job(job.id, "pending", error=result.get("detail"), run_after=run_after)
+        logger.warning(
+            f"Job d'import {job.id} en échec (tentative {job.attempts}), nouvel essai dans {delay:.0f} s : {result.get('detail')}"
+        )
+    else:
+        await finish_job(job.id, "failed", result=result, error=result.get("detail"))
+        logger.error(f"Job d'import {job.id} abandonné après {job.attempts} tentatives : {result.get('detail')}")
+
+
+class ImportWorkerPool:
+    """Workers asynchrones qui dépilent la table import_jobs dans le process de l'API."""
+
+    def __init__(self, size: int = IMPORT_WORKERS, poll_interval: float = IMPORT_JOB_POLL_INTERVAL):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_requeue = 0.0
+
+    def notify(self) -> None:
+        """Signale qu'un job vient d'être ajouté (évite d'attendre le prochain polling)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self.size <= 0 or self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        await self._requeue_stale()
+        self._tasks = [asyncio.create_task(self._run(n)) for n in range(self.size)]
+        logger.info(f"{self.size} workers d'import démarrés.")
+
+    async def _requeue_stale(self) -> None:
+        self._last_requeue = asyncio.get_running_loop().time()
+        try:
+            await requeue_stale_jobs()
+        except Exception as e:
+            logger.error(f"Impossible de remettre en attente les jobs bloqués : {e}")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Workers d'import arrêtés.")
+
+    async def _run(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                job = await claim_next_job()
+            except Exception as e:
+                logger.error(f"Worker d'import {worker_id} : réservation impossible : {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    # Reprise périodique des jobs abandonnés par un worker d'une autre instance
+                    if asyncio.get_running_loop().time() - self._last_requeue >= IMPORT_JOB_STALE_AFTER:
+                        await self._requeue_stale()
+                self._wakeup.clear()
+                continue
+            try:
+                await process_job(job)
+            except Exception as e:
+                # Le job restera 'running' et sera remis en attente par requeue_stale_jobs
+                logger.error(f"Worker d'import {worker_id} : erreur sur le job {job.id} : {e}")
+
+
+import_worker_pool = ImportWorkerPool()
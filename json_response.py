@@ -0,0 +1,42 @@
+import json
+import datetime
+import decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : repli sur json (plus lent, même sortie)
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Types renvoyés par les requêtes mais inconnus du sérialiseur JSON."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Type non sérialisable en JSON : {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON compact en UTF-8 (orjson s'il est installé)."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON sérialisée directement (orjson si disponible). Renvoyée explicitement par
+    un endpoint, elle court-circuite jsonable_encoder : à réserver aux contenus faits de
+    types simples (dict, list, str, nombres, dates), typiquement construits depuis des lignes SQL.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -11,14 +11,12 @@ from user_endpoints import router as user_router
 
 import httpx
 from pydantic import BaseModel, Field
+import asyncio
+from discogs_ratelimit import PRIORITY_INTERACTIVE
+from discogs_utils import LabelInfo, extract_label_info, extract_pochette
 
 # ... autres imports ...
 
-class LabelInfo(BaseModel):
-    name: str
-    id: Optional[int] = None
-    catno: Optional[str] = None
-
 class DiscogsMasterResponse(BaseModel):
     artiste: Optional[str]
     titre: Optional[str]
@@ -29,33 +27,34 @@ class DiscogsMasterResponse(BaseModel):
     label: Optional[List[LabelInfo]] = None
     pochette: Optional[str] = None
 
-async def fetch_discogs_release(release_id: int) -> DiscogsMasterResponse:
+async def fetch_discogs_release(
+    release_id: int,
+    client: Optional[httpx.AsyncClient] = None,
+    priority: int = PRIORITY_INTERACTIVE
+) -> DiscogsMasterResponse:
     """Appelle l'API Discogs et extrait les champs utiles pour une release donnée."""
-    url = f"https://api.discogs.com/releases/{release_id}"
-    headers = get_discogs_headers()
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Release non trouvée sur Discogs")
-        data = response.json()
-        labels = extract_label_info(data.get("labels", []))
-        pochette = extract_pochette(data.get("images", []))
-        artist_id = None
-        if data.get("artists") and len(data["artists"]) > 0:
-            artist_id = data["artists"][0].get("id")
-        return DiscogsMasterResponse(
-            artiste=data["artists"][0]["name"] if data.get("artists") else None,
-            titre=data.get("title"),
-            identifiants_discogs={
-                "release_id": data.get("id"),
-                "artist_id": artist_id,
-            },
-            genres=data.get("genres", []),
-            styles=data.get("styles", []),
-            annee=data.get("year"),
-            label=labels,
-            pochette=pochette,
-        )
+    try:
+        data = await discogs_get_json("releases", release_id, client=client, priority=priority)
+    except DiscogsHTTPError as e:
+        raise discogs_http_exception(e, "Release non trouvée sur Discogs")
+    labels = extract_label_info(data.get("labels", []))
+    pochette = extract_pochette(data.get("images", []))
+    artist_id = None
+    if data.get("artists") and len(data["artists"]) > 0:
+        artist_id = data["artists"][0].get("id")
+    return DiscogsMasterResponse(
+        artiste=data["artists"][0]["name"] if data.get("artists") else None,
+        titre=data.get("title"),
+        identifiants_discogs={
+            "release_id": data.get("id"),
+            "artist_id": artist_id,
+        },
+        genres=data.get("genres", []),
+        styles=data.get("styles", []),
+        annee=data.get("year"),
+        label=labels,
+        pochette=pochette,
+    )
 
 from fastapi import Header, Depends
 from dotenv import load_dotenv
@@ -82,6 +81,27 @@ logging.basicConfig(level=logging.INFO)
 
 from fastapi.middleware.cors import CORSMiddleware
 from db import Base, engine
+from discogs_utils import (
+    get_discogs_headers,
+    get_discogs_client,
+    open_discogs_client,
+    close_discogs_client,
+    discogs_get_json,
+    discogs_http_exception,
+    discogs_single_flight,
+    get_main_release_hint,
+    remember_main_release,
+    DiscogsHTTPError,
+    DISCOGS_SPECULATIVE_MAIN_RELEASE,
+)
+from discogs_cache import discogs_cache
+from job_queue import import_worker_pool
+from cover_cache import cover_cache, cover_single_flight
+from album_resync import ALBUM_RESYNC_ENABLED, album_resyncer
+from catalog_state import catalog_state
+from conditional_get import ConditionalGetMiddleware
+from response_compression import CompressionMiddleware, precompressed_cache
+from discogs_ratelimit import discogs_rate_limiter
 from contextlib import asynccontextmanager
 import os  # Import os to access environment variables
 
@@ -100,7 +120,19 @@ async def lifespan(app):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     logger.info("Migration des tables effectuée.")
-    yield
+    # Client HTTP Discogs partagé (keep-alive) pour toute la durée de vie de l'application
+    await open_discogs_client()
+    # Workers qui traitent les imports acceptés en 202 (table import_jobs)
+    await import_worker_pool.start()
+    # Rafraîchissement continu des métadonnées des albums (opt-in)
+    if ALBUM_RESYNC_ENABLED:
+        album_resyncer.start()
+    try:
+        yield
+    finally:
+        await album_resyncer.stop()
+        await import_worker_pool.stop()
+        await close_discogs_client()
 
 app = FastAPI(
     title="Vercel + FastAPI",
@@ -109,6 +141,9 @@ app = FastAPI(
     lifespan=lifespan,
     dependencies=[Depends(verify_api_key)]
 )
+# ETag / 304 sur les GET du catalogue, puis compression ; CORS, ajouté en dernier, englobe le tout (304 compris)
+app.add_middleware(ConditionalGetMiddleware, api_key=API_KEY)
+app.add_middleware(CompressionMiddleware, api_key=API_KEY)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,  # Utilise les origines dynamiques
@@ -128,6 +163,10 @@ from collection_stats_endpoints import router as collection_stats_router
 from refresh_token_endpoints import router as refresh_token_router
 from artist_endpoints import router as artist_router
 from statistics_endpoints import router as statistics_router
+from job_endpoints import router as job_router
+from search_endpoints import router as search_router
+from export_endpoints import router as export_router
+from cover_endpoints import covers_app
 # Inclusion des routers (mettre la route spécifique /api/albums/stats avant le paramétré /api/albums/{album_id})
 app.include_router(public_collection_stats_router)
 app.include_router(statistics_router)
@@ -136,11 +175,10 @@ app.include_router(collection_router)
 app.include_router(collection_stats_router)
 app.include_router(refresh_token_router)
 app.include_router(artist_router)
-
-class LabelInfo(BaseModel):
-    name: str
-    id: Optional[int] = None
-    catno: Optional[str] = None
+app.include_router(job_router)
+app.include_router(search_router)
+app.include_router(export_router)
+app.mount("/api/covers", covers_app)
 
 class DiscogsMasterResponse(BaseModel):
     artiste: Optional[str]
@@ -152,79 +190,115 @@ class DiscogsMasterResponse(BaseModel):
     label: List[LabelInfo]
     pochette: Optional[str]
 
-def get_discogs_headers() -> Dict[str, str]:
-    """Construit les headers pour l'API Discogs."""
-    headers = {"User-Agent": "disco2000-api/1.0 (https://github.com/cayel/disco2000-api)"}
-    token = os.getenv("DISCOGS_TOKEN")
-    if token:
-        headers["Authorization"] = f"Discogs token={token}"
-    return headers
-
-def extract_label_info(label_list: List[dict]) -> List[LabelInfo]:
-    """Extrait les infos utiles des labels (name, id, catno), sans doublons."""
-    seen = set()
-    result = []
-    for l in label_list:
-        name = l.get("name")
-        if name and name not in seen:
-            seen.add(name)
-            result.append(LabelInfo(name=name, id=l.get("id"), catno=l.get("catno")))
-    return result
-
-def extract_pochette(images: List[dict]) -> Optional[str]:
-    """Retourne l'URL de la pochette principale ou la première image."""
-    if not images:
-        return None
-    primary = next((img for img in images if img.get("type") == "primary" and img.get("uri")), None)
-    return primary["uri"] if primary else images[0].get("uri")
-
-async def fetch_discogs_master(master_id: int) -> DiscogsMasterResponse:
-    """Appelle l'API Discogs et extrait les champs utiles pour un master donné. Complète le label via la main_release si besoin."""
-    url = f"https://api.discogs.com/masters/{master_id}"
-    headers = get_discogs_headers()
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Master non trouvé sur Discogs")
-        data = response.json()
-        labels = extract_label_info(data.get("labels", []))
-        # Si pas de label sur le master, aller chercher sur la main_release
-        if not labels and data.get("main_release"):
-            rel_url = f"https://api.discogs.com/releases/{data['main_release']}"
-            rel_resp = await client.get(rel_url, headers=headers)
-            if rel_resp.status_code == 200:
-                rel_data = rel_resp.json()
-                labels = extract_label_info(rel_data.get("labels", []))
-        pochette = extract_pochette(data.get("images", []))
-        # Ajoute l'id Discogs de l'artiste si présent
-        artist_id = None
-        if data.get("artists") and len(data["artists"]) > 0:
-            artist_id = data["artists"][0].get("id")
-        return DiscogsMasterResponse(
-            artiste=data["artists"][0]["name"] if data.get("artists") else None,
-            titre=data.get("title"),
-            identifiants_discogs={
-                "master_id": data.get("id"),
-                "main_release": data.get("main_release"),
-                "artist_id": artist_id,
-            },
-            genres=data.get("genres", []),
-            styles=data.get("styles", []),
-            annee=data.get("year"),
-            label=labels,
-            pochette=pochette,
-        )
+async def fetch_discogs_master(
+    master_id: int,
+    client: Optional[httpx.AsyncClient] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    speculative: Optional[bool] = None
+) -> DiscogsMasterResponse:
+    """
+    Appelle l'API Discogs et extrait les champs utiles pour un master donné. Complète le label via la main_release si besoin.
+    En mode spéculatif, si l'on sait déjà que ce master n'a pas de label, la main_release est
+    demandée en parallèle du master ; elle est annulée si finalement inutile.
+    """
+    if speculative is None:
+        speculative = DISCOGS_SPECULATIVE_MAIN_RELEASE
+    hint = get_main_release_hint(master_id) if speculative else None
+    release_task = None
+    if hint:
+        release_task = asyncio.ensure_future(discogs_get_json("releases", hint, client=client, priority=priority))
+        # Résultat éventuellement abandonné : on marque l'erreur comme consommée
+        release_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        data = await discogs_get_json("masters", master_id, client=client, priority=priority)
+    except DiscogsHTTPError as e:
+        if release_task:
+            release_task.cancel()
+        raise discogs_http_exception(e, "Master non trouvé sur Discogs")
+    except BaseException:
+        if release_task:
+            release_task.cancel()
+        raise
+    labels = extract_label_info(data.get("labels", []))
+    main_release = data.get("main_release")
+    remember_main_release(master_id, main_release if not labels else None)
+    if release_task and (labels or hint != main_release):
+        release_task.cancel()
+        release_task = None
+    # Si pas de label sur le master, aller chercher sur la main_release
+    if not labels and main_release:
+        try:
+            if release_task:
+                rel_data = await release_task
+            else:
+                rel_data = await discogs_get_json("releases", main_release, client=client, priority=priority)
+            labels = extract_label_info(rel_data.get("labels", []))
+        except DiscogsHTTPError:
+            pass
+    pochette = extract_pochette(data.get("images", []))
+    # Ajoute l'id Discogs de l'artiste si présent
+    artist_id = None
+    if data.get("artists") and len(data["artists"]) > 0:
+        artist_id = data["artists"][0].get("id")
+    return DiscogsMasterResponse(
+        artiste=data["artists"][0]["name"] if data.get("artists") else None,
+        titre=data.get("title"),
+        identifiants_discogs={
+            "master_id": data.get("id"),
+            "main_release": data.get("main_release"),
+            "artist_id": artist_id,
+        },
+        genres=data.get("genres", []),
+        styles=data.get("styles", []),
+        annee=data.get("year"),
+        label=labels,
+        pochette=pochette,
+    )
 
 
 # Endpoint unifié pour récupérer un master ou une release Discogs
 from fastapi import Query
 @app.get("/api/discogs/album/{discogs_id}", response_model=DiscogsMasterResponse)
-async def get_discogs_album(discogs_id: int, type: str = Query("master", enum=["master", "release"])):
+async def get_discogs_album(
+    discogs_id: int,
+    type: str = Query("master", enum=["master", "release"]),
+    client: httpx.AsyncClient = Depends(get_discogs_client)
+):
     """Endpoint public pour obtenir les infos d'un master ou d'une release Discogs par son id."""
     if type == "master":
-        return await fetch_discogs_master(discogs_id)
+        return await fetch_discogs_master(discogs_id, client=client)
     else:
-        return await fetch_discogs_release(discogs_id)
+        return await fetch_discogs_release(discogs_id, client=client)
+
+@app.get("/api/discogs/cache/stats")
+async def get_discogs_cache_stats():
+    """Compteurs hit/miss du cache des réponses Discogs (et requêtes regroupées en vol)."""
+    stats = discogs_cache.stats()
+    stats["coalesced"] = discogs_single_flight.shared
+    stats["in_flight"] = discogs_single_flight.in_flight()
+    return stats
+
+@app.get("/api/discogs/covers/stats")
+async def get_cover_cache_stats():
+    """Occupation et compteurs du cache disque des pochettes."""
+    stats = cover_cache.stats()
+    stats["coalesced"] = cover_single_flight.shared
+    return stats
+
+@app.get("/api/discogs/resync/stats")
+async def get_album_resync_stats():
+    """Avancement de la resynchronisation des albums avec Discogs."""
+    return album_resyncer.stats()
+
+@app.get("/api/discogs/ratelimit/stats")
+async def get_discogs_ratelimit_stats():
+    """État du seau à jetons qui régule les appels à l'API Discogs."""
+    return discogs_rate_limiter.stats()
+
+@app.get("/api/compression/stats")
+async def get_compression_stats():
+    """Réponses statiques gardées en mémoire par version du catalogue (statistiques, liste des pays)."""
+    return precompressed_cache.stats()
 
 @app.get("/api/data")
 def get_sample_data():
@@ -565,11 +639,13 @@ def read_root():
 from auth_dependencies import get_current_user_contributeur
 
 @app.post("/api/albums/studio", status_code=status.HTTP_201_CREATED)
-async def add_studio_album(master_id: int, user=Depends(get_current_user_contributeur)):
+async def add_studio_album(master_id: int, user=Depends(get_current_user_contributeur), client: httpx.AsyncClient = Depends(get_discogs_client)):
     logger.info(f"Début ajout album studio pour master Discogs {master_id}")
     try:
-        master = await fetch_discogs_master(master_id)
+        master = await fetch_discogs_master(master_id, client=client)
         logger.info(f"Infos master récupérées : titre={master.titre}, artiste={master.artiste}")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la récupération du master Discogs {master_id} : {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -635,5 +711,6 @@ async def add_studio_album(master_id: int, user=Depends(get_current_user_contrib
             await session.rollback()
             logger.error(f"Erreur d'intégrité lors de l'ajout de l'album : {e}")
             raise HTTPException(status_code=409, detail="L'album existe déjà dans la base de données.")
+        catalog_state.album_catalog_changed(delta=1)
         logger.info(f"Album studio ajouté : {album.title} (id={album.id})")
         return {"message": "Album studio ajouté", "album_id": album.id}
@@ -1,8 +1,8 @@
 # Table de collection utilisateur/album/format
 from sqlalchemy import Boolean
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, UniqueConstraint
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Boolean, UniqueConstraint, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from db import Base
 
 
@@ -48,6 +48,7 @@ class Album(Base):
     title = Column(String, index=True)
     discogs_master_id = Column(Integer, index=True, unique=True)
     discogs_link_type = Column(String, default="master")  # "master" ou "release"
+    discogs_release_id = Column(Integer, nullable=True)  # id de la release Discogs si discogs_link_type == "release"
     year = Column(Integer)
     genre = Column(ARRAY(String))
     style = Column(ARRAY(String))
@@ -58,3 +59,62 @@ class Album(Base):
     label_id = Column(Integer, ForeignKey("labels.id"))
     artist = relationship("Artist", back_populates="albums")
     label = relationship("Label", back_populates="albums")
+    # Vecteur plein texte maintenu par trigger (sql/12-migration_album_search_vector.sql), jamais chargé par défaut
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+    __table_args__ = (
+        # Pagination par clé (year, id) de GET /api/albums
+        Index("ix_albums_year_id", year.desc().nulls_last(), id.desc()),
+        # Filtres genre/style de GET /api/albums (opérateurs @> et &&)
+        Index("ix_albums_genre_gin", genre, postgresql_using="gin"),
+        Index("ix_albums_style_gin", style, postgresql_using="gin"),
+    )
+
+# Cache durable des réponses JSON de l'API Discogs (clé : "masters/<id>" ou "releases/<id>")
+class DiscogsCacheEntry(Base):
+    __tablename__ = "discogs_cache"
+    key = Column(String, primary_key=True)
+    payload = Column(JSONB, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+
+# File d'attente des imports Discogs traités en arrière-plan (pending -> running -> done / failed)
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    discogs_id = Column(Integer, nullable=False)
+    discogs_type = Column(String, nullable=False, default="master")
+    user_id = Column(Integer, nullable=True)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSONB, nullable=True)
+    error = Column(String, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=True)  # prochaine tentative au plus tôt (backoff)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # dernier signe de vie du worker
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    __table_args__ = (
+        Index("ix_import_jobs_pending", "id", postgresql_where=(status == "pending")),
+    )
+
+# Validateurs HTTP et empreinte du dernier contenu Discogs appliqué à un album (resynchronisation)
+class AlbumDiscogsSync(Base):
+    __tablename__ = "album_discogs_sync"
+    album_id = Column(Integer, ForeignKey("albums.id", ondelete="CASCADE"), primary_key=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    synced_at = Column(DateTime(timezone=True), nullable=True)
+
+# Curseurs de reprise des traitements de fond qui parcourent une table par id croissant
+class ResyncCursor(Base):
+    __tablename__ = "resync_cursors"
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    passes = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+# Versions partagées entre instances de l'API (ETag des GET) : 'catalog' et 'collection:<user_id>',
+# incrémentées par trigger dans la transaction de l'écriture (sql/15-migration_cache_versions.sql)
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    scope = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
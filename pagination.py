@@ -0,0 +1,23 @@
+import json
+import base64
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Curseur opaque (base64 URL-safe) à partir des valeurs de clé de tri du dernier élément."""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Décode un curseur produit par encode_cursor ; 400 s'il est illisible."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    return values
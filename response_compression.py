@@ -0,0 +1,381 @@
+import os
+import re
+import gzip
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from conditional_get import CONDITIONAL_GET_PATHS, _user_id, compute_etag, etag_matches, request_versions
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # dépendance optionnelle
+    zstandard = None
+
+logger = logging.getLogger("disco2000")
+
+# Compression des réponses (surchargeable via .env)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") in ("1", "true", "True")
+# En dessous de cette taille (octets), la réponse part telle quelle
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "5"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Mémoire consacrée aux réponses mises en cache (octets)
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Réponses qui ne dépendent que du catalogue : rendues et compressées (niveau maximal) une fois
+# par version du catalogue, puis servies depuis la mémoire sans appeler l'endpoint
+PRECOMPRESSED_PATHS = (
+    r"/api/statistics/[\w-]+",
+    r"/api/albums/stats",
+    r"/api/countries",
+)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class _Stream:
+    """Compression au fil de l'eau : chaque morceau est vidé aussitôt (le client le lit sans attendre)."""
+
+    def __init__(self, compress, flush, finish):
+        self._compress = compress
+        self._flush = flush
+        self._finish = finish
+
+    def feed(self, chunk: bytes) -> bytes:
+        return self._compress(chunk) + self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class Codec:
+    def __init__(self, name: str, level: int, static_level: int):
+        self.name = name
+        self.level = level
+        self.static_level = static_level  # réponses précompressées : le coût n'est payé qu'une fois
+
+    def compress(self, body: bytes, level: Optional[int] = None) -> bytes:
+        level = self.level if level is None else level
+        if self.name == "br":
+            return brotli.compress(body, quality=level)
+        if self.name == "zstd":
+            return zstandard.ZstdCompressor(level=level).compress(body)
+        return gzip.compress(body, compresslevel=level, mtime=0)
+
+    def stream(self) -> _Stream:
+        if self.name == "br":
+            compressor = brotli.Compressor(quality=self.level)
+            return _Stream(compressor.process, compressor.flush, compressor.finish)
+        if self.name == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+            return _Stream(
+                compressor.compress,
+                lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush,
+            )
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return _Stream(compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush)
+
+
+def available_codecs() -> List[Codec]:
+    """Codages disponibles, par ordre de préférence du serveur."""
+    codecs = []
+    if zstandard is not None:
+        codecs.append(Codec("zstd", COMPRESSION_ZSTD_LEVEL, 19))
+    if brotli is not None:
+        codecs.append(Codec("br", COMPRESSION_BROTLI_LEVEL, 11))
+    codecs.append(Codec("gzip", COMPRESSION_GZIP_LEVEL, 9))
+    return codecs
+
+
+def negotiate(accept_encoding: Optional[str], codecs: Sequence[Codec]) -> Optional[Codec]:
+    """Codage retenu d'après Accept-Encoding (q-values, *), à préférence égale celui du serveur."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = weights.get(codec.name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+class CachedResponse:
+    """Réponse 200 rendue : en-têtes, corps non compressé et variantes compressées (une par codage)."""
+
+    def __init__(self, key: str, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.key = key
+        self.headers = headers
+        self.body = body
+        self.variants: Dict[str, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+
+class PrecompressedCache:
+    """
+    Réponses des chemins « statiques » indexées par leur ETag (version partagée du catalogue,
+    appelant et URL), avec leurs variantes compressées ; bornées en octets (LRU).
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, headers: List[Tuple[bytes, bytes]], body: bytes) -> CachedResponse:
+        entry = CachedResponse(key, headers, body)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self._size += entry.size - (previous.size if previous else 0)
+            self._entries[key] = entry
+            self._evict()
+        return entry
+
+    def variant(self, entry: CachedResponse, codec: Codec) -> bytes:
+        """Corps compressé avec `codec`, calculé au premier besoin puis conservé avec la réponse."""
+        compressed = entry.variants.get(codec.name)
+        if compressed is not None:
+            return compressed
+        compressed = codec.compress(entry.body, level=codec.static_level)
+        with self._lock:
+            if codec.name not in entry.variants:
+                entry.variants[codec.name] = compressed
+                if self._entries.get(entry.key) is entry:
+                    self._size += len(compressed)
+                    self._evict()
+        return compressed
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+precompressed_cache = PrecompressedCache()
+
+
+def _weak_etag(headers: MutableHeaders) -> None:
+    """Un ETag fort désigne des octets précis : la version compressée n'a droit qu'à un ETag faible."""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = "W/" + etag
+
+
+def _negotiated_headers(headers: MutableHeaders, codec: Optional[Codec]) -> None:
+    """
+    En-têtes communs aux 200 et aux 304 d'une ressource compressible : la représentation dépend
+    d'Accept-Encoding et, dès qu'un codage est négocié, l'ETag est faible (compressée ou non).
+    """
+    headers.add_vary_header("Accept-Encoding")
+    if codec is not None:
+        _weak_etag(headers)
+
+
+class CompressionMiddleware:
+    """
+    Compresse les réponses JSON/texte selon Accept-Encoding (zstd, br si les modules sont
+    installés, gzip sinon), au-delà d'une taille minimale. Les réponses en flux (export)
+    sont compressées morceau par morceau. Les réponses des chemins « statiques » sont rendues
+    et compressées une fois par version du catalogue, puis servies sans appeler l'endpoint.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        api_key: Optional[str] = None,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        precompressed_paths: Sequence[str] = PRECOMPRESSED_PATHS,
+        cache: PrecompressedCache = precompressed_cache,
+    ):
+        self.app = app
+        self.api_key = api_key
+        self.minimum_size = minimum_size
+        self.codecs = available_codecs()
+        self.precompressed = re.compile("|".join(f"(?:{p})" for p in precompressed_paths))
+        # Réponses JSON validées par ConditionalGetMiddleware : leurs 304 passent par ici
+        self.conditional = re.compile("|".join(f"(?:{p})" for p in CONDITIONAL_GET_PATHS))
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not COMPRESSION_ENABLED or scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        codec = negotiate(headers.get("accept-encoding"), self.codecs)
+        if scope["method"] == "GET" and self.precompressed.fullmatch(scope["path"]):
+            key = await self._static_key(scope, headers)
+            if key is not None:
+                await self._serve_static(scope, receive, send, codec, key)
+                return
+        await _CompressingResponder(self, codec, send, scope).run(scope, receive)
+
+    async def _static_key(self, scope: Scope, headers: Headers) -> Optional[str]:
+        """
+        Clé de cache d'une réponse statique : son ETag, qui suit la version partagée du catalogue.
+        None (pas de cache) sans clé API valide, quand le client revalide son ETag (le 304 est
+        produit plus loin) ou si les versions sont illisibles.
+        """
+        if self.api_key is None or headers.get("x-api-key") != self.api_key:
+            return None
+        user_id = _user_id(headers)
+        try:
+            catalog_version, collection_version = await request_versions(scope, user_id)
+        except Exception as e:
+            logger.warning(f"Versions du catalogue illisibles, réponse non mise en cache : {e}")
+            return None
+        key = compute_etag(
+            scope["path"], scope.get("query_string", b"").decode("latin-1"), user_id, catalog_version, collection_version
+        )
+        if etag_matches(headers.get("if-none-match"), key):
+            return None
+        return key
+
+    async def _serve_static(self, scope: Scope, receive: Receive, send: Send, codec: Optional[Codec], key: str) -> None:
+        entry = self.cache.get(key)
+        if entry is None:
+            messages: List[Message] = []
+
+            async def capture(message: Message) -> None:
+                messages.append(message)
+
+            await self.app(scope, receive, capture)
+            start = messages[0]
+            bodies = [m for m in messages[1:] if m["type"] == "http.response.body"]
+            complete = bool(bodies) and not bodies[-1].get("more_body", False)
+            if start["status"] != 200 or not complete:
+                # Erreur ou flux : rejoué tel quel par le chemin normal
+                responder = _CompressingResponder(self, codec, send, scope)
+                for message in messages:
+                    await responder.on_message(message)
+                return
+            raw = [(name, value) for name, value in start["headers"] if name.lower() != b"content-length"]
+            entry = self.cache.put(key, raw, b"".join(m.get("body", b"") for m in bodies))
+
+        start = {"type": "http.response.start", "status": 200, "headers": list(entry.headers)}
+        headers = MutableHeaders(scope=start)
+        _negotiated_headers(headers, codec)
+        body = entry.body
+        if codec is not None and len(body) >= self.minimum_size:
+            body = self.cache.variant(entry, codec)
+            headers["content-encoding"] = codec.name
+        headers["content-length"] = str(len(body))
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, codec: Optional[Codec], send: Send, scope: Scope):
+        self.middleware = middleware
+        self.codec = codec
+        self.send = send
+        self.conditional = bool(middleware.conditional.fullmatch(scope["path"]))
+        self.start: Optional[Message] = None
+        self.eligible = False
+        self.stream: Optional[_Stream] = None
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.on_message)
+
+    async def on_message(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if message["status"] == 304:
+                if self.conditional:
+                    # Mêmes Vary et ETag que la réponse 200 qu'il valide
+                    _negotiated_headers(MutableHeaders(scope=message), self.codec)
+                await self.send(message)
+                return
+            content_type = headers.get("content-type", "")
+            self.eligible = (
+                message["status"] != 204
+                and "content-encoding" not in headers
+                and "no-transform" not in headers.get("cache-control", "")
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.eligible:
+                _negotiated_headers(MutableHeaders(scope=message), self.codec)
+            if not self.eligible or self.codec is None:
+                self.eligible = False
+                await self.send(message)
+                return
+            # En-têtes envoyés avec le premier morceau : on sait alors si le corps est complet
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or not self.eligible:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(scope=start)
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.eligible = False
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["content-encoding"] = self.codec.name
+            if not more_body:
+                body = self.codec.compress(body)
+                headers["content-length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["content-length"]
+            self.stream = self.codec.stream()
+            await self.send(start)
+
+        chunk = self.stream.feed(body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
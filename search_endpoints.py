@@ -0,0 +1,80 @@
+import re
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import select, func
+from db import SessionLocal
+from models import Album, Artist, Label
+from cover_cache import COVER_LIST_SIZE, cover_proxy_url
+
+router = APIRouter()
+
+SEARCH_CONFIG = "simple"
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def prefix_tsquery(q: str) -> Optional[str]:
+    """
+    Transforme la saisie en requête tsquery « tous les mots, en préfixe » (beat abb -> beat:* & abb:*),
+    pour une recherche au fil de la frappe. Les caractères spéciaux de tsquery sont écartés.
+    """
+    tokens = _TOKEN_RE.findall(q.lower())
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+@router.get("/api/search")
+async def search_catalogue(
+    q: str = Query(..., min_length=1, description="Mots recherchés dans le titre, l'artiste, le label, les genres et les styles"),
+    page: int = Query(1, ge=1, description="Numéro de page (1-indexed)"),
+    page_size: int = Query(20, ge=1, le=100, description="Nombre de résultats par page")
+):
+    """
+    Recherche plein texte dans le catalogue, résultats classés par pertinence (titre > artiste > label > genres/styles).
+    Une seule requête : vecteur indexé (GIN), artiste et label joints, total calculé par fonction de fenêtre.
+    """
+    tsquery_text = prefix_tsquery(q)
+    if tsquery_text is None:
+        raise HTTPException(status_code=400, detail="La recherche doit contenir au moins un mot")
+    tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+    rank = func.ts_rank_cd(Album.search_vector, tsquery)
+    stmt = (
+        select(
+            Album.id, Album.title, Album.year, Album.genre, Album.style, Album.cover_url,
+            Artist.id.label("artist_id"), Artist.name.label("artist_name"),
+            Label.id.label("label_id"), Label.name.label("label_name"),
+            rank.label("rank"),
+            func.count().over().label("total"),
+        )
+        .join(Artist, Album.artist_id == Artist.id, isouter=True)
+        .join(Label, Album.label_id == Label.id, isouter=True)
+        .where(Album.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Album.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+    async with SessionLocal() as session:
+        res = await session.execute(stmt)
+        rows = res.all()
+    results = [{
+        "id": row.id,
+        "title": row.title,
+        "year": row.year,
+        "genre": row.genre,
+        "style": row.style,
+        "cover_url": cover_proxy_url(row.id, row.cover_url),
+        "cover_thumbnail_url": cover_proxy_url(row.id, row.cover_url, size=COVER_LIST_SIZE),
+        "rank": round(float(row.rank), 4),
+        "artist": {"id": row.artist_id, "name": row.artist_name} if row.artist_id is not None else None,
+        "label": {"id": row.label_id, "name": row.label_name} if row.label_id is not None else None,
+    } for row in rows]
+    # Au-delà de la dernière page, aucune ligne ne porte le total
+    total = rows[0].total if rows else (0 if page == 1 else None)
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "results": results
+    }
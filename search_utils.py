@@ -0,0 +1,8 @@
+def escape_like(value: str, escape: str = "\\") -> str:
+    """Échappe les jokers LIKE (% et _) d'une saisie utilisateur."""
+    return value.replace(escape, escape * 2).replace("%", escape + "%").replace("_", escape + "_")
+
+
+def contains_pattern(value: str) -> str:
+    """Motif ILIKE « contient » ; servi par les index trigrammes (pg_trgm) dès 3 caractères."""
+    return f"%{escape_like(value)}%"
@@ -0,0 +1,7 @@
+-- Migration : cache durable des réponses de l'API Discogs
+-- Clé : "masters/<id>" ou "releases/<id>", payload JSON brut renvoyé par Discogs
+CREATE TABLE IF NOT EXISTS discogs_cache (
+    key VARCHAR PRIMARY KEY,
+    payload JSONB NOT NULL,
+    fetched_at TIMESTAMPTZ NOT NULL
+);
@@ -0,0 +1,17 @@
+-- Migration : file d'attente des imports Discogs traités en arrière-plan
+-- Les workers réservent les jobs avec SELECT ... FOR UPDATE SKIP LOCKED
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id SERIAL PRIMARY KEY,
+    discogs_id INTEGER NOT NULL,
+    discogs_type VARCHAR NOT NULL DEFAULT 'master',
+    user_id INTEGER,
+    status VARCHAR NOT NULL DEFAULT 'pending',  -- pending, running, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result JSONB,
+    error VARCHAR,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Index partiel : la recherche du prochain job à traiter ne parcourt que les jobs en attente
+CREATE INDEX IF NOT EXISTS ix_import_jobs_pending ON import_jobs (id) WHERE status = 'pending';
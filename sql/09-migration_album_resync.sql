@@ -0,0 +1,20 @@
+-- Migration : resynchronisation incrémentale des albums avec Discogs
+-- Id Discogs des albums importés depuis une release (les masters utilisent discogs_master_id)
+ALTER TABLE albums ADD COLUMN IF NOT EXISTS discogs_release_id INTEGER;
+
+-- Validateurs HTTP (requêtes conditionnelles) et empreinte du dernier contenu appliqué
+CREATE TABLE IF NOT EXISTS album_discogs_sync (
+    album_id INTEGER PRIMARY KEY REFERENCES albums(id) ON DELETE CASCADE,
+    etag VARCHAR,
+    last_modified VARCHAR,
+    content_hash VARCHAR(64),
+    synced_at TIMESTAMPTZ
+);
+
+-- Curseur de reprise : dernier id d'album traité et nombre de passes complètes
+CREATE TABLE IF NOT EXISTS resync_cursors (
+    name VARCHAR PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    passes INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
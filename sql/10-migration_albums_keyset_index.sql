@@ -0,0 +1,3 @@
+-- Migration : index de la pagination par clé (year, id) de GET /api/albums
+-- Même ordre que la requête : ORDER BY year DESC NULLS LAST, id DESC
+CREATE INDEX IF NOT EXISTS ix_albums_year_id ON albums (year DESC NULLS LAST, id DESC);
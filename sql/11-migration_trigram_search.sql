@@ -0,0 +1,6 @@
+-- Migration : index trigrammes pour les recherches partielles (ILIKE '%q%') et le classement par similarité
+-- Sans ces index, chaque frappe dans le champ de recherche parcourt toute la table artists
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_artists_name_trgm ON artists USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_albums_title_trgm ON albums USING gin (title gin_trgm_ops);
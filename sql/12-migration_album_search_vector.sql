@@ -0,0 +1,53 @@
+-- Migration : recherche plein texte sur le catalogue (titre, artiste, label, genres, styles)
+-- Vecteur stocké dans albums, maintenu par trigger, indexé en GIN
+ALTER TABLE albums ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+-- Configuration 'simple' : pas de racinisation, adaptée aux noms propres et aux titres multilingues
+CREATE OR REPLACE FUNCTION albums_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce((SELECT name FROM artists WHERE id = NEW.artist_id), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce((SELECT name FROM labels WHERE id = NEW.label_id), '')), 'C') ||
+        setweight(to_tsvector('simple',
+            coalesce(array_to_string(NEW.genre, ' '), '') || ' ' || coalesce(array_to_string(NEW.style, ' '), '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS albums_search_vector_trigger ON albums;
+CREATE TRIGGER albums_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, artist_id, label_id, genre, style ON albums
+    FOR EACH ROW EXECUTE FUNCTION albums_search_vector_update();
+
+-- Renommage d'un artiste ou d'un label : recalcule le vecteur des albums concernés
+CREATE OR REPLACE FUNCTION albums_search_vector_refresh_artist() RETURNS trigger AS $$
+BEGIN
+    UPDATE albums SET title = title WHERE artist_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION albums_search_vector_refresh_label() RETURNS trigger AS $$
+BEGIN
+    UPDATE albums SET title = title WHERE label_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS artists_search_vector_trigger ON artists;
+CREATE TRIGGER artists_search_vector_trigger
+    AFTER UPDATE OF name ON artists
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION albums_search_vector_refresh_artist();
+
+DROP TRIGGER IF EXISTS labels_search_vector_trigger ON labels;
+CREATE TRIGGER labels_search_vector_trigger
+    AFTER UPDATE OF name ON labels
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION albums_search_vector_refresh_label();
+
+-- Remplissage des albums existants (déclenche le trigger)
+UPDATE albums SET title = title;
+
+CREATE INDEX IF NOT EXISTS ix_albums_search_vector ON albums USING gin (search_vector);
@@ -0,0 +1,4 @@
+-- Migration : index GIN des tableaux genre et style (filtres ?genre= / ?style= de GET /api/albums)
+-- La classe d'opérateurs par défaut (array_ops) sert @> (tous) et && (au moins un)
+CREATE INDEX IF NOT EXISTS ix_albums_genre_gin ON albums USING gin (genre);
+CREATE INDEX IF NOT EXISTS ix_albums_style_gin ON albums USING gin (style);
@@ -0,0 +1,5 @@
+-- Migration : nouvelles tentatives différées et heartbeat des jobs d'import
+-- run_after : un job en échec n'est repris qu'après un délai exponentiel (429 / panne Discogs)
+-- heartbeat_at : rafraîchi par le worker pendant le traitement ; un job sans signe de vie est remis en attente
+ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS run_after TIMESTAMPTZ;
+ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
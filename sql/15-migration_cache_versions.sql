@@ -0,0 +1,108 @@
+-- Migration : versions du catalogue et des collections partagées entre instances de l'API
+-- Les ETags des GET (conditional_get.py) sont calculés à partir de ces versions : une écriture
+-- faite sur une instance (ou par un script d'import) change l'ETag sur toutes les autres
+CREATE TABLE IF NOT EXISTS cache_versions (
+    scope VARCHAR PRIMARY KEY,  -- 'collection:<user_id>'
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Catalogue : version tirée d'une séquence (nextval ne prend aucun verrou de ligne, les
+-- écrivains concurrents ne s'attendent pas), une fois par instruction qui modifie au moins
+-- une ligne (un INSERT ... ON CONFLICT DO NOTHING sans effet ne périme aucun ETag).
+-- nextval n'est pas transactionnel : une lecture faite entre l'instruction et son commit peut
+-- associer la nouvelle version à l'ancien contenu ; CONDITIONAL_GET_TTL borne cet écart.
+-- Un trigger par événement : une table de transition (changed_rows) n'en accepte qu'un seul.
+CREATE SEQUENCE IF NOT EXISTS catalog_version_seq;
+
+CREATE OR REPLACE FUNCTION cache_versions_bump_catalog() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    PERFORM nextval('catalog_version_seq');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- albums
+DROP TRIGGER IF EXISTS albums_cache_version_trigger ON albums;
+DROP TRIGGER IF EXISTS albums_cache_version_insert ON albums;
+CREATE TRIGGER albums_cache_version_insert
+    AFTER INSERT ON albums REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS albums_cache_version_update ON albums;
+CREATE TRIGGER albums_cache_version_update
+    AFTER UPDATE ON albums REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS albums_cache_version_delete ON albums;
+CREATE TRIGGER albums_cache_version_delete
+    AFTER DELETE ON albums REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS albums_cache_version_truncate ON albums;
+CREATE TRIGGER albums_cache_version_truncate
+    AFTER TRUNCATE ON albums
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+
+-- artists
+DROP TRIGGER IF EXISTS artists_cache_version_trigger ON artists;
+DROP TRIGGER IF EXISTS artists_cache_version_insert ON artists;
+CREATE TRIGGER artists_cache_version_insert
+    AFTER INSERT ON artists REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS artists_cache_version_update ON artists;
+CREATE TRIGGER artists_cache_version_update
+    AFTER UPDATE ON artists REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS artists_cache_version_delete ON artists;
+CREATE TRIGGER artists_cache_version_delete
+    AFTER DELETE ON artists REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS artists_cache_version_truncate ON artists;
+CREATE TRIGGER artists_cache_version_truncate
+    AFTER TRUNCATE ON artists
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+
+-- labels
+DROP TRIGGER IF EXISTS labels_cache_version_trigger ON labels;
+DROP TRIGGER IF EXISTS labels_cache_version_insert ON labels;
+CREATE TRIGGER labels_cache_version_insert
+    AFTER INSERT ON labels REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS labels_cache_version_update ON labels;
+CREATE TRIGGER labels_cache_version_update
+    AFTER UPDATE ON labels REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS labels_cache_version_delete ON labels;
+CREATE TRIGGER labels_cache_version_delete
+    AFTER DELETE ON labels REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+DROP TRIGGER IF EXISTS labels_cache_version_truncate ON labels;
+CREATE TRIGGER labels_cache_version_truncate
+    AFTER TRUNCATE ON labels
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_versions_bump_catalog();
+
+-- Collection : version propre à chaque utilisateur
+CREATE OR REPLACE FUNCTION cache_versions_bump_collection() RETURNS trigger AS $$
+DECLARE
+    owner_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        owner_id := OLD.user_id;
+    ELSE
+        owner_id := NEW.user_id;
+    END IF;
+    INSERT INTO cache_versions (scope, version) VALUES ('collection:' || owner_id, 1)
+    ON CONFLICT (scope) DO UPDATE SET version = cache_versions.version + 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_album_collection_cache_version_trigger ON user_album_collection;
+CREATE TRIGGER user_album_collection_cache_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON user_album_collection
+    FOR EACH ROW EXECUTE FUNCTION cache_versions_bump_collection();
+
+-- Ancienne ligne de version du catalogue, remplacée par catalog_version_seq
+DELETE FROM cache_versions WHERE scope = 'catalog';
@@ -2,12 +2,13 @@ from fastapi import APIRouter
 from sqlalchemy import select, func
 from sqlalchemy.sql import text
 from db import SessionLocal
+from json_response import FastJSONResponse
 from models import Album
 import logging
 
 logger = logging.getLogger("disco2000")
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 
 @router.get("/api/statistics/genres-styles")
@@ -64,13 +65,13 @@ async def get_genres_and_styles_statistics():
         
         logger.info(f"Statistiques générées : {len(genres)} genres, {len(styles)} styles, {total_albums} albums")
         
-        return {
+        return FastJSONResponse({
             "total_albums": total_albums,
             "total_genres": len(genres),
             "total_styles": len(styles),
             "genres": genres,
             "styles": styles
-        }
+        })
 
 
 @router.get("/api/statistics/genres")
@@ -102,10 +103,10 @@ async def get_genres_statistics():
             for name, count in sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)
         ]
         
-        return {
+        return FastJSONResponse({
             "total": len(genres),
             "genres": genres
-        }
+        })
 
 
 @router.get("/api/statistics/styles")
@@ -137,10 +138,10 @@ async def get_styles_statistics():
             for name, count in sorted(style_counts.items(), key=lambda x: x[1], reverse=True)
         ]
         
-        return {
+        return FastJSONResponse({
             "total": len(styles),
             "styles": styles
-        }
+        })
 
 
 @router.get("/api/statistics/overview")
@@ -186,7 +187,7 @@ async def get_overview_statistics():
             for decade, count in decades_result.all()
         ]
         
-        return {
+        return FastJSONResponse({
             "total_albums": total_albums,
             "total_artists": total_artists,
             "total_labels": total_labels,
@@ -195,4 +196,4 @@ async def get_overview_statistics():
                 "max": max_year
             } if min_year and max_year else None,
             "albums_by_decade": decades
-        }
+        })
@@ -0,0 +1,166 @@
+"""
+Tests pour l'import en lot d'albums studio Discogs.
+"""
+import os
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app, DiscogsMasterResponse, LabelInfo
+from tests.utils_jwt import get_test_jwt_contributeur
+
+
+def make_master(master_id, title, artist="Batch Artist"):
+    return DiscogsMasterResponse(
+        artiste=artist,
+        titre=title,
+        identifiants_discogs={"master_id": master_id, "main_release": None, "artist_id": 5},
+        genres=["Rock"],
+        styles=["Indie"],
+        annee=2001,
+        label=[LabelInfo(name="Batch Label", id=9, catno="BL1")],
+        pochette=None,
+    )
+
+
+def get_auth_headers():
+    return {
+        "X-API-KEY": os.getenv("API_KEY"),
+        "Authorization": f"Bearer {get_test_jwt_contributeur()}"
+    }
+
+
+@pytest.mark.asyncio
+async def test_fetch_discogs_items_bounded_and_deduplicated(monkeypatch):
+    from album_import import fetch_discogs_items
+    in_flight = 0
+    max_in_flight = 0
+    calls = []
+    async def dummy_fetch_discogs_master(master_id, client=None, priority=None):
+        nonlocal in_flight, max_in_flight
+        calls.append(master_id)
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return make_master(master_id, f"Album {master_id}")
+    monkeypatch.setattr("main.fetch_discogs_master", dummy_fetch_discogs_master)
+    items = [(i, "master") for i in range(10)] + [(3, "master")]
+    fetched = await fetch_discogs_items(items, concurrency=3)
+    assert max_in_flight <= 3
+    assert sorted(calls) == list(range(10))
+    assert fetched[(3, "master")].titre == "Album 3"
+
+
+@pytest.mark.asyncio
+async def test_batch_import_created_conflict_and_error(monkeypatch):
+    from fastapi import HTTPException
+    async def dummy_fetch_discogs_master(master_id, client=None, priority=None):
+        if master_id == 404:
+            raise HTTPException(status_code=404, detail="Master non trouvé sur Discogs")
+        return make_master(master_id, f"Album {master_id}")
+    monkeypatch.setattr("main.fetch_discogs_master", dummy_fetch_discogs_master)
+
+    class DummyResult:
+        def __init__(self, rows):
+            self.rows = rows
+        def all(self):
+            return self.rows
+        def scalars(self):
+            return self
+    class DummySession:
+        def __init__(self):
+            self.statements = []
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            sql = str(stmt)
+            self.statements.append(sql)
+            if sql.startswith("SELECT artists.name"):
+                return DummyResult([("Batch Artist", 42)])
+            if sql.startswith("SELECT labels.discogs_id"):
+                return DummyResult([])
+            if sql.startswith("INSERT INTO labels"):
+                return DummyResult([(9, 3)])
+            if sql.startswith("SELECT albums.discogs_master_id"):
+                return DummyResult([100])  # le master 100 existe déjà
+            if sql.startswith("SELECT albums.title"):
+                return DummyResult([])
+            if sql.startswith("INSERT INTO albums"):
+                return DummyResult([(7, 200, "Album 200", 2001, 42, "master")])
+            raise AssertionError(f"Requête inattendue : {sql}")
+        async def commit(self):
+            pass
+        async def rollback(self):
+            pass
+    session = DummySession()
+    monkeypatch.setattr("album_import.SessionLocal", lambda: session)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/albums/studio/batch",
+            json={"items": [
+                {"discogs_id": 100, "discogs_type": "master"},
+                {"discogs_id": 200, "discogs_type": "master"},
+                {"discogs_id": 404, "discogs_type": "master"},
+                {"discogs_id": 200, "discogs_type": "master"},
+            ]},
+            headers=get_auth_headers()
+        )
+    assert response.status_code == 200
+    data = response.json()
+    statuses = [r["status"] for r in data["results"]]
+    assert statuses == ["conflict", "created", "error", "conflict"]
+    assert data["results"][1]["album_id"] == 7
+    assert data["results"][2]["detail"] == "Master non trouvé sur Discogs"
+    assert data["summary"] == {"created": 1, "conflict": 2, "error": 1}
+    # Nombre de requêtes fixe, indépendant du nombre d'albums
+    assert len(session.statements) == 6
+
+
+@pytest.mark.asyncio
+async def test_batch_import_rejects_empty_list():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/albums/studio/batch", json={"items": []}, headers=get_auth_headers())
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_filter_conflicts_matches_missing_year_and_artist():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+    from album_import import _filter_conflicts, CONFLICT_MASTER_EXISTS, CONFLICT_RELEASE_EXISTS
+    # Table albums réduite aux colonnes lues par _filter_conflicts, sous SQLite (NULL compris)
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE albums (id INTEGER PRIMARY KEY, title TEXT, year INTEGER, artist_id INTEGER, "
+            "discogs_link_type TEXT, discogs_master_id INTEGER)"
+        ))
+        conn.execute(text(
+            "INSERT INTO albums (title, year, artist_id, discogs_link_type, discogs_master_id) VALUES "
+            "('Sans date', NULL, 42, 'release', NULL), ('Sans artiste', 1999, NULL, 'master', 7), "
+            "('Daté', 2001, 42, 'release', NULL)"
+        ))
+    class DummySession:
+        def __init__(self):
+            self.session = Session(engine)
+        async def execute(self, stmt):
+            return self.session.execute(stmt)
+    def album(title, year, artist_id, link_type, master_id=None):
+        return {"title": title, "year": year, "artist_id": artist_id, "discogs_link_type": link_type, "discogs_master_id": master_id}
+    candidates = list(enumerate([
+        album("Sans date", None, 42, "master", 10),
+        album("Sans artiste", 1999, None, "release"),
+        album("Daté", 2001, 42, "master", 11),
+        album("Sans date", None, 43, "master", 12),
+    ]))
+    results = [{"status": None} for _ in candidates]
+    to_insert = await _filter_conflicts(DummySession(), candidates, results)
+    assert results[0] == {"status": "conflict", "detail": CONFLICT_RELEASE_EXISTS}
+    assert results[1] == {"status": "conflict", "detail": CONFLICT_MASTER_EXISTS}
+    assert results[2] == {"status": "conflict", "detail": CONFLICT_RELEASE_EXISTS}
+    assert [index for index, _ in to_insert] == [3]
@@ -63,6 +63,14 @@ async def test_get_album_details(monkeypatch):
     import album_endpoints
     monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
 
+@pytest.fixture(autouse=True)
+def empty_album_detail_cache():
+    from catalog_state import album_detail_cache
+    album_detail_cache.clear()
+    yield
+    album_detail_cache.clear()
+
+
 @pytest.mark.asyncio
 async def test_get_album_details_404(monkeypatch):
     class DummySession:
@@ -70,8 +78,11 @@ async def test_get_album_details_404(monkeypatch):
             return self
         async def __aexit__(self, exc_type, exc, tb):
             pass
-        async def get(self, model, obj_id):
-            return None
+        async def execute(self, stmt):
+            class DummyResult:
+                def first(self_inner):
+                    return None
+            return DummyResult()
     import album_endpoints
     monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
     transport = ASGITransport(app=app)
@@ -85,17 +96,8 @@ async def test_get_album_details_404(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_get_album_details_200(monkeypatch):
-    class DummyArtist(object):
-        def __init__(self):
-            self.id = 1
-            self.name = "Test Artist"
-            self.discogs_id = 123
-    class DummyLabel(object):
-        def __init__(self):
-            self.id = 2
-            self.name = "Test Label"
-            self.discogs_id = 456
-    class DummyAlbum(object):
+    # Ligne jointe : album, artiste et label
+    class DummyRow(object):
         def __init__(self):
             self.id = 42
             self.title = "Test Album"
@@ -106,21 +108,26 @@ async def test_get_album_details_200(monkeypatch):
             self.catno = "ABC123"
             self.type = "Studio"
             self.discogs_master_id = 789
-            self.artist_id = 1
-            self.label_id = 2
+            self.artist__id = 1
+            self.artist__name = "Test Artist"
+            self.artist__discogs_id = 123
+            self.label__id = 2
+            self.label__name = "Test Label"
+            self.label__discogs_id = 456
+    statements = []
     class DummySession:
         async def __aenter__(self):
             return self
         async def __aexit__(self, exc_type, exc, tb):
             pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            class DummyResult:
+                def first(self_inner):
+                    return DummyRow()
+            return DummyResult()
         async def get(self, model, obj_id):
-            if model.__name__ == "Album" and obj_id == 42:
-                return DummyAlbum()
-            if model.__name__ == "Artist" and obj_id == 1:
-                return DummyArtist()
-            if model.__name__ == "Label" and obj_id == 2:
-                return DummyLabel()
-            return None
+            raise AssertionError("Une seule requête jointe attendue")
     import album_endpoints
     monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
     transport = ASGITransport(app=app)
@@ -136,3 +143,185 @@ async def test_get_album_details_200(monkeypatch):
         assert data["artist"]["name"] == "Test Artist"
         assert data["label"]["name"] == "Test Label"
         assert data["discogs_master_id"] == 789
+    # Album, artiste et label en une seule requête
+    assert len(statements) == 1
+    assert "LEFT OUTER JOIN artists" in statements[0] and "LEFT OUTER JOIN labels" in statements[0]
+
+
+@pytest.mark.asyncio
+async def test_get_album_details_cache(monkeypatch):
+    from jwt_utils import create_access_token
+    from catalog_state import catalog_state
+    class DummyRow:
+        id = 42
+        title = "Test Album"
+        year = 2020
+        genre = ["Rock"]
+        style = ["Indie"]
+        cover_url = "http://img.com/cover.jpg"
+        catno = "ABC123"
+        type = "Studio"
+        discogs_master_id = 789
+        artist__id = 1
+        artist__name = "Test Artist"
+        artist__discogs_id = 123
+        label__id = 2
+        label__name = "Test Label"
+        label__discogs_id = 456
+        collection_id = 3
+        cd = False
+        vinyl = True
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            class DummyResult:
+                def first(self_inner):
+                    return DummyRow()
+            return DummyResult()
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    token = create_access_token({"id": 5, "roles": ["utilisateur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        user_headers = {**headers, "Authorization": f"Bearer {token}"}
+        first = await client.get("/api/albums/42", headers=user_headers)
+        anonymous = await client.get("/api/albums/42", headers=headers)
+        subset = await client.get("/api/albums/42", params={"fields": "title,label"}, headers=headers)
+        user = await client.get("/api/albums/42", headers=user_headers)
+        catalog_state.catalog_changed()
+        refreshed = await client.get("/api/albums/42", headers=headers)
+    assert first.json()["collection"] == {"cd": False, "vinyl": True}
+    assert len(statements) == 3
+    # Requête jointe au premier appel, puis cache : seule la collection de l'utilisateur est relue
+    assert "LEFT OUTER JOIN user_album_collection" in statements[0]
+    assert "FROM user_album_collection" in statements[1] and "albums" not in statements[1]
+    assert "collection" not in anonymous.json()
+    assert anonymous.json() == {k: v for k, v in first.json().items() if k != "collection"}
+    assert subset.json() == {"title": "Test Album", "label": {"id": 2, "name": "Test Label", "discogs_id": 456}}
+    assert user.json() == first.json()
+    # Une écriture dans le catalogue périme la fiche en cache
+    assert refreshed.status_code == 200
+    assert "FROM albums" in statements[2]
+
+
+@pytest.mark.asyncio
+async def test_get_album_details_fields_projection(monkeypatch):
+    from types import SimpleNamespace
+    statements = []
+    class DummyResult:
+        def __init__(self, row):
+            self.row = row
+        def first(self):
+            return self.row
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            row = SimpleNamespace(id=42, title="Test Album", artist__id=1, artist__name="Test Artist", artist__discogs_id=123)
+            return DummyResult(row if len(statements) == 1 else None)
+        async def get(self, model, obj_id):
+            raise AssertionError("Chargement de l'entité complète inattendu")
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get("/api/albums/42", params={"fields": "title,artist"}, headers=headers)
+        missing = await client.get("/api/albums/43", params={"fields": "title"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"title": "Test Album", "artist": {"id": 1, "name": "Test Artist", "discogs_id": 123}}
+    assert "albums.genre" not in statements[0] and "labels" not in statements[0]
+    assert "LEFT OUTER JOIN artists" in statements[0]
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_albums_batch(monkeypatch):
+    from jwt_utils import create_access_token
+    statements = []
+    class DummyRow:
+        def __init__(self, album_id, title):
+            self.id = album_id
+            self.title = title
+            self.artist__id = None
+            self.artist__name = None
+            self.artist__discogs_id = None
+            self.collection_id = 7 if album_id == 3 else None
+            self.cd = True
+            self.vinyl = False
+    class DummyResult:
+        def all(self):
+            # Ordre de la base, différent de l'ordre demandé
+            return [DummyRow(3, "Album 3"), DummyRow(1, "Album 1")]
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            return DummyResult()
+        async def get(self, model, obj_id):
+            raise AssertionError("Aucune requête par album attendue")
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    token = create_access_token({"id": 5, "roles": ["utilisateur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY"), "Authorization": f"Bearer {token}"}
+        response = await client.get(
+            "/api/albums/batch", params=[("ids", "1,2"), ("ids", "3"), ("fields", "title,artist,collection")], headers=headers
+        )
+        invalid = await client.get("/api/albums/batch", params={"ids": "1,abc"}, headers=headers)
+        too_many = await client.get("/api/albums/batch", params={"ids": ",".join(str(i) for i in range(1000))}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["albums"] == [
+        {"title": "Album 1", "artist": None, "collection": None},
+        {"title": "Album 3", "artist": None, "collection": {"cd": True, "vinyl": False}},
+    ]
+    assert data["missing"] == [2]
+    # Une seule requête pour tout le lot : artiste et collection en jointure, filtre IN
+    assert len(statements) == 1
+    assert "LEFT OUTER JOIN artists" in statements[0] and "LEFT OUTER JOIN user_album_collection" in statements[0]
+    assert "albums.id IN" in statements[0]
+    assert invalid.status_code == 400
+    assert too_many.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_collection_field_requires_user(monkeypatch):
+    from jwt_utils import create_access_token
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            raise AssertionError("Aucune requête attendue sans droit sur la collection")
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    token = create_access_token({"id": 5, "roles": ["contributeur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        batch = await client.get("/api/albums/batch", params={"ids": "1", "fields": "collection"}, headers=headers)
+        details = await client.get("/api/albums/42", params={"fields": "title,collection"}, headers=headers)
+        albums = await client.get("/api/albums", params={"fields": "collection"}, headers=headers)
+        no_role = await client.get(
+            "/api/albums/batch", params={"ids": "1", "fields": "collection"},
+            headers={**headers, "Authorization": f"Bearer {token}"}
+        )
+    assert batch.status_code == 401
+    assert details.status_code == 401
+    assert albums.status_code == 401
+    assert no_role.status_code == 403
@@ -0,0 +1,120 @@
+"""
+Tests pour la resynchronisation incrémentale des albums avec Discogs.
+"""
+import pytest
+from types import SimpleNamespace
+from album_resync import AlbumResyncer, album_resource, content_hash, fetch_conditional, synced_values
+
+MASTER = {
+    "genres": ["Rock"],
+    "styles": ["Indie"],
+    "year": 1997,
+    "images": [{"type": "primary", "uri": "https://i.discogs.com/new.jpg"}],
+}
+
+
+def make_row(album_id, master_id, cover_url="https://i.discogs.com/old.jpg", **sync):
+    values = {
+        "id": album_id, "discogs_link_type": "master", "discogs_master_id": master_id, "discogs_release_id": None,
+        "genre": ["Rock"], "style": ["Indie"], "cover_url": cover_url, "year": 1997,
+        "etag": None, "last_modified": None, "content_hash": None,
+    }
+    values.update(sync)
+    return SimpleNamespace(**values)
+
+
+class DummyResponse:
+    def __init__(self, status_code, json_data=None, headers=None):
+        self.status_code = status_code
+        self._json = json_data
+        self.headers = headers or {}
+    def json(self):
+        return self._json
+
+
+def test_album_resource():
+    assert album_resource("master", 10, None) == ("masters", 10)
+    assert album_resource("release", None, 20) == ("releases", 20)
+    assert album_resource("release", None, None) is None
+
+
+@pytest.mark.asyncio
+async def test_sync_chunk_writes_only_changed_rows(monkeypatch):
+    rows = [
+        make_row(1, 101),  # pochette changée chez Discogs
+        make_row(2, 102, cover_url="https://i.discogs.com/new.jpg"),  # identique
+        make_row(3, 103, etag='"abc"'),  # 304
+        make_row(4, 104),  # 404
+        SimpleNamespace(**{**vars(make_row(5, None)), "discogs_link_type": "release"}),  # release sans id
+    ]
+    async def dummy_claim_chunk(chunk_size):
+        return rows, 0, 0
+    seen_etags = {}
+    async def dummy_fetch(kind, discogs_id, client, etag=None, last_modified=None):
+        seen_etags[discogs_id] = etag
+        if discogs_id == 103:
+            return DummyResponse(304)
+        if discogs_id == 104:
+            return DummyResponse(404)
+        return DummyResponse(200, MASTER, {"ETag": f'"{discogs_id}"'})
+    applied = {}
+    async def dummy_apply(album_updates, sync_rows, cursor=None):
+        applied["albums"] = album_updates
+        applied["sync"] = sync_rows
+        applied["cursor"] = cursor
+    async def dummy_cache_set(kind, discogs_id, data):
+        pass
+    monkeypatch.setattr("album_resync.claim_chunk", dummy_claim_chunk)
+    monkeypatch.setattr("album_resync.fetch_conditional", dummy_fetch)
+    monkeypatch.setattr("album_resync.apply_changes", dummy_apply)
+    monkeypatch.setattr("album_resync.discogs_cache.set", dummy_cache_set)
+
+    resyncer = AlbumResyncer(rate=0, chunk_size=10)
+    processed = await resyncer.sync_chunk(client=object())
+    assert processed == 5
+    assert seen_etags[103] == '"abc"'
+    assert applied["albums"] == [{"id": 1, **synced_values(MASTER)}]
+    assert [r["album_id"] for r in applied["sync"]] == [1, 2]
+    assert applied["sync"][0]["content_hash"] == content_hash(synced_values(MASTER))
+    # Curseur enregistré avec les mises à jour, après le dernier album du lot
+    assert applied["cursor"] == (0, 5, 0)
+    stats = resyncer.stats()
+    assert (stats["updated"], stats["unchanged"], stats["not_modified"], stats["errors"], stats["skipped"]) == (1, 1, 1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_sync_chunk_interrupted_keeps_cursor_on_last_done_row(monkeypatch):
+    rows = [make_row(11, 111), make_row(12, 112), make_row(13, 113)]
+    async def dummy_claim_chunk(chunk_size):
+        return rows, 10, 2
+    async def dummy_fetch(kind, discogs_id, client, etag=None, last_modified=None):
+        if discogs_id == 112:
+            raise RuntimeError("arrêt")
+        return DummyResponse(304)
+    applied = {}
+    async def dummy_apply(album_updates, sync_rows, cursor=None):
+        applied["cursor"] = cursor
+    monkeypatch.setattr("album_resync.claim_chunk", dummy_claim_chunk)
+    monkeypatch.setattr("album_resync.fetch_conditional", dummy_fetch)
+    monkeypatch.setattr("album_resync.apply_changes", dummy_apply)
+
+    with pytest.raises(RuntimeError):
+        await AlbumResyncer(rate=0, chunk_size=3).sync_chunk(client=object())
+    # L'album 12 n'a pas été traité : la reprise recommence à partir de lui
+    assert applied["cursor"] == (10, 11, 2)
+
+
+@pytest.mark.asyncio
+async def test_fetch_conditional_sends_validators(monkeypatch):
+    monkeypatch.setattr("discogs_utils.DISCOGS_API_URL", "http://standin")
+    calls = []
+    class DummyClient:
+        async def get(self, url, headers=None):
+            calls.append((url, headers))
+            return DummyResponse(304)
+    response = await fetch_conditional("masters", 7, DummyClient(), etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    assert response.status_code == 304
+    url, headers = calls[0]
+    assert url == "http://standin/masters/7"
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
@@ -4,19 +4,23 @@ import pytest
 from httpx import AsyncClient, ASGITransport
 from main import app
 
+
+@pytest.fixture(autouse=True)
+def fresh_catalog_state(monkeypatch):
+    # Les totaux mis en cache d'un test ne doivent pas fausser le comptage des requêtes du suivant
+    import catalog_state
+    monkeypatch.setattr(catalog_state, "catalog_state", catalog_state.CatalogState())
+
+
 @pytest.mark.asyncio
 async def test_get_albums_structure(monkeypatch):
-    class DummyAlbum:
-        def __init__(self, id, artist_id, title, year, cover_url):
+    class DummyRow:
+        def __init__(self, id, artist_name, title, year, cover_url):
             self.id = id
-            self.artist_id = artist_id
+            self.artist_name = artist_name
             self.title = title
             self.year = year
             self.cover_url = cover_url
-    class DummyArtist:
-        def __init__(self, id, name):
-            self.id = id
-            self.name = name
     class DummySession:
         async def __aenter__(self):
             return self
@@ -24,16 +28,13 @@ async def test_get_albums_structure(monkeypatch):
             pass
         async def execute(self, stmt):
             class DummyResult:
-                def scalars(self_inner):
-                    class DummyScalar:
-                        def all(self_inner2):
-                            return [DummyAlbum(10, 1, "Album 1", 2020, "url1"), DummyAlbum(11, 2, "Album 2", 2021, "url2")]
-                    return DummyScalar()
+                def scalar(self_inner):
+                    return 2
+                def all(self_inner):
+                    return [DummyRow(10, "Artist 1", "Album 1", 2020, "url1"), DummyRow(11, "Artist 2", "Album 2", 2021, "url2")]
             return DummyResult()
         async def get(self, model, obj_id):
-            if model.__name__ == "Artist":
-                return DummyArtist(obj_id, f"Artist {obj_id}")
-            return None
+            raise AssertionError("Aucune requête par album attendue")
     import album_endpoints
     monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
     transport = ASGITransport(app=app)
@@ -42,10 +43,286 @@ async def test_get_albums_structure(monkeypatch):
         response = await client.get("/api/albums", headers=headers)
         assert response.status_code == 200
         data = response.json()
-        assert isinstance(data, list)
-        for album in data:
+        assert data["total"] == 2
+        assert isinstance(data["albums"], list)
+        for album in data["albums"]:
             assert isinstance(album, dict)
             assert "artist" in album
             assert "title" in album
             assert "year" in album
             assert "cover_url" in album
+        assert data["albums"][0]["artist"] == "Artist 1"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("page_size", [1, 20, 100])
+async def test_get_albums_constant_query_count(monkeypatch, page_size):
+    from jwt_utils import create_access_token
+    class DummyRow:
+        def __init__(self, id, collection):
+            self.id = id
+            self.artist_name = f"Artist {id}"
+            self.title = f"Album {id}"
+            self.year = 2000
+            self.cover_url = None
+            self.collection_id = 1 if collection else None
+            self.cd = collection[0] if collection else None
+            self.vinyl = collection[1] if collection else None
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            class DummyResult:
+                def scalar(self_inner):
+                    return page_size
+                def all(self_inner):
+                    return [DummyRow(i, (True, False) if i % 2 else None) for i in range(page_size)]
+            return DummyResult()
+        async def get(self, model, obj_id):
+            raise AssertionError("Aucune requête par album attendue")
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    token = create_access_token({"id": 1, "roles": ["utilisateur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY"), "Authorization": f"Bearer {token}"}
+        response = await client.get(f"/api/albums?page_size={page_size}", headers=headers)
+    assert response.status_code == 200
+    albums = response.json()["albums"]
+    assert len(albums) == page_size
+    assert albums[0]["collection"] is None
+    if page_size > 1:
+        assert albums[1]["collection"] == {"cd": True, "vinyl": False}
+    # Comptage + page, quelle que soit la taille de la page
+    assert len(statements) == 2
+    assert "LEFT OUTER JOIN user_album_collection" in statements[1]
+
+
+@pytest.mark.asyncio
+async def test_get_albums_cursor_pagination(monkeypatch):
+    from pagination import decode_cursor, encode_cursor
+    class DummyRow:
+        def __init__(self, id, year):
+            self.id = id
+            self.artist_name = "A"
+            self.title = f"Album {id}"
+            self.year = year
+            self.cover_url = None
+    # Première requête : albums restants de l'année du curseur ; seconde : albums sans année
+    pages = [[DummyRow(5, 1999), DummyRow(3, 1999)], [DummyRow(9, None)]]
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            class DummyResult:
+                def scalar(self_inner):
+                    return 10
+                def all(self_inner):
+                    return pages.pop(0)
+            return DummyResult()
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    cursor = encode_cursor({"year": 2001, "id": 12})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get("/api/albums", params={"cursor": cursor, "page_size": 3}, headers=headers)
+        invalid = await client.get("/api/albums", params={"cursor": "pas-un-curseur"}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [a["id"] for a in data["albums"]] == [5, 3, 9]
+    assert data["page"] is None
+    # Page pleine : le curseur suivant reprend après le dernier album (sans année)
+    assert decode_cursor(data["next_cursor"]) == {"year": None, "id": 9}
+    assert "(albums.year, albums.id) < " in statements[1]
+    assert "albums.year IS NULL" in statements[2]
+    assert invalid.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_albums_count_modes(monkeypatch):
+    import album_endpoints
+    import catalog_state
+    class DummyRow:
+        id = 1
+        artist_name = "A"
+        title = "Album 1"
+        year = 2000
+        cover_url = None
+    sessions = []
+    class DummySession:
+        def __init__(self):
+            self.statements = []
+            sessions.append(self)
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            self.statements.append(str(stmt))
+            class DummyResult:
+                def scalar(self_inner):
+                    return 42
+                def all(self_inner):
+                    return [DummyRow()]
+            return DummyResult()
+    monkeypatch.setattr(album_endpoints, "SessionLocal", DummySession)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        first = await client.get("/api/albums", headers=headers)
+        cached = await client.get("/api/albums", params={"page": 2}, headers=headers)
+        skipped = await client.get("/api/albums", params={"count": "none", "artist": "x"}, headers=headers)
+        catalog_state.catalog_state.album_catalog_changed(delta=1)
+        estimated = await client.get("/api/albums", params={"count": "estimated"}, headers=headers)
+        invalidated = await client.get("/api/albums", headers=headers)
+        invalid = await client.get("/api/albums", params={"count": "approx"}, headers=headers)
+    assert first.json()["total"] == 42
+    assert len(sessions[0].statements) == 2
+    # Même signature de filtres : total servi par le cache
+    assert cached.json()["total"] == 42
+    assert len(sessions[1].statements) == 1
+    assert skipped.json()["total"] is None
+    assert len(sessions[2].statements) == 1
+    # Sans filtre, le compteur entretenu suit les insertions
+    assert estimated.json()["total"] == 43
+    assert len(sessions[3].statements) == 1
+    assert len(sessions[4].statements) == 2
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_albums_estimated_count_with_genre_filter(monkeypatch):
+    from sqlalchemy.dialects.postgresql import asyncpg
+    class DummyRow:
+        id = 1
+        artist_name = "A"
+        title = "Album 1"
+        year = 2000
+        cover_url = None
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        def begin_nested(self):
+            class DummySavepoint:
+                async def __aenter__(self_inner):
+                    return self_inner
+                async def __aexit__(self_inner, exc_type, exc, tb):
+                    pass
+            return DummySavepoint()
+        async def execute(self, stmt):
+            statements.append(stmt.compile(dialect=asyncpg.dialect()))
+            is_explain = str(statements[-1]).startswith("EXPLAIN")
+            class DummyResult:
+                def scalar(self_inner):
+                    return [{"Plan": {"Plan Rows": 1234}}] if is_explain else 7
+                def all(self_inner):
+                    return [DummyRow()]
+            return DummyResult()
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get(
+            "/api/albums", params={"count": "estimated", "genre": "Rock", "title": "l'album"}, headers=headers
+        )
+    assert response.status_code == 200
+    assert response.json()["total"] == 1234
+    assert response.json()["total_estimated"] is True
+    explain = next(stmt for stmt in statements if str(stmt).startswith("EXPLAIN"))
+    # Paramètres liés : tableau typé varchar[], saisie utilisateur hors du texte SQL
+    assert "::VARCHAR[]" in str(explain) and "l'album" not in str(explain)
+    assert ["Rock"] in explain.params.values()
+    assert not any("count(" in str(stmt) for stmt in statements)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("match,operator", [("any", "&&"), ("all", "@>")])
+async def test_get_albums_genre_style_filters(monkeypatch, match, operator):
+    class DummyRow:
+        id = 1
+        artist_name = "A"
+        title = "Album 1"
+        year = 1995
+        cover_url = None
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            class DummyResult:
+                def scalar(self_inner):
+                    return 1
+                def all(self_inner):
+                    return [DummyRow()]
+            return DummyResult()
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get(
+            "/api/albums",
+            params=[("genre", "Electronic"), ("style", "Techno,House"), ("match", match)],
+            headers=headers
+        )
+    assert response.status_code == 200
+    for sql in statements:
+        assert f"albums.genre {operator}" in sql
+        assert f"albums.style {operator}" in sql
+    assert album_endpoints._split_values(["Techno,House", " Techno "]) == ["Techno", "House"]
+
+
+@pytest.mark.asyncio
+async def test_get_albums_fields_projection(monkeypatch):
+    class DummyRow:
+        id = 7
+        title = "Album 7"
+        year = 2001
+        cover_url = "http://img/7.jpg"
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            class DummyResult:
+                def scalar(self_inner):
+                    return 1
+                def all(self_inner):
+                    return [DummyRow()]
+            return DummyResult()
+    import album_endpoints
+    monkeypatch.setattr(album_endpoints, "SessionLocal", lambda: DummySession())
+    monkeypatch.setattr("cover_cache.COVER_PROXY_BASE_URL", "https://api.test")
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get("/api/albums", params={"fields": "title,id,cover_url"}, headers=headers)
+        unknown = await client.get("/api/albums", params={"fields": "title,secret"}, headers=headers)
+    assert response.status_code == 200
+    album = response.json()["albums"][0]
+    assert list(album) == ["id", "title", "cover_url"]
+    assert album["cover_url"].startswith("https://api.test/api/covers/7?v=")
+    # SELECT réduit aux colonnes demandées (+ clés du curseur), sans jointure artiste inutile
+    page_sql = statements[1]
+    assert page_sql.split("FROM")[0].split() == ["SELECT", "albums.id,", "albums.year,", "albums.title,", "albums.cover_url"]
+    assert "JOIN artists" not in page_sql
+    assert unknown.status_code == 400
@@ -30,6 +30,10 @@ def create_dummy_session(artists_list):
                         def all(self_inner2):
                             return artists_list
                     return DummyScalar()
+                def all(self_inner):
+                    return artists_list
+                def first(self_inner):
+                    return artists_list[0] if artists_list else None
             return DummyResult()
     return DummySession
 
@@ -241,3 +245,61 @@ async def test_search_artists_response_structure(monkeypatch):
         assert artist["discogs_id"] == 9999
         assert artist["country"] == "US"
         assert artist["country_name"] == "États-Unis"
+
+
+@pytest.mark.asyncio
+async def test_search_artists_ranked_limited_and_escaped(monkeypatch):
+    """La recherche est classée par similarité, limitée, et les jokers LIKE saisis sont échappés."""
+    statements = []
+    session_class = create_dummy_session([DummyArtist(1, "100% Pure", None, None)])
+    class CapturingSession(session_class):
+        async def execute(self, stmt):
+            statements.append(stmt)
+            return await super().execute(stmt)
+
+    import artist_endpoints
+    monkeypatch.setattr(artist_endpoints, "SessionLocal", lambda: CapturingSession())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get("/api/artists/search", params={"q": "100%", "limit": 5}, headers=headers)
+        too_many = await client.get("/api/artists/search", params={"q": "a", "limit": 1000}, headers=headers)
+    assert response.status_code == 200
+    assert too_many.status_code == 422
+    from sqlalchemy.dialects import postgresql
+    compiled = statements[0].compile(dialect=postgresql.dialect())
+    sql, params = str(compiled), compiled.params
+    assert "ILIKE" in sql and "similarity(artists.name" in sql and "LIMIT" in sql
+    assert "%100\\%%" in params.values()
+    assert 5 in params.values()
+
+
+@pytest.mark.asyncio
+async def test_artists_fields_projection(monkeypatch):
+    """fields= limite le SELECT et la réponse aux colonnes demandées ; un champ inconnu est refusé."""
+    statements = []
+    session_class = create_dummy_session([DummyArtist(1, "Daft Punk", 1234, "FR")])
+    class CapturingSession(session_class):
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            return await super().execute(stmt)
+
+    import artist_endpoints
+    monkeypatch.setattr(artist_endpoints, "SessionLocal", lambda: CapturingSession())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        listing = await client.get("/api/artists", params={"fields": "id,country_name"}, headers=headers)
+        search = await client.get("/api/artists/search", params={"q": "daft", "fields": "name"}, headers=headers)
+        detail = await client.get("/api/artists/1", headers=headers)
+        unknown = await client.get("/api/artists", params={"fields": "id,password"}, headers=headers)
+    assert listing.json() == [{"id": 1, "country_name": "France"}]
+    assert search.json() == [{"name": "Daft Punk"}]
+    assert detail.json() == {"id": 1, "name": "Daft Punk", "discogs_id": 1234, "country": "FR"}
+    assert unknown.status_code == 400
+    select_list = statements[0].split("FROM")[0]
+    assert "artists.id" in select_list and "artists.country" in select_list
+    assert "artists.name" not in select_list and "artists.discogs_id" not in select_list
+    assert statements[1].split("FROM")[0].strip() == "SELECT artists.name"
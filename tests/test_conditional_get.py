@@ -0,0 +1,142 @@
+import os
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app
+
+
+@pytest.fixture
+def shared_versions(monkeypatch):
+    # Versions simulées (séquence du catalogue, table cache_versions), communes à toutes les instances
+    import conditional_get
+    versions = {"catalog": 0}
+    async def dummy_read_versions(session, user_id=None):
+        collection = versions.get(f"collection:{user_id}", 0) if user_id is not None else None
+        return versions["catalog"], collection
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+    monkeypatch.setattr(conditional_get, "read_versions", dummy_read_versions)
+    monkeypatch.setattr(conditional_get, "SessionLocal", lambda: DummySession())
+    return versions
+
+
+@pytest.mark.asyncio
+async def test_artists_not_modified_until_catalog_changes(monkeypatch, shared_versions):
+    calls = []
+    class DummyArtist:
+        id = 1
+        name = "Daft Punk"
+        discogs_id = 1234
+        country = "FR"
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            calls.append(str(stmt))
+            class DummyResult:
+                def all(self_inner):
+                    return [DummyArtist()]
+            return DummyResult()
+    import artist_endpoints
+    monkeypatch.setattr(artist_endpoints, "SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        # Sans compression : ETag fort, comparé en mode faible quand le client renvoie W/
+        headers = {"X-API-KEY": os.getenv("API_KEY"), "Accept-Encoding": "identity"}
+        first = await client.get("/api/artists", headers=headers)
+        etag = first.headers["etag"]
+        cached = await client.get("/api/artists", headers={**headers, "If-None-Match": f'W/{etag}, "autre"'})
+        other_query = await client.get("/api/artists", params={"fields": "id"}, headers={**headers, "If-None-Match": etag})
+        without_key = await client.get("/api/artists", headers={"If-None-Match": etag})
+        # Écriture faite par une autre instance : seule la table partagée change
+        shared_versions["catalog"] += 1
+        changed = await client.get("/api/artists", headers={**headers, "If-None-Match": etag})
+    assert first.status_code == 200
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag and cached.content == b""
+    # Le 304 est servi sans appeler l'endpoint
+    assert len(calls) == 3
+    assert other_query.status_code == 200 and other_query.headers["etag"] != etag
+    assert without_key.status_code in (403, 422)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_collection_not_modified_until_shared_version_changes(monkeypatch, shared_versions):
+    from jwt_utils import create_access_token
+    calls = []
+    class DummyEntry:
+        album_id = 4
+        cd = True
+        vinyl = False
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            calls.append(str(stmt))
+            class DummyResult:
+                def scalars(self_inner):
+                    class DummyScalars:
+                        def all(self_inner2):
+                            return [DummyEntry()]
+                    return DummyScalars()
+            return DummyResult()
+    import collection_endpoints
+    monkeypatch.setattr(collection_endpoints, "SessionLocal", lambda: DummySession())
+    token = create_access_token({"id": 5, "roles": ["utilisateur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY"), "Authorization": f"Bearer {token}"}
+        first = await client.get("/api/collection", headers=headers)
+        etag = first.headers["etag"]
+        cached = await client.get("/api/collection", headers={**headers, "If-None-Match": etag})
+        # Ajout d'un album par l'utilisateur, traité par une autre instance
+        shared_versions["collection:5"] = 1
+        changed = await client.get("/api/collection", headers={**headers, "If-None-Match": etag})
+    assert first.status_code == 200 and "Authorization" in first.headers["vary"]
+    assert cached.status_code == 304
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert len(calls) == 2
+
+
+def test_etag_follows_caller_collection():
+    from conditional_get import compute_etag, etag_matches
+    anonymous = compute_etag("/api/albums", "page=1", None, 3)
+    user_1 = compute_etag("/api/albums", "page=1", 1, 3, 0)
+    user_2 = compute_etag("/api/albums", "page=1", 2, 3, 0)
+    assert len({anonymous, user_1, user_2}) == 3
+    assert compute_etag("/api/albums", "page=1", 1, 3, 1) != user_1
+    assert compute_etag("/api/albums", "page=1", 1, 4, 0) != user_1
+    # Même versions partagées : même ETag sur toutes les instances
+    assert compute_etag("/api/albums", "page=1", 2, 3, 0) == user_2
+    assert etag_matches("*", anonymous)
+    assert not etag_matches(None, anonymous)
+
+
+@pytest.mark.asyncio
+async def test_read_versions_uses_catalog_sequence():
+    from catalog_state import read_versions
+    statements = []
+    class DummySession:
+        def __init__(self, row):
+            self.row = row
+        async def execute(self, stmt):
+            statements.append(str(stmt))
+            row = self.row
+            class DummyResult:
+                def one(self_inner):
+                    return row
+            return DummyResult()
+    assert await read_versions(DummySession((12,))) == (12, None)
+    # Collection jamais modifiée : pas de ligne dans cache_versions
+    assert await read_versions(DummySession((12, None)), 5) == (12, 0)
+    assert await read_versions(DummySession((13, 4)), 5) == (13, 4)
+    assert all("FROM catalog_version_seq" in sql for sql in statements)
+    assert "cache_versions" not in statements[0] and "cache_versions.scope" in statements[1]
@@ -0,0 +1,115 @@
+"""
+Tests pour le proxy de pochettes (/api/covers) et son cache disque.
+"""
+import io
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app
+from cover_cache import CoverCache, cover_version, cover_proxy_path, cover_proxy_url
+
+SOURCE_URL = "https://i.discogs.com/cover.jpg"
+
+
+def make_jpeg(width=800, height=800):
+    from PIL import Image
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def cover_setup(monkeypatch, tmp_path):
+    pytest.importorskip("PIL")
+    import cover_cache
+    cache = CoverCache(directory=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(cover_cache, "cover_cache", cache)
+    downloads = []
+    original = make_jpeg()
+    async def dummy_fetch_cover(source_url, client):
+        downloads.append(source_url)
+        return original
+    monkeypatch.setattr(cover_cache, "fetch_cover", dummy_fetch_cover)
+
+    class DummyAlbum:
+        id = 1
+        cover_url = SOURCE_URL
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def get(self, model, album_id):
+            return DummyAlbum() if album_id == 1 else None
+    monkeypatch.setattr("cover_endpoints.SessionLocal", lambda: DummySession())
+    return cache, downloads, original
+
+
+@pytest.mark.asyncio
+async def test_cover_served_without_api_key_and_cached(cover_setup):
+    cache, downloads, original = cover_setup
+    url = cover_proxy_path(1, SOURCE_URL)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get(url)
+        second = await client.get(url)
+    assert first.status_code == 200
+    assert first.content == original
+    assert first.headers["content-type"] == "image/jpeg"
+    assert "immutable" in first.headers["cache-control"]
+    assert second.content == original
+    assert downloads == [SOURCE_URL]
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cover_thumbnail_reuses_original(cover_setup):
+    cache, downloads, original = cover_setup
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        small = await client.get(cover_proxy_path(1, SOURCE_URL, size=150))
+        full = await client.get(cover_proxy_path(1, SOURCE_URL))
+        invalid = await client.get("/api/covers/1", params={"size": 123})
+    assert small.status_code == 200
+    from PIL import Image
+    assert Image.open(io.BytesIO(small.content)).size == (150, 150)
+    assert full.content == original
+    assert downloads == [SOURCE_URL]
+    assert invalid.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_cover_conditional_and_not_found(cover_setup):
+    cache, downloads, original = cover_setup
+    etag = f'"{cover_version(SOURCE_URL)}-orig"'
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        not_modified = await client.get(cover_proxy_path(1, SOURCE_URL), headers={"If-None-Match": etag})
+        unversioned = await client.get("/api/covers/1")
+        missing = await client.get("/api/covers/2")
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert unversioned.headers["etag"] == etag
+    assert "immutable" not in unversioned.headers["cache-control"]
+    assert missing.status_code == 404
+
+
+def test_cover_proxy_url_requires_base_url(monkeypatch):
+    import cover_cache
+    monkeypatch.setattr(cover_cache, "COVER_PROXY_BASE_URL", "")
+    assert cover_proxy_url(1, SOURCE_URL) == SOURCE_URL
+    monkeypatch.setattr(cover_cache, "COVER_PROXY_BASE_URL", "https://api.test")
+    assert cover_proxy_url(1, SOURCE_URL, size=150) == f"https://api.test/api/covers/1?v={cover_version(SOURCE_URL)}&size=150"
+    assert cover_proxy_url(1, None) is None
+
+
+def test_cover_cache_lru_eviction(tmp_path):
+    cache = CoverCache(directory=str(tmp_path), max_bytes=250)
+    cache._write(cache._name(1, "v", None), b"a" * 100)
+    cache._write(cache._name(2, "v", None), b"b" * 100)
+    assert cache._read(cache._name(1, "v", None)) == b"a" * 100  # 1 devient le plus récent
+    cache._write(cache._name(3, "v", None), b"c" * 100)
+    assert cache._read(cache._name(2, "v", None)) is None
+    assert cache.stats()["bytes"] == 200
+    assert cache.stats()["evictions"] == 1
+    # L'index est reconstruit depuis le disque au redémarrage
+    assert CoverCache(directory=str(tmp_path), max_bytes=250).stats()["entries"] == 2
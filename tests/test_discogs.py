@@ -61,4 +61,163 @@ def test_discogs_master_not_found(monkeypatch):
     headers = {"X-API-KEY": "NousNavionsPasFiniDeNousParlerDAmour"}
     response = client.get("/api/discogs/album/999999?type=master", headers=headers)
     assert response.status_code == 404
-    assert response.json()["detail"] == "Master non trouvé sur Discogs"
\ No newline at end of file
+    assert response.json()["detail"] == "Master non trouvé sur Discogs"
+
+def test_discogs_client_shared():
+    """Le client Discogs est partagé entre les appels (pas de nouvelle connexion à chaque requête)."""
+    from discogs_utils import get_discogs_client
+    assert get_discogs_client() is get_discogs_client()
+
+def test_discogs_release_uses_injected_client():
+    """Le fetcher utilise le client injecté plutôt que d'en créer un nouveau."""
+    import asyncio
+    from main import fetch_discogs_release
+    class MockResponse:
+        status_code = 200
+        def json(self):
+            return {"id": 456, "artists": [{"name": "Injected", "id": 7}], "title": "T", "year": 1999}
+    class DummyClient:
+        def __init__(self):
+            self.urls = []
+        async def get(self, url, headers=None):
+            self.urls.append(url)
+            return MockResponse()
+    dummy = DummyClient()
+    result = asyncio.run(fetch_discogs_release(456, client=dummy))
+    assert dummy.urls == ["https://api.discogs.com/releases/456"]
+    assert result.artiste == "Injected"
+    assert result.identifiants_discogs["artist_id"] == 7
+
+def test_discogs_quota_exceeded_is_not_404(monkeypatch):
+    """Un 429 Discogs persistant est renvoyé comme 429 (et non 'Master non trouvé')."""
+    import discogs_ratelimit
+    class MockResponse:
+        status_code = 429
+        headers = {"Retry-After": "0"}
+        def json(self):
+            return {}
+    async def mock_get(self, url, headers=None):
+        return MockResponse()
+    monkeypatch.setattr("httpx.AsyncClient.get", mock_get)
+    monkeypatch.setattr(discogs_ratelimit.discogs_rate_limiter, "max_retries", 0)
+    headers = {"X-API-KEY": os.getenv("API_KEY")}
+    response = client.get("/api/discogs/album/888888?type=master", headers=headers)
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+def test_discogs_concurrent_fetches_are_coalesced():
+    """Des appels concurrents pour le même master ne font qu'une requête Discogs."""
+    import asyncio
+    from main import fetch_discogs_master
+    class MockResponse:
+        status_code = 200
+        headers = {}
+        def json(self):
+            return {"id": 777, "artists": [{"name": "Shared", "id": 1}], "title": "Coalesced",
+                    "year": 1990, "labels": [{"name": "L", "id": 3}]}
+    class SlowClient:
+        def __init__(self):
+            self.calls = 0
+        async def get(self, url, headers=None):
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return MockResponse()
+    async def run():
+        slow = SlowClient()
+        results = await asyncio.gather(*(fetch_discogs_master(777, client=slow) for _ in range(5)))
+        return slow, results
+    slow, results = asyncio.run(run())
+    assert slow.calls == 1
+    assert all(r.titre == "Coalesced" for r in results)
+
+def test_discogs_coalesced_error_is_shared():
+    """Tous les appelants regroupés reçoivent la même erreur."""
+    import asyncio
+    from discogs_utils import SingleFlight
+    flight = SingleFlight()
+    calls = 0
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    async def run():
+        return await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.in_flight() == 0
+
+def test_discogs_speculative_main_release_overlaps(monkeypatch):
+    """En mode spéculatif, la main_release connue est demandée en parallèle du master."""
+    import asyncio
+    import discogs_utils
+    from main import fetch_discogs_master
+    from discogs_cache import discogs_cache
+    from discogs_ratelimit import DiscogsRateLimiter
+    # Limiteur propre au test : le seau partagé peut avoir été vidé par les tests précédents
+    monkeypatch.setattr(discogs_utils, "discogs_rate_limiter", DiscogsRateLimiter(requests_per_minute=600))
+    class MockResponse:
+        def __init__(self, data):
+            self._data = data
+            self.status_code = 200
+            self.headers = {}
+        def json(self):
+            return self._data
+    class OverlapClient:
+        """Le master ne répond qu'une fois la release demandée : échoue si les appels sont séquentiels."""
+        def __init__(self, wait_for_release):
+            self.wait_for_release = wait_for_release
+            self.urls = []
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.release_requested = asyncio.Event()
+        async def get(self, url, headers=None):
+            self.urls.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                if "masters" in url:
+                    if self.wait_for_release:
+                        await asyncio.wait_for(self.release_requested.wait(), timeout=5)
+                    return MockResponse({"id": 321, "main_release": 654, "title": "No Label", "artists": [{"name": "A"}]})
+                self.release_requested.set()
+                return MockResponse({"id": 654, "labels": [{"name": "From Release", "id": 8, "catno": "FR1"}]})
+            finally:
+                self.in_flight -= 1
+    # Premier appel : apprend que le master 321 n'a pas de label (séquentiel)
+    first_client = OverlapClient(wait_for_release=False)
+    first = asyncio.run(fetch_discogs_master(321, client=first_client, speculative=True))
+    assert first.label[0].name == "From Release"
+    assert first_client.max_in_flight == 1
+    discogs_cache.clear()
+    client = OverlapClient(wait_for_release=True)
+    result = asyncio.run(fetch_discogs_master(321, client=client, speculative=True))
+    assert result.label[0].name == "From Release"
+    assert len(client.urls) == 2
+    # Les deux requêtes ont été en vol en même temps
+    assert client.max_in_flight == 2
+
+def test_discogs_speculative_release_cancelled_when_labels_present():
+    """Si le master a finalement un label, la release spéculative est annulée."""
+    import asyncio
+    from main import fetch_discogs_master
+    from discogs_utils import remember_main_release, get_main_release_hint
+    class MockResponse:
+        status_code = 200
+        headers = {}
+        def json(self):
+            return {"id": 322, "main_release": 655, "title": "Labelled", "labels": [{"name": "M", "id": 1}]}
+    class Client:
+        def __init__(self):
+            self.urls = []
+        async def get(self, url, headers=None):
+            self.urls.append(url)
+            if "releases" in url:
+                await asyncio.sleep(1)
+            return MockResponse()
+    remember_main_release(322, 655)
+    client = Client()
+    result = asyncio.run(fetch_discogs_master(322, client=client, speculative=True))
+    assert result.label[0].name == "M"
+    assert get_main_release_hint(322) is None
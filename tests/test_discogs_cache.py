@@ -0,0 +1,57 @@
+"""
+Tests pour le cache des réponses Discogs (LRU mémoire + niveau durable).
+"""
+import pytest
+from discogs_cache import DiscogsCache, FileCacheBackend
+
+
+@pytest.mark.asyncio
+async def test_cache_memory_hit_and_miss():
+    cache = DiscogsCache(ttl=60, max_entries=10)
+    assert await cache.get("masters", 1) is None
+    await cache.set("masters", 1, {"id": 1})
+    assert await cache.get("masters", 1) == {"id": 1}
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_lru_eviction():
+    cache = DiscogsCache(ttl=60, max_entries=2)
+    await cache.set("masters", 1, {"id": 1})
+    await cache.set("masters", 2, {"id": 2})
+    # Accède à 1 pour qu'il devienne le plus récent : 2 sera évincé
+    assert await cache.get("masters", 1) == {"id": 1}
+    await cache.set("masters", 3, {"id": 3})
+    assert await cache.get("masters", 2) is None
+    assert await cache.get("masters", 1) == {"id": 1}
+    assert await cache.get("masters", 3) == {"id": 3}
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl_expiry():
+    cache = DiscogsCache(ttl=0, max_entries=10)
+    await cache.set("releases", 5, {"id": 5})
+    assert await cache.get("releases", 5) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_file_backend_survives_restart(tmp_path):
+    cache = DiscogsCache(ttl=60, max_entries=10, backend=FileCacheBackend(str(tmp_path)))
+    await cache.set("masters", 42, {"id": 42, "title": "Durable"})
+    # Nouveau cache (processus redémarré) : le niveau mémoire est vide
+    restarted = DiscogsCache(ttl=60, max_entries=10, backend=FileCacheBackend(str(tmp_path)))
+    assert await restarted.get("masters", 42) == {"id": 42, "title": "Durable"}
+    assert restarted.stats()["durable_hits"] == 1
+    # Le second accès est servi par le niveau mémoire
+    assert await restarted.get("masters", 42) == {"id": 42, "title": "Durable"}
+    assert restarted.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_durable_ttl_expiry(tmp_path):
+    cache = DiscogsCache(ttl=60, max_entries=10, backend=FileCacheBackend(str(tmp_path)), durable_ttl=0)
+    await cache.set("masters", 7, {"id": 7})
+    cache.clear()
+    assert await cache.get("masters", 7) is None
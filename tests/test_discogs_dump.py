@@ -0,0 +1,190 @@
+"""
+Tests pour l'ingestion des dumps XML Discogs (analyse en flux et mapping).
+"""
+import gzip
+import pytest
+from ingest_discogs_dump import iter_records, iter_batches, ingest, load_checkpoints, save_checkpoint
+
+
+MASTERS_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<masters>
+<master id="18500"><main_release>155102</main_release>
+<images><image type="secondary" uri="http://img/2.jpg"/><image type="primary" uri="http://img/1.jpg"/></images>
+<artists><artist><id>212070</id><name>Samuel L Session</name></artist><artist><id>1</id><name>Other</name></artist></artists>
+<genres><genre>Electronic</genre></genres><styles><style>Techno</style><style>Minimal</style></styles>
+<year>2001</year><title>New Soil</title></master>
+<master id="18501"><main_release>1</main_release><artists><artist><id>2</id><name>No Year</name></artist></artists>
+<year>0</year><title>Unknown</title></master>
+</masters>
+"""
+
+RELEASES_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<releases>
+<release id="155102" status="Accepted"><title>New Soil</title>
+<labels><label name="Tresor" catno="TRESOR 1" id="34"/><label name="Tresor" catno="TRESOR 1B" id="34"/></labels>
+<master_id is_main_release="true">18500</master_id></release>
+<release id="155103" status="Accepted"><title>New Soil (repress)</title>
+<labels><label name="Other" catno="X" id="35"/></labels>
+<master_id is_main_release="false">18500</master_id></release>
+</releases>
+"""
+
+LABELS_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<labels>
+<label><id>1</id><name>Planet E</name><sublabels><label id="86537">Antidote (4)</label></sublabels></label>
+<label><id>2</id><name>Earthtones Recordings</name></label>
+</labels>
+"""
+
+
+def write_gz(tmp_path, name, content):
+    path = tmp_path / name
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def test_masters_mapping(tmp_path):
+    path = write_gz(tmp_path, "masters.xml.gz", MASTERS_XML)
+    [(read, rows)] = list(iter_batches(path, "masters", batch_size=100))
+    assert read == 2
+    assert rows[0] == (18500, "New Soil", 2001, ["Electronic"], ["Techno", "Minimal"], "http://img/1.jpg", 212070, "Samuel L Session")
+    # Année 0 dans le dump -> inconnue
+    assert rows[1][2] is None
+    assert rows[1][5] is None
+
+
+def test_releases_only_main_release_first_label(tmp_path):
+    path = write_gz(tmp_path, "releases.xml.gz", RELEASES_XML)
+    [(read, rows)] = list(iter_batches(path, "releases", batch_size=100))
+    assert read == 2
+    assert rows == [(18500, 34, "Tresor", "TRESOR 1")]
+
+
+def test_nested_records_are_not_top_level(tmp_path):
+    path = write_gz(tmp_path, "labels.xml.gz", LABELS_XML)
+    names = [elem.findtext("name") for elem in iter_records(path, "label")]
+    assert names == ["Planet E", "Earthtones Recordings"]
+
+
+def test_batches_and_resume(tmp_path):
+    path = write_gz(tmp_path, "labels.xml.gz", LABELS_XML)
+    batches = list(iter_batches(path, "labels", batch_size=1))
+    assert [read for read, _ in batches] == [1, 2]
+    # Reprise après le premier enregistrement
+    resumed = [row for _, rows in iter_batches(path, "labels", batch_size=1, skip=1) for row in rows]
+    assert resumed == [(2, "Earthtones Recordings")]
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    checkpoint = str(tmp_path / "checkpoints.json")
+    save_checkpoint(checkpoint, "labels:labels.xml.gz", 1000)
+    assert load_checkpoints(checkpoint)["labels:labels.xml.gz"]["records"] == 1000
+
+
+@pytest.mark.asyncio
+async def test_ingest_dry_run(tmp_path):
+    path = write_gz(tmp_path, "masters.xml.gz", MASTERS_XML)
+    total = await ingest(str(path), "masters", 100, str(tmp_path / "cp.json"), dry_run=True)
+    assert total == 2
+
+
+def split_sql_list(text):
+    """Découpe une liste SQL sur les virgules de premier niveau (hors parenthèses et chaînes)."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+    return parts + [current.strip()] if current.strip() else parts
+
+
+def evaluate_sql(expr, existing, excluded):
+    """Évalue une expression du SET d'un upsert : COALESCE, NULLIF, albums.<col>, EXCLUDED.<col>, '{}'."""
+    expr = expr.strip()
+    if expr.endswith(")") and "(" in expr:
+        name, args = expr.split("(", 1)
+        values = [evaluate_sql(arg, existing, excluded) for arg in split_sql_list(args[:-1])]
+        if name.strip().upper() == "COALESCE":
+            return next((v for v in values if v is not None), None)
+        if name.strip().upper() == "NULLIF":
+            return None if values[0] == values[1] else values[0]
+        raise AssertionError(f"Fonction non simulée : {name}")
+    if expr == "'{}'":
+        return []
+    table, column = expr.split(".")
+    return (existing if table == "albums" else excluded)[column]
+
+
+@pytest.mark.asyncio
+async def test_masters_merge_keeps_existing_album_fields(tmp_path, monkeypatch):
+    # Un nouvel import du dump ne doit pas écraser les corrections faites via l'API
+    import db
+    path = write_gz(tmp_path, "masters.xml.gz", MASTERS_XML)
+    albums = {
+        18500: {"title": "New Soil (corrigé)", "year": None, "genre": ["House"], "style": [], "cover_url": None, "artist_id": None},
+    }
+    artist_ids = {}
+    class DummyPg:
+        def __init__(self):
+            self.staging = []
+        def transaction(self):
+            class DummyTransaction:
+                async def __aenter__(self_inner):
+                    return self_inner
+                async def __aexit__(self_inner, exc_type, exc, tb):
+                    pass
+            return DummyTransaction()
+        async def copy_records_to_table(self, table, records, columns):
+            self.staging = [dict(zip(columns, record)) for record in records]
+        async def execute(self, sql):
+            if "INSERT INTO artists" in sql:
+                for row in self.staging:
+                    if row["artist_name"] is not None:
+                        artist_ids.setdefault(row["artist_name"], len(artist_ids) + 1)
+            elif "INSERT INTO albums" in sql:
+                # Upsert sur discogs_master_id, SET évalué tel qu'écrit dans la requête de fusion
+                assignments = [
+                    line for line in sql.split("DO UPDATE SET", 1)[1].splitlines() if not line.strip().startswith("--")
+                ]
+                for row in self.staging:
+                    excluded = {
+                        "title": row["title"], "year": row["year"], "genre": row["genre"], "style": row["style"],
+                        "cover_url": row["cover_url"], "artist_id": artist_ids.get(row["artist_name"]),
+                    }
+                    existing = albums.get(row["master_id"])
+                    if existing is None:
+                        albums[row["master_id"]] = excluded
+                        continue
+                    updates = {}
+                    for assignment in split_sql_list(" ".join(assignments)):
+                        column, expr = assignment.split("=", 1)
+                        updates[column.strip()] = evaluate_sql(expr, existing, excluded)
+                    existing.update(updates)
+    class DummyConnection:
+        async def get_raw_connection(self):
+            return type("DummyRaw", (), {"driver_connection": DummyPg()})()
+        async def close(self):
+            pass
+    class DummyEngine:
+        async def connect(self):
+            return DummyConnection()
+    monkeypatch.setattr(db, "engine", DummyEngine())
+    total = await ingest(str(path), "masters", 100, str(tmp_path / "cp.json"))
+    assert total == 2
+    # Champs corrigés conservés, champs vides complétés depuis le dump
+    assert albums[18500] == {
+        "title": "New Soil (corrigé)",
+        "year": 2001,
+        "genre": ["House"],
+        "style": ["Techno", "Minimal"],
+        "cover_url": "http://img/1.jpg",
+        "artist_id": artist_ids["Samuel L Session"],
+    }
+    assert albums[18501]["title"] == "Unknown"
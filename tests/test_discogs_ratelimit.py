@@ -0,0 +1,65 @@
+"""
+Tests pour l'ordonnanceur des requêtes Discogs (seau à jetons, priorités, 429).
+"""
+import asyncio
+import pytest
+from discogs_ratelimit import DiscogsRateLimiter, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+
+class MockResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+    def json(self):
+        return {}
+
+
+@pytest.mark.asyncio
+async def test_headers_recalibrate_bucket():
+    limiter = DiscogsRateLimiter(requests_per_minute=25)
+    limiter.update_from_headers({"X-Discogs-Ratelimit": "60", "X-Discogs-Ratelimit-Remaining": "3"})
+    assert limiter.capacity == 60
+    assert limiter.tokens <= 3.01
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_pass_before_background():
+    # 600 req/min = 1 jeton toutes les 0,1 s ; seau vide au départ
+    limiter = DiscogsRateLimiter(requests_per_minute=600)
+    limiter.tokens = 0
+    order = []
+    async def call(name, priority):
+        await limiter.acquire(priority)
+        order.append(name)
+    background = [asyncio.create_task(call(f"bg{i}", PRIORITY_BACKGROUND)) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(call("preview", PRIORITY_INTERACTIVE))
+    await asyncio.gather(*background, interactive)
+    assert order[0] == "preview"
+    assert sorted(order[1:]) == ["bg0", "bg1", "bg2"]
+
+
+@pytest.mark.asyncio
+async def test_429_is_retried_after_retry_after():
+    limiter = DiscogsRateLimiter(requests_per_minute=600, max_retries=2)
+    responses = [MockResponse(429, {"Retry-After": "0.05"}), MockResponse(200)]
+    calls = []
+    class DummyClient:
+        async def get(self, url, headers=None):
+            calls.append(url)
+            return responses.pop(0)
+    response = await limiter.get(DummyClient(), "https://api.discogs.com/masters/1", {})
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert limiter.throttled == 1
+
+
+@pytest.mark.asyncio
+async def test_429_gives_up_after_max_retries():
+    limiter = DiscogsRateLimiter(requests_per_minute=600, max_retries=1, backoff_base=0.01)
+    class DummyClient:
+        async def get(self, url, headers=None):
+            return MockResponse(429)
+    response = await limiter.get(DummyClient(), "https://api.discogs.com/masters/1", {})
+    assert response.status_code == 429
+    assert limiter.throttled == 1
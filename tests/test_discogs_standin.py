@@ -0,0 +1,67 @@
+"""
+Tests pour le serveur de substitution Discogs et le benchmark d'import (tools/).
+"""
+import json
+import pytest
+import httpx
+from httpx import ASGITransport
+from tools.discogs_standin import create_standin_app
+from tools.bench_import import percentile, summarize
+
+
+def standin_client(app):
+    return httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://standin")
+
+
+@pytest.mark.asyncio
+async def test_standin_replays_fixtures_and_synthesizes(tmp_path):
+    (tmp_path / "masters").mkdir()
+    (tmp_path / "masters" / "42.json").write_text(json.dumps({"id": 42, "title": "Recorded"}))
+    app = create_standin_app(fixtures_dir=str(tmp_path), rate_limit=2)
+    async with standin_client(app) as client:
+        recorded = await client.get("/masters/42")
+        synthesized = await client.get("/releases/7")
+        throttled = await client.get("/artists/1")
+        stats = (await client.get("/_stats")).json()
+    assert recorded.json() == {"id": 42, "title": "Recorded"}
+    assert recorded.headers["X-Discogs-Ratelimit-Remaining"] == "1"
+    assert synthesized.json()["labels"][0]["catno"] == "CAT-7"
+    assert throttled.status_code == 429
+    assert int(throttled.headers["Retry-After"]) >= 1
+    assert stats == {"masters": 1, "releases": 1, "throttled": 1}
+
+
+@pytest.mark.asyncio
+async def test_standin_error_injection_and_404(tmp_path):
+    failing = create_standin_app(fixtures_dir=str(tmp_path), error_rate=1.0, error_status=503)
+    strict = create_standin_app(fixtures_dir=str(tmp_path), synthesize_missing=False)
+    async with standin_client(failing) as client:
+        assert (await client.get("/masters/1")).status_code == 503
+    async with standin_client(strict) as client:
+        assert (await client.get("/masters/1")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_fetch_master_against_standin(monkeypatch, tmp_path):
+    from main import fetch_discogs_master
+    monkeypatch.setattr("discogs_utils.DISCOGS_API_URL", "http://standin")
+    app = create_standin_app(fixtures_dir=str(tmp_path))
+    async with standin_client(app) as client:
+        data = await fetch_discogs_master(987654, client=client)
+        stats = (await client.get("/_stats")).json()
+    assert data.titre == "Album 987654"
+    # Master synthétique sans label : le label vient de la main_release
+    assert data.label[0].catno == "CAT-987654"
+    assert stats == {"masters": 1, "releases": 1}
+
+
+def test_bench_percentiles_and_summary():
+    from collections import Counter
+    latencies = [i / 1000 for i in range(1, 101)]
+    assert percentile(latencies, 50) == 0.05
+    assert percentile(latencies, 99) == 0.099
+    assert percentile([], 50) is None
+    report = summarize("import", latencies, Counter({201: 90, 409: 10}), 2.0)
+    assert report["ok"] == 90
+    assert report["per_second"] == 45.0
+    assert report["p99_ms"] == 99.0
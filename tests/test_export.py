@@ -0,0 +1,203 @@
+import os
+import csv
+import io
+import json
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from main import app
+
+
+@pytest.mark.asyncio
+async def test_export_albums_ndjson_and_csv(monkeypatch):
+    class DummyRow:
+        def __init__(self, album_id):
+            self.id = album_id
+            self.title = f"Album {album_id}"
+            self.year = 1990 + album_id
+            self.genre = ["Rock", "Pop"]
+            self.style = []
+            self.catno = None
+            self.type = "Studio"
+            self.discogs_master_id = 1000 + album_id
+            self.discogs_release_id = None
+            self.cover_url = None
+            self.artist_id = 1
+            self.artist_name = "Artiste, « 1 »"
+            self.artist_discogs_id = 10
+            self.label_id = None
+            self.label_name = None
+            self.label_discogs_id = None
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def stream(self, stmt):
+            statements.append(stmt)
+            class DummyStreamResult:
+                async def partitions(self_inner):
+                    yield [DummyRow(1), DummyRow(2)]
+                    yield [DummyRow(3)]
+            return DummyStreamResult()
+        async def execute(self, stmt):
+            raise AssertionError("L'export doit passer par un curseur serveur (session.stream)")
+    import export_endpoints
+    monkeypatch.setattr(export_endpoints, "SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        ndjson = await client.get("/api/export/albums", headers=headers)
+        as_csv = await client.get("/api/export/albums", params={"format": "csv", "fields": "title,genre,artist"}, headers=headers)
+        invalid = await client.get("/api/export/albums", params={"format": "xml"}, headers=headers)
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [r["id"] for r in records] == [1, 2, 3]
+    assert records[0]["artist"] == "Artiste, « 1 »" and records[0]["label"] is None
+    assert as_csv.headers["content-disposition"] == 'attachment; filename="albums.csv"'
+    assert list(csv.reader(io.StringIO(as_csv.text))) == [
+        ["title", "genre", "artist"],
+        ["Album 1", "Rock|Pop", "Artiste, « 1 »"],
+        ["Album 2", "Rock|Pop", "Artiste, « 1 »"],
+        ["Album 3", "Rock|Pop", "Artiste, « 1 »"],
+    ]
+    # Curseur serveur lu par lots, artiste et label joints, ordre stable
+    stmt = statements[0]
+    assert stmt.get_execution_options()["yield_per"] == export_endpoints.EXPORT_BATCH_SIZE
+    sql = str(stmt)
+    assert "LEFT OUTER JOIN artists" in sql and "LEFT OUTER JOIN labels" in sql and "ORDER BY albums.id" in sql
+    assert invalid.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_albums_errors(monkeypatch):
+    class DummyRow:
+        def __init__(self, album_id):
+            self.id = album_id
+            self.title = f"Album {album_id}"
+    closed = []
+    class DummySession:
+        def __init__(self, fail_at):
+            self.fail_at = fail_at
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            closed.append(self.fail_at)
+        async def stream(self, stmt):
+            if self.fail_at == "query":
+                raise ConnectionError("base indisponible")
+            class DummyStreamResult:
+                async def partitions(self_inner):
+                    yield [DummyRow(1), DummyRow(2)]
+                    raise ConnectionError("connexion perdue")
+            return DummyStreamResult()
+    sessions = iter(["query", "stream", "stream"])
+    import export_endpoints
+    monkeypatch.setattr(export_endpoints, "SessionLocal", lambda: DummySession(next(sessions)))
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        early = await client.get("/api/export/albums", headers=headers)
+        ndjson = await client.get("/api/export/albums", params={"fields": "id,title"}, headers=headers)
+        as_csv = await client.get("/api/export/albums", params={"format": "csv", "fields": "id,title"}, headers=headers)
+    # Échec avant le premier lot : vrai statut d'erreur, pas de fichier vide en 200
+    assert early.status_code == 500
+    # Échec en cours de flux : dernière ligne d'erreur explicite
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [line.get("id") for line in lines[:2]] == [1, 2]
+    assert lines[-1] == {"error": "Export interrompu après 2 lignes"}
+    rows = list(csv.reader(io.StringIO(as_csv.text)))
+    assert rows[-1] == ["#ERREUR", "Export interrompu après 2 lignes"]
+    # Session refermée dans tous les cas
+    assert closed == ["query", "stream", "stream"]
+
+
+@pytest.mark.asyncio
+async def test_export_collection(monkeypatch):
+    from jwt_utils import create_access_token
+    class DummyRow:
+        def __init__(self, album_id, cd, vinyl):
+            self.id = album_id
+            self.cd = cd
+            self.vinyl = vinyl
+            self.title = f"Album {album_id}"
+            self.artist_name = "Artiste, « 1 »"
+    statements = []
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def stream(self, stmt):
+            statements.append(stmt)
+            class DummyStreamResult:
+                async def partitions(self_inner):
+                    yield [DummyRow(4, True, False), DummyRow(9, False, True)]
+            return DummyStreamResult()
+    import export_endpoints
+    monkeypatch.setattr(export_endpoints, "SessionLocal", lambda: DummySession())
+    token = create_access_token({"id": 5, "roles": ["utilisateur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get(
+            "/api/export/collection", params={"fields": "album_id,cd,vinyl,title,artist"},
+            headers={**headers, "Authorization": f"Bearer {token}"}
+        )
+        anonymous = await client.get("/api/export/collection", headers=headers)
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records == [
+        {"album_id": 4, "cd": True, "vinyl": False, "title": "Album 4", "artist": "Artiste, « 1 »"},
+        {"album_id": 9, "cd": False, "vinyl": True, "title": "Album 9", "artist": "Artiste, « 1 »"},
+    ]
+    # Une seule requête : collection de l'appelant, album, artiste et label joints
+    assert len(statements) == 1
+    sql = str(statements[0])
+    assert "FROM user_album_collection JOIN albums" in sql
+    assert "LEFT OUTER JOIN artists" in sql and "LEFT OUTER JOIN labels" in sql
+    assert "WHERE user_album_collection.user_id" in sql
+    assert statements[0].compile().params["user_id_1"] == 5
+    assert anonymous.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_export_collection_errors(monkeypatch):
+    from jwt_utils import create_access_token
+    class DummyRow:
+        def __init__(self, album_id):
+            self.id = album_id
+            self.cd = True
+            self.vinyl = False
+    class DummySession:
+        def __init__(self, fail_early):
+            self.fail_early = fail_early
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def stream(self, stmt):
+            if self.fail_early:
+                raise ConnectionError("base indisponible")
+            class DummyStreamResult:
+                async def partitions(self_inner):
+                    yield [DummyRow(4)]
+                    raise ConnectionError("connexion perdue")
+            return DummyStreamResult()
+    sessions = iter([True, False])
+    import export_endpoints
+    monkeypatch.setattr(export_endpoints, "SessionLocal", lambda: DummySession(next(sessions)))
+    token = create_access_token({"id": 5, "roles": ["utilisateur"]})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY"), "Authorization": f"Bearer {token}"}
+        early = await client.get("/api/export/collection", params={"format": "csv"}, headers=headers)
+        partial = await client.get("/api/export/collection", params={"format": "csv", "fields": "album_id,cd,vinyl"}, headers=headers)
+    assert early.status_code == 500
+    assert list(csv.reader(io.StringIO(partial.text))) == [
+        ["album_id", "cd", "vinyl"],
+        ["4", "True", "False"],
+        ["#ERREUR", "Export interrompu après 1 lignes"],
+    ]
@@ -0,0 +1,114 @@
+"""
+Tests pour les jobs d'import asynchrones (202 + suivi d'état).
+"""
+import os
+import pytest
+from datetime import datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from main import app
+from models import ImportJob
+from jwt_utils import create_access_token
+from tests.utils_jwt import get_test_jwt_contributeur
+
+
+def get_auth_headers():
+    return {
+        "X-API-KEY": os.getenv("API_KEY"),
+        "Authorization": f"Bearer {get_test_jwt_contributeur()}"
+    }
+
+
+def get_user_headers(user_id, roles):
+    token = create_access_token({"id": user_id, "email": "test@user.com", "roles": roles})
+    return {"X-API-KEY": os.getenv("API_KEY"), "Authorization": f"Bearer {token}"}
+
+
+def make_job(job_id=1, status="pending", attempts=0):
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return ImportJob(
+        id=job_id, discogs_id=123, discogs_type="master", user_id=1, status=status,
+        attempts=attempts, result=None, error=None, created_at=now, updated_at=now,
+    )
+
+
+@pytest.mark.asyncio
+async def test_enqueue_job_returns_202(monkeypatch):
+    async def dummy_enqueue(discogs_id, discogs_type, user_id=None):
+        assert (discogs_id, discogs_type) == (123, "master")
+        return make_job(job_id=17)
+    monkeypatch.setattr("job_endpoints.enqueue_import_job", dummy_enqueue)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/api/albums/studio/jobs",
+            params={"discogs_id": 123, "discogs_type": "master"},
+            headers=get_auth_headers()
+        )
+    assert response.status_code == 202
+    assert response.json() == {"job_id": 17, "status": "pending", "status_url": "/api/jobs/17"}
+
+
+@pytest.mark.asyncio
+async def test_get_job_status(monkeypatch):
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def get(self, model, job_id):
+            return make_job(job_id=job_id, status="running", attempts=1) if job_id == 5 else None
+    monkeypatch.setattr("job_endpoints.SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/jobs/5", headers=get_user_headers(1, ["contributeur"]))
+        missing = await client.get("/api/jobs/6", headers=get_user_headers(1, ["contributeur"]))
+    assert response.status_code == 200
+    assert response.json()["status"] == "running"
+    assert response.json()["attempts"] == 1
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_job_restricted_to_owner_or_admin(monkeypatch):
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def get(self, model, job_id):
+            return make_job(job_id=job_id)
+    monkeypatch.setattr("job_endpoints.SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        other = await client.get("/api/jobs/5", headers=get_user_headers(2, ["contributeur"]))
+        admin = await client.get("/api/jobs/5", headers=get_user_headers(2, ["contributeur", "administrateur"]))
+    assert other.status_code == 404
+    assert admin.status_code == 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("outcome,attempts,expected", [
+    ("created", 1, "done"),
+    ("conflict", 1, "done"),
+    ("error", 1, "pending"),
+    ("error", 3, "failed"),
+])
+async def test_process_job_status(monkeypatch, outcome, attempts, expected):
+    import job_queue
+    async def dummy_import(items, concurrency=None):
+        return [{"discogs_id": 123, "discogs_type": "master", "status": outcome, "detail": "x"}]
+    finished = []
+    async def dummy_finish(job_id, status, result=None, error=None, run_after=None):
+        finished.append(status)
+        # Nouvelle tentative différée uniquement quand le job repart en attente
+        assert (run_after is not None) == (status == "pending")
+    monkeypatch.setattr("album_import.import_discogs_albums", dummy_import)
+    monkeypatch.setattr(job_queue, "finish_job", dummy_finish)
+    monkeypatch.setattr(job_queue, "IMPORT_JOB_MAX_ATTEMPTS", 3)
+    await job_queue.process_job(make_job(status="running", attempts=attempts))
+    assert finished == [expected]
+
+
+def test_retry_delay_is_exponential():
+    import job_queue
+    assert [job_queue.retry_delay(n, base=30) for n in (1, 2, 3)] == [30, 60, 120]
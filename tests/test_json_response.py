@@ -0,0 +1,30 @@
+import datetime
+import decimal
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import json_response
+from json_response import FastJSONResponse
+
+
+PAYLOAD = {
+    "albums": [{"id": 1, "title": "Déjà vu", "year": None, "genre": ["Rock"], "collection": {"cd": True, "vinyl": False}}],
+    "total": 1,
+    "total_estimated": False,
+}
+
+
+@pytest.mark.parametrize("with_orjson", [True, False])
+def test_fast_json_matches_default_path(monkeypatch, with_orjson):
+    if not with_orjson:
+        monkeypatch.setattr(json_response, "orjson", None)
+    elif json_response.orjson is None:
+        pytest.skip("orjson non installé")
+    # Mêmes octets que jsonable_encoder + JSONResponse
+    assert FastJSONResponse(PAYLOAD).body == JSONResponse(jsonable_encoder(PAYLOAD)).body
+    body = FastJSONResponse({"at": datetime.date(2024, 5, 1), "ratio": decimal.Decimal("1.5")}).body
+    assert body == b'{"at":"2024-05-01","ratio":1.5}'
+    with pytest.raises(TypeError):
+        json_response.dumps({"value": object()})
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from response_compression import Codec, CompressionMiddleware, PrecompressedCache, negotiate
+
+
+def test_negotiate_accept_encoding():
+    codecs = [Codec("zstd", 3, 19), Codec("br", 5, 11), Codec("gzip", 6, 9)]
+    assert negotiate("gzip, br", codecs).name == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", codecs).name == "gzip"
+    assert negotiate("*", codecs).name == "zstd"
+    assert negotiate("br;q=0, *;q=0.1", codecs).name == "zstd"
+    assert negotiate("gzip;q=0", codecs) is None
+    assert negotiate("identity", codecs) is None
+    assert negotiate(None, codecs) is None
+
+
+def make_app(cache, monkeypatch):
+    import response_compression
+    async def dummy_request_versions(scope, user_id):
+        return 0, None
+    monkeypatch.setattr(response_compression, "request_versions", dummy_request_versions)
+    calls = []
+    inner = FastAPI()
+    big = {"items": [{"id": i, "name": f"Artiste {i}"} for i in range(200)]}
+
+    @inner.get("/big")
+    async def get_big():
+        return JSONResponse(big, headers={"ETag": '"v1"'})
+
+    @inner.get("/small")
+    async def get_small():
+        return {"ok": True}
+
+    @inner.get("/api/countries")
+    async def get_countries():
+        calls.append("countries")
+        return big
+
+    @inner.get("/stream")
+    async def get_stream():
+        async def lines():
+            for i in range(50):
+                yield f'{{"id": {i}}}\n'.encode()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    inner.add_middleware(CompressionMiddleware, api_key="cle", minimum_size=500, cache=cache)
+    return inner, big, calls
+
+
+@pytest.mark.asyncio
+async def test_compression_threshold_stream_and_precompressed_cache(monkeypatch):
+    cache = PrecompressedCache()
+    inner, big, calls = make_app(cache, monkeypatch)
+    transport = ASGITransport(app=inner)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        accept = {"Accept-Encoding": "gzip", "X-API-KEY": "cle"}
+        response = await client.get("/big", headers=accept)
+        small = await client.get("/small", headers=accept)
+        identity = await client.get("/big", headers={"Accept-Encoding": "identity"})
+        stream = await client.get("/stream", headers=accept)
+        await client.get("/api/countries", headers=accept)
+        static = await client.get("/api/countries", headers=accept)
+        static_identity = await client.get("/api/countries", headers={**accept, "Accept-Encoding": "identity"})
+        without_key = await client.get("/api/countries", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.json() == big
+    assert int(response.headers["content-length"]) < len(identity.content)
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in identity.headers
+    assert stream.headers["content-encoding"] == "gzip"
+    assert "content-length" not in stream.headers
+    assert stream.text.splitlines()[-1] == '{"id": 49}'
+    # Réponse statique : rendue et compressée une fois, resservie depuis la mémoire sans appeler l'endpoint
+    assert static.json() == big
+    assert static.headers["content-encoding"] == "gzip" and static.headers["vary"] == "Accept-Encoding"
+    assert static_identity.json() == big and "content-encoding" not in static_identity.headers
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 2
+    # Sans clé API, le cache n'est pas consulté : l'endpoint (et ses dépendances) s'exécute
+    assert without_key.status_code == 200
+    assert calls == ["countries", "countries"]
+
+
+@pytest.mark.asyncio
+async def test_compressed_etag_still_revalidates(monkeypatch):
+    from main import app
+    import conditional_get
+    async def dummy_read_versions(session, user_id=None):
+        return 0, None
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+    monkeypatch.setattr(conditional_get, "read_versions", dummy_read_versions)
+    monkeypatch.setattr(conditional_get, "SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY"), "Accept-Encoding": "gzip"}
+        first = await client.get("/api/countries", headers=headers)
+        again = await client.get("/api/countries", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["etag"].startswith('W/"')
+    assert again.status_code == 304
+    # Le 304 porte les mêmes ETag et Vary que la réponse 200
+    assert again.headers["etag"] == first.headers["etag"]
+    assert "Accept-Encoding" in again.headers["vary"]
@@ -0,0 +1,56 @@
+"""
+Tests pour la recherche plein texte dans le catalogue (/api/search).
+"""
+import os
+import pytest
+from types import SimpleNamespace
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.dialects import postgresql
+from main import app
+from search_endpoints import prefix_tsquery
+
+
+def test_prefix_tsquery():
+    assert prefix_tsquery("Abbey  Road") == "abbey:* & road:*"
+    assert prefix_tsquery("AC/DC") == "ac:* & dc:*"
+    assert prefix_tsquery("'&|!") is None
+
+
+@pytest.mark.asyncio
+async def test_search_single_ranked_query(monkeypatch):
+    statements = []
+    rows = [
+        SimpleNamespace(id=1, title="Abbey Road", year=1969, genre=["Rock"], style=["Pop Rock"], cover_url=None,
+                        artist_id=3, artist_name="The Beatles", label_id=None, label_name=None, rank=0.9, total=2),
+        SimpleNamespace(id=2, title="Road Songs", year=2001, genre=[], style=[], cover_url=None,
+                        artist_id=None, artist_name=None, label_id=4, label_name="Abbey Label", rank=0.1, total=2),
+    ]
+    class DummyResult:
+        def all(self):
+            return rows
+    class DummySession:
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+        async def execute(self, stmt):
+            statements.append(stmt)
+            return DummyResult()
+    monkeypatch.setattr("search_endpoints.SessionLocal", lambda: DummySession())
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"X-API-KEY": os.getenv("API_KEY")}
+        response = await client.get("/api/search", params={"q": "abbey road"}, headers=headers)
+        empty = await client.get("/api/search", params={"q": "&&"}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert data["results"][0]["artist"] == {"id": 3, "name": "The Beatles"}
+    assert data["results"][0]["label"] is None
+    assert data["results"][1]["label"] == {"id": 4, "name": "Abbey Label"}
+    assert empty.status_code == 400
+    assert len(statements) == 1
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "albums.search_vector @@ to_tsquery" in sql
+    assert "ts_rank_cd" in sql and "count(*) OVER ()" in sql
+    assert "LEFT OUTER JOIN artists" in sql and "LEFT OUTER JOIN labels" in sql
@@ -0,0 +1,163 @@
+"""
+Benchmark du pipeline d'import Discogs : débit (imports/s) et latences p50/p95/p99.
+
+À lancer contre une API dont DISCOGS_API_URL pointe vers le serveur de substitution
+(tools/discogs_standin.py), pour des mesures reproductibles et hors quota :
+
+    python tools/discogs_standin.py serve --port 5002 --latency 120 --jitter 40 --rate-limit 0
+    DISCOGS_API_URL=http://localhost:5002 uvicorn main:app --port 5001
+    python tools/bench_import.py --mode import --count 200 --concurrency 8 --standin-url http://localhost:5002
+
+Modes : `preview` (GET /api/discogs/album/{id}) et `import` (POST /api/albums/studio).
+En mode import, utiliser des ids neufs (--start-id) : un album déjà importé répond 409.
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile au rang le plus proche (valeurs non triées acceptées)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(mode: str, latencies: List[float], statuses: Counter, elapsed: float, upstream: Optional[Dict] = None) -> Dict:
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    report = {
+        "mode": mode,
+        "requests": sum(statuses.values()),
+        "ok": ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "per_second": round(ok / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": None,
+        "p95_ms": None,
+        "p99_ms": None,
+        "max_ms": None,
+    }
+    if latencies:
+        report.update(
+            p50_ms=round(percentile(latencies, 50) * 1000, 1),
+            p95_ms=round(percentile(latencies, 95) * 1000, 1),
+            p99_ms=round(percentile(latencies, 99) * 1000, 1),
+            max_ms=round(max(latencies) * 1000, 1),
+        )
+    if upstream is not None:
+        report["discogs_requests"] = upstream
+    return report
+
+
+def auth_headers(token: Optional[str]) -> Dict[str, str]:
+    headers = {"X-API-KEY": os.getenv("API_KEY", "")}
+    if not token:
+        # Jeton contributeur signé avec JWT_SECRET (comme tests/utils_jwt.py)
+        from jwt_utils import create_access_token
+        token = create_access_token({"id": 1, "email": "bench@disco2000", "roles": ["contributeur", "utilisateur"]})
+    headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+async def run(
+    api_url: str,
+    mode: str,
+    ids: List[int],
+    discogs_type: str,
+    concurrency: int,
+    headers: Dict[str, str],
+    timeout: float,
+) -> tuple:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for discogs_id in ids:
+        queue.put_nowait(discogs_id)
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            try:
+                discogs_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                if mode == "import":
+                    response = await client.post(
+                        "/api/albums/studio", params={"discogs_id": discogs_id, "discogs_type": discogs_type}
+                    )
+                else:
+                    response = await client.get(f"/api/discogs/album/{discogs_id}", params={"type": discogs_type})
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0  # erreur réseau / timeout
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api_url, headers=headers, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+def standin_stats(standin_url: Optional[str], reset: bool = False) -> Optional[Dict]:
+    if not standin_url:
+        return None
+    with httpx.Client(base_url=standin_url, timeout=5) as client:
+        if reset:
+            client.post("/_reset")
+            return None
+        return client.get("/_stats").json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de l'import d'albums Discogs")
+    parser.add_argument("--api-url", default=os.getenv("BENCH_API_URL", "http://localhost:5001"))
+    parser.add_argument("--mode", choices=["import", "preview"], default="preview")
+    parser.add_argument("--discogs-type", choices=["master", "release"], default="master")
+    parser.add_argument("--start-id", type=int, default=1_000_000, help="Premier id Discogs")
+    parser.add_argument("--count", type=int, default=100, help="Nombre de requêtes")
+    parser.add_argument("--distinct", type=int, default=None, help="Nombre d'ids distincts (répétés en boucle) ; défaut : --count")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--token", default=os.getenv("BENCH_TOKEN"), help="JWT contributeur (généré via JWT_SECRET sinon)")
+    parser.add_argument("--standin-url", default=None, help="Serveur de substitution : compte les appels Discogs réellement faits")
+    parser.add_argument("--json", action="store_true", help="Rapport au format JSON (comparaison entre versions)")
+    args = parser.parse_args()
+
+    distinct = args.distinct or args.count
+    ids = [args.start_id + i % distinct for i in range(args.count)]
+    standin_stats(args.standin_url, reset=True)
+    latencies, statuses, elapsed = asyncio.run(
+        run(args.api_url, args.mode, ids, args.discogs_type, args.concurrency, auth_headers(args.token), args.timeout)
+    )
+    report = summarize(args.mode, latencies, statuses, elapsed, standin_stats(args.standin_url))
+    if args.json:
+        print(json.dumps(report))
+        return
+    unit = "imports/s" if args.mode == "import" else "aperçus/s"
+    print(f"{report['requests']} requêtes ({report['ok']} OK) en {report['elapsed_s']}s, concurrence {args.concurrency}")
+    print(f"Débit : {report['per_second']} {unit}")
+    print(f"Latence : p50 {report['p50_ms']} ms, p95 {report['p95_ms']} ms, p99 {report['p99_ms']} ms, max {report['max_ms']} ms")
+    print(f"Statuts : {report['statuses']}")
+    if report.get("discogs_requests") is not None:
+        print(f"Appels Discogs : {report['discogs_requests']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Micro-benchmark de la sérialisation JSON des réponses du catalogue.
+
+Compare, sur un catalogue synthétique, le chemin par défaut de FastAPI (jsonable_encoder
+puis JSONResponse) et FastJSONResponse (orjson, ou json en repli), en octets par seconde :
+
+    python tools/bench_json.py --artists 20000 --albums 100 --repeat 20
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import json_response
+from json_response import FastJSONResponse
+
+COUNTRIES = [("FR", "France"), ("GB", "Royaume-Uni"), ("US", "États-Unis"), ("DE", "Allemagne"), (None, None)]
+GENRES = ["Rock", "Electronic", "Jazz", "Hip Hop", "Funk / Soul", "Classical"]
+
+
+def synthetic_artists(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Même forme que GET /api/artists."""
+    artists = []
+    for i in range(1, count + 1):
+        country, country_name = rng.choice(COUNTRIES)
+        artists.append({
+            "id": i,
+            "name": f"Artiste {i} — Ensemble",
+            "discogs_id": 100000 + i,
+            "country": country,
+            "country_name": country_name,
+        })
+    return artists
+
+
+def synthetic_album_page(count: int, rng: random.Random) -> Dict[str, Any]:
+    """Même forme qu'une page de GET /api/albums."""
+    albums = []
+    for i in range(1, count + 1):
+        albums.append({
+            "id": i,
+            "artist": f"Artiste {rng.randint(1, 5000)}",
+            "title": f"Album n°{i}",
+            "year": rng.randint(1960, 2024),
+            "cover_url": f"/api/covers/{i}?v=0123456789ab",
+            "cover_thumbnail_url": f"/api/covers/{i}?v=0123456789ab&size=300",
+            "collection": {"cd": True, "vinyl": False} if i % 3 == 0 else None,
+        })
+    return {"page": 1, "page_size": count, "total": 100000, "total_estimated": False, "albums": albums, "next_cursor": None}
+
+
+def measure(render: Callable[[Any], bytes], content: Any, repeat: int) -> Dict[str, float]:
+    """Meilleur temps sur `repeat` sérialisations (réduit le bruit du planificateur)."""
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = render(content)
+        best = min(best, time.perf_counter() - start)
+        size = len(body)
+    return {"bytes": size, "ms": round(best * 1000, 3), "mb_per_s": round(size / best / 1e6, 1) if best > 0 else None}
+
+
+def default_path(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path(content: Any) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def fast_path_without_orjson(content: Any) -> bytes:
+    orjson, json_response.orjson = json_response.orjson, None
+    try:
+        return FastJSONResponse(content).body
+    finally:
+        json_response.orjson = orjson
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la sérialisation JSON des réponses")
+    parser.add_argument("--artists", type=int, default=20000, help="Taille de la liste d'artistes")
+    parser.add_argument("--albums", type=int, default=100, help="Taille de la page d'albums")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Rapport au format JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        f"artists ({args.artists})": synthetic_artists(args.artists, rng),
+        f"albums page ({args.albums})": synthetic_album_page(args.albums, rng),
+    }
+    paths = {"jsonable_encoder + JSONResponse": default_path, "FastJSONResponse": fast_path}
+    if json_response.orjson is not None:
+        paths["FastJSONResponse (sans orjson)"] = fast_path_without_orjson
+
+    report = {
+        name: {path: measure(render, content, args.repeat) for path, render in paths.items()}
+        for name, content in payloads.items()
+    }
+    if args.json:
+        print(json.dumps(report))
+        return
+    for name, results in report.items():
+        baseline = results["jsonable_encoder + JSONResponse"]["ms"]
+        print(f"{name} :")
+        for path, result in results.items():
+            speedup = f"x{baseline / result['ms']:.1f}" if result["ms"] else "-"
+            print(f"  {path:<34} {result['bytes']:>10} octets  {result['ms']:>9} ms  {result['mb_per_s']:>8} Mo/s  {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Serveur de substitution de l'API Discogs, pour mesurer les performances hors ligne.
+
+Rejoue des réponses enregistrées (masters, releases, artists) depuis un répertoire de
+fixtures, avec latence, headers de quota X-Discogs-Ratelimit-* et injection d'erreurs
+paramétrables. Les ressources absentes des fixtures sont générées à la volée
+(--no-synthesize pour répondre 404).
+
+    python tools/discogs_standin.py serve --port 5002 --latency 120 --jitter 40 --rate-limit 60
+    DISCOGS_API_URL=http://localhost:5002 uvicorn main:app --port 5001
+
+    # Enregistrer de vraies réponses Discogs comme fixtures
+    python tools/discogs_standin.py record masters 1234 5678
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request, Path as PathParam
+from fastapi.responses import JSONResponse
+
+DEFAULT_FIXTURES_DIR = os.getenv("DISCOGS_FIXTURES_DIR", "tools/fixtures/discogs")
+KINDS = ("masters", "releases", "artists")
+
+
+def synthesize(kind: str, discogs_id: int, base_url: str = "") -> Dict[str, Any]:
+    """Réponse plausible (même forme que Discogs) pour un id sans fixture.
+    Comme sur Discogs, un master n'a pas de label : il faut passer par sa main_release."""
+    artist_id = discogs_id % 500 + 1
+    common = {
+        "id": discogs_id,
+        "title": f"Album {discogs_id}",
+        "year": 1960 + discogs_id % 60,
+        "artists": [{"name": f"Artist {artist_id}", "id": artist_id}],
+        "genres": ["Rock"],
+        "styles": ["Indie Rock"],
+        "images": [{"type": "primary", "uri": f"{base_url}/images/{discogs_id}.jpg"}],
+    }
+    if kind == "masters":
+        return {**common, "main_release": discogs_id}
+    if kind == "releases":
+        label_id = discogs_id % 100 + 1
+        return {
+            **common,
+            "master_id": discogs_id,
+            "labels": [{"name": f"Label {label_id}", "id": label_id, "catno": f"CAT-{discogs_id}"}],
+        }
+    return {"id": discogs_id, "name": f"Artist {discogs_id}", "profile": ""}
+
+
+class StandinState:
+    """Quota glissant sur 60 s et compteurs de requêtes servies."""
+
+    def __init__(self, rate_limit: int):
+        self.rate_limit = rate_limit
+        self._window = deque()
+        self.counts = Counter()
+
+    def take(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        while self._window and now - self._window[0] >= 60:
+            self._window.popleft()
+        if self.rate_limit and len(self._window) >= self.rate_limit:
+            retry_after = max(1, int(60 - (now - self._window[0])) + 1)
+            return {"allowed": False, "used": len(self._window), "retry_after": retry_after}
+        self._window.append(now)
+        return {"allowed": True, "used": len(self._window)}
+
+    def headers(self, used: int) -> Dict[str, str]:
+        if not self.rate_limit:
+            return {}
+        return {
+            "X-Discogs-Ratelimit": str(self.rate_limit),
+            "X-Discogs-Ratelimit-Used": str(used),
+            "X-Discogs-Ratelimit-Remaining": str(max(0, self.rate_limit - used)),
+        }
+
+
+def create_standin_app(
+    fixtures_dir: str = DEFAULT_FIXTURES_DIR,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    rate_limit: int = 0,
+    error_rate: float = 0.0,
+    error_status: int = 500,
+    synthesize_missing: bool = True,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    """Construit l'application ASGI du serveur de substitution (utilisable aussi en test via ASGITransport)."""
+    app = FastAPI(title="Discogs stand-in", docs_url=None, redoc_url=None)
+    fixtures = Path(fixtures_dir)
+    rng = random.Random(seed)
+    state = StandinState(rate_limit)
+    app.state.standin = state
+
+    def load_fixture(kind: str, discogs_id: int) -> Optional[Dict[str, Any]]:
+        path = fixtures / kind / f"{discogs_id}.json"
+        if not path.is_file():
+            return None
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    async def serve(kind: str, discogs_id: int, base_url: str) -> JSONResponse:
+        if latency_ms or jitter_ms:
+            await asyncio.sleep(max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000)
+        quota = state.take()
+        if not quota["allowed"]:
+            state.counts["throttled"] += 1
+            headers = state.headers(quota["used"])
+            headers["Retry-After"] = str(quota["retry_after"])
+            return JSONResponse({"message": "You are making requests too quickly."}, status_code=429, headers=headers)
+        headers = state.headers(quota["used"])
+        if error_rate and rng.random() < error_rate:
+            state.counts["errors"] += 1
+            return JSONResponse({"message": "Injected error"}, status_code=error_status, headers=headers)
+        data = load_fixture(kind, discogs_id)
+        if data is None and synthesize_missing:
+            data = synthesize(kind, discogs_id, base_url)
+        if data is None:
+            state.counts["not_found"] += 1
+            return JSONResponse({"message": "Resource not found."}, status_code=404, headers=headers)
+        state.counts[kind] += 1
+        return JSONResponse(data, headers=headers)
+
+    @app.get("/masters/{discogs_id}")
+    async def get_master(request: Request, discogs_id: int = PathParam(...)):
+        return await serve("masters", discogs_id, str(request.base_url).rstrip("/"))
+
+    @app.get("/releases/{discogs_id}")
+    async def get_release(request: Request, discogs_id: int = PathParam(...)):
+        return await serve("releases", discogs_id, str(request.base_url).rstrip("/"))
+
+    @app.get("/artists/{discogs_id}")
+    async def get_artist(request: Request, discogs_id: int = PathParam(...)):
+        return await serve("artists", discogs_id, str(request.base_url).rstrip("/"))
+
+    @app.get("/_stats")
+    async def get_stats():
+        """Requêtes servies par type : permet de compter les appels Discogs par import."""
+        return dict(state.counts)
+
+    @app.post("/_reset")
+    async def reset_stats():
+        state.counts.clear()
+        return {"reset": True}
+
+    return app
+
+
+def record(kind: str, ids, fixtures_dir: str) -> None:
+    """Télécharge de vraies réponses Discogs et les enregistre comme fixtures."""
+    import httpx
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from discogs_utils import get_discogs_headers
+    target = Path(fixtures_dir) / kind
+    target.mkdir(parents=True, exist_ok=True)
+    with httpx.Client(timeout=10) as client:
+        for discogs_id in ids:
+            response = client.get(f"https://api.discogs.com/{kind}/{discogs_id}", headers=get_discogs_headers())
+            if response.status_code != 200:
+                print(f"{kind}/{discogs_id} : statut {response.status_code}, ignoré")
+                continue
+            with (target / f"{discogs_id}.json").open("w", encoding="utf-8") as f:
+                json.dump(response.json(), f, ensure_ascii=False, indent=1)
+            print(f"{kind}/{discogs_id} enregistré")
+            # Reste sous le quota Discogs : pause d'une minute quand il est presque épuisé
+            remaining = int(response.headers.get("X-Discogs-Ratelimit-Remaining", "1"))
+            time.sleep(60 if remaining < 2 else 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur de substitution de l'API Discogs (benchmarks hors ligne)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Démarre le serveur")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=5002)
+    serve_parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR)
+    serve_parser.add_argument("--latency", type=float, default=0.0, help="Latence moyenne (ms)")
+    serve_parser.add_argument("--jitter", type=float, default=0.0, help="Écart-type de la latence (ms)")
+    serve_parser.add_argument("--rate-limit", type=int, default=60, help="Requêtes par minute (0 : illimité)")
+    serve_parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses en erreur (0-1)")
+    serve_parser.add_argument("--error-status", type=int, default=500, help="Statut HTTP des erreurs injectées")
+    serve_parser.add_argument("--no-synthesize", action="store_true", help="404 pour les ids sans fixture")
+    serve_parser.add_argument("--seed", type=int, default=None, help="Graine aléatoire (latence et erreurs reproductibles)")
+
+    record_parser = sub.add_parser("record", help="Enregistre des réponses Discogs réelles comme fixtures")
+    record_parser.add_argument("kind", choices=KINDS)
+    record_parser.add_argument("ids", type=int, nargs="+")
+    record_parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.kind, args.ids, args.fixtures_dir)
+        return
+
+    import uvicorn
+    app = create_standin_app(
+        fixtures_dir=args.fixtures_dir,
+        latency_ms=args.latency,
+        jitter_ms=args.jitter,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        synthesize_missing=not args.no_synthesize,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()